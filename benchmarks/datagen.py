@@ -0,0 +1,105 @@
+"""Seeded synthetic customers, products and bills for the benchmarks.
+
+The same scale and seed always produce the same data. Run from the
+project root to fill a SQLite file on its own:
+
+    python -m benchmarks.datagen --scale 100k --db bench.db
+"""
+import argparse
+import datetime
+import os
+import random
+import time
+
+from db import DBHandler
+from models.bill import Bill, LineItem
+from models.customer import Customer
+from storage.sqlite_backend import SQLiteBackend
+
+# Number of bills at each scale.
+SCALES = {"10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+BILLS_PER_CUSTOMER = 10
+MAX_LINES = 5
+DEFAULT_SEED = 42
+# Bills fall in one fixed year, so results do not depend on today's date.
+FIRST_DAY = datetime.datetime(2024, 1, 1)
+DAYS = 366
+
+FIRST_NAMES = [
+    "Aarav", "Aditi", "Anil", "Asha", "Deepak", "Divya", "Farhan", "Gita", "Harish", "Isha",
+    "Jaya", "Karan", "Lakshmi", "Manoj", "Meera", "Nikhil", "Neha", "Pooja", "Rahul", "Ravi",
+    "Rekha", "Sanjay", "Sneha", "Suresh", "Tara", "Uday", "Varun", "Vidya", "Yash", "Zoya",
+]
+LAST_NAMES = [
+    "Agarwal", "Bhat", "Chopra", "Das", "Fernandes", "Gupta", "Iyer", "Joshi", "Kapoor", "Khan",
+    "Kulkarni", "Menon", "Mehta", "Nair", "Patel", "Pereira", "Rao", "Reddy", "Shah", "Singh",
+]
+ADJECTIVES = ["Blue", "Red", "Green", "Black", "Steel", "Plastic", "Large", "Small", "Premium", "Basic"]
+NOUNS = [
+    "Pen", "Pencil", "Notebook", "Eraser", "Ruler", "Stapler", "Marker", "Folder", "Envelope", "Ink",
+    "Tape", "Glue", "Scissors", "Calculator", "Diary", "Clip", "Paper", "Register", "Sharpener", "Crayon",
+]
+
+
+def scale_count(scale):
+    return SCALES[scale] if scale in SCALES else int(scale)
+
+
+def generate_products(seed=DEFAULT_SEED):
+    """(name, price in paise) for every adjective and noun pair."""
+    rng = random.Random(seed)
+    return [(f"{adjective} {noun}", rng.randint(5, 500) * 50) for adjective in ADJECTIVES for noun in NOUNS]
+
+
+def generate_customers(count, seed=DEFAULT_SEED):
+    rng = random.Random(seed)
+    customers = []
+    for i in range(count):
+        name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+        # 7919 is coprime with 10**9, so every customer gets a different phone.
+        phone = f"9{i * 7919 % 10 ** 9:09d}"
+        customers.append(Customer(None, name, phone, f"{name.split()[0].lower()}{i}@example.com"))
+    return customers
+
+
+def generate_bills(count, seed=DEFAULT_SEED):
+    """Yield `count` Bills over BILLS_PER_CUSTOMER times fewer customers."""
+    rng = random.Random(seed)
+    customers = generate_customers(max(count // BILLS_PER_CUSTOMER, 1), seed)
+    products = generate_products(seed)
+    for _ in range(count):
+        lines = rng.sample(products, rng.randint(1, MAX_LINES))
+        items = [LineItem(name, rng.randint(1, 10), price) for name, price in lines]
+        created_at = FIRST_DAY + datetime.timedelta(seconds=rng.randrange(DAYS * 86400))
+        yield Bill.new(rng.choice(customers), items, created_at)
+
+
+def seed_database(db, count, seed=DEFAULT_SEED, progress=None):
+    """Fill `db` with the catalog and `count` bills; returns the bills written."""
+    db.save_products(generate_products(seed))
+    return db.add_bills_bulk(generate_bills(count, seed), progress=progress)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", default="10k", help=f"Bills: {', '.join(SCALES)} or a number.")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--db", required=True, help="SQLite file to create.")
+    args = parser.parse_args()
+
+    if os.path.exists(args.db):
+        parser.error(f"{args.db} already exists")
+    db = DBHandler(backend=SQLiteBackend(args.db))
+    started = time.perf_counter()
+    try:
+        written = seed_database(
+            db, scale_count(args.scale), args.seed,
+            progress=lambda done: print(f"\rWrote {done} bills", end="", flush=True)
+        )
+    finally:
+        db.close()
+    print(f"\rWrote {written} bills in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Per-invoice render latency: a fresh FPDF per bill vs. the shared InvoiceRenderer.
+
+Run from the project root:
+
+    python -m benchmarks.pdf_render --count 200
+"""
+import argparse
+import datetime
+import os
+import statistics
+import time
+
+from fpdf import FPDF
+
+from models.bill import Bill, LineItem
+from models.customer import Customer
+from utils.pdf_exporter import (
+    FONT_DIR, InvoiceRenderer, render_invoice, subset_cache
+)
+
+
+def sample_bill(i):
+    customer = Customer(i, f"Customer {i}", f"98{i:08d}", f"customer{i}@example.com")
+    items = [LineItem(f"Item {n}", n + 1, 1050 * (n + 1)) for n in range(5)]
+    bill = Bill.new(customer, items, datetime.datetime(2025, 4, 19, 11, 35, 45))
+    bill.id = i
+    return bill
+
+
+def render_uncached(bill):
+    """What every export did before: new FPDF, load the fonts, subset them."""
+    subset_cache.clear()
+    pdf = FPDF()
+    pdf.add_font("DejaVu", "", os.path.join(FONT_DIR, "DejaVuSans.ttf"), uni=True)
+    pdf.add_font("DejaVu", "B", os.path.join(FONT_DIR, "DejaVuSans-Bold.ttf"), uni=True)
+    render_invoice(pdf, bill)
+    return pdf.output(dest="S").encode("latin-1")
+
+
+def measure(render, bills):
+    timings = []
+    for bill in bills:
+        started = time.perf_counter()
+        render(bill)
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def report(label, timings):
+    timings = sorted(timings)
+    p95 = timings[int(len(timings) * 0.95) - 1]
+    print(f"{label:<24} mean {statistics.mean(timings):7.2f} ms   "
+          f"median {statistics.median(timings):7.2f} ms   p95 {p95:7.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--count", type=int, default=100, help="Invoices per run.")
+    args = parser.parse_args()
+
+    bills = [sample_bill(i) for i in range(1, args.count + 1)]
+    # Write FPDF's on-disk font caches before timing anything.
+    render_uncached(bills[0])
+
+    before = measure(render_uncached, bills)
+    renderer = InvoiceRenderer()
+    after = measure(renderer.render, bills)
+
+    started = time.perf_counter()
+    renderer.render_many(bills)
+    one_document = (time.perf_counter() - started) * 1000 / len(bills)
+
+    report("fresh FPDF per invoice", before)
+    report("InvoiceRenderer", after)
+    print(f"{'one document, all bills':<24} mean {one_document:7.2f} ms per invoice")
+    print(f"speedup (mean): {statistics.mean(before) / statistics.mean(after):.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Startup time: what `import main` loads and how long until the window shows.
+
+Run from the project root:
+
+    python -m benchmarks.startup --budget-ms 600
+
+Each measurement runs in a fresh interpreter, so nothing is already
+imported. Exits with status 1 if a module that should load on demand is
+imported at startup, or if the import time exceeds --budget-ms.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+# Loaded on first use (reports, PDF export, the MySQL backend), never at startup.
+LAZY_MODULES = ("matplotlib", "fpdf", "mysql", "numpy")
+
+SHOW_WINDOW = """
+import time
+started = time.perf_counter()
+from PySide6.QtWidgets import QApplication
+from main import BillingApp
+app = QApplication([])
+window = BillingApp()
+window.show()
+app.processEvents()
+print((time.perf_counter() - started) * 1000)
+window.close()
+"""
+
+
+def run_python(args, env=None):
+    return subprocess.run(
+        [sys.executable, *args], capture_output=True, text=True, check=True,
+        env={**os.environ, **(env or {})}
+    )
+
+
+def import_times(module="main"):
+    """(cumulative ms, self ms, module) for every module `import module`
+    loads, parsed from `python -X importtime`."""
+    stderr = run_python(["-X", "importtime", "-c", f"import {module}"]).stderr
+    times = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        own, cumulative, name = line[len("import time:"):].split("|")
+        times.append((int(cumulative) / 1000, int(own) / 1000, name.strip()))
+    return times
+
+
+def time_to_window():
+    """Milliseconds from interpreter start-up to the main window shown,
+    offscreen and against a throwaway SQLite database."""
+    with tempfile.TemporaryDirectory() as directory:
+        result = run_python(["-c", SHOW_WINDOW], env={
+            "QT_QPA_PLATFORM": "offscreen",
+            "BILLING_DB_BACKEND": "sqlite",
+            "BILLING_DB_PATH": os.path.join(directory, "startup.db"),
+        })
+    return float(result.stdout.split()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--top", type=int, default=15, help="Slowest imports to list.")
+    parser.add_argument("--budget-ms", type=float, help="Fail if `import main` takes longer.")
+    parser.add_argument("--no-window", action="store_true", help="Skip the time-to-window run.")
+    args = parser.parse_args()
+
+    times = import_times()
+    total = next(cumulative for cumulative, _, name in times if name == "main")
+    print(f"{'cumulative':>10} {'self':>8}  module")
+    for cumulative, own, name in sorted(times, key=lambda row: row[1], reverse=True)[:args.top]:
+        print(f"{cumulative:8.1f}ms {own:6.1f}ms  {name}")
+    print(f"import main: {total:.1f} ms")
+    if not args.no_window:
+        print(f"window shown: {time_to_window():.1f} ms")
+
+    failures = []
+    loaded = {name.split(".")[0] for _, _, name in times}
+    for module in LAZY_MODULES:
+        if module in loaded:
+            failures.append(f"{module} is imported at startup")
+    if args.budget_ms is not None and total > args.budget_ms:
+        failures.append(f"import main took {total:.1f} ms, over the {args.budget_ms:.0f} ms budget")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,329 @@
+"""Benchmark suite: seed a local SQLite database and time the hot paths.
+
+Run from the project root:
+
+    python -m benchmarks.suite --scale 10k
+    python -m benchmarks.suite --scale 1m --output after.json
+    python -m benchmarks.suite --compare before.json after.json
+
+Seeded databases are cached per scale and seed (see --cache-dir) and each
+run works on a copy, so runs start from identical data. Results are
+written as JSON; --compare prints the change in every figure between two
+result files.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.datagen import (
+    DEFAULT_SEED, FIRST_NAMES, NOUNS, generate_products, scale_count, seed_database
+)
+from db import DBHandler
+from models.bill import LineItem
+from storage.sqlite_backend import SQLiteBackend
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+DEFAULT_CACHE_DIR = os.path.join(tempfile.gettempdir(), "billing-bench")
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def latency_stats(timings):
+    """Count, throughput and percentiles (in ms) of per-call timings in seconds."""
+    timings = sorted(timings)
+
+    def percentile(q):
+        return timings[max(round(q * len(timings) + 0.5) - 1, 0)] * 1000
+
+    return {
+        "count": len(timings),
+        "ops_per_s": len(timings) / sum(timings),
+        "mean_ms": statistics.mean(timings) * 1000,
+        "p50_ms": percentile(0.5),
+        "p95_ms": percentile(0.95),
+        "p99_ms": percentile(0.99),
+    }
+
+
+def time_calls(fn, args_list):
+    timings = []
+    for args in args_list:
+        started = time.perf_counter()
+        fn(*args)
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def peak_rss_mb():
+    """This process's peak resident set size so far, or None where unknown.
+
+    Linux's VmHWM is preferred to ru_maxrss, which a child inherits from
+    the parent it was forked from.
+    """
+    try:
+        with open("/proc/self/status", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS.
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def open_db(path):
+    return DBHandler(backend=SQLiteBackend(path))
+
+
+def seeded_database(cache_dir, count, seed, fresh=False):
+    """Path of a database seeded with `count` bills, generating it only if
+    it is not cached already."""
+    os.makedirs(cache_dir, exist_ok=True)
+    path = os.path.join(cache_dir, f"bills-{count}-seed{seed}.db")
+    if os.path.exists(path) and not fresh:
+        return path, None
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    db = open_db(path)
+    started = time.perf_counter()
+    try:
+        seed_database(db, count, seed, progress=lambda done: print(f"\rSeeding: {done} bills", end="", flush=True))
+    finally:
+        db.close()
+    elapsed = time.perf_counter() - started
+    print()
+    return path, {"bills": count, "seconds": elapsed, "bills_per_s": count / elapsed}
+
+
+def copy_database(source, directory):
+    """Copy a (checkpointed) SQLite file, so the writes of one run never
+    reach the cached database."""
+    conn = sqlite3.connect(source)
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    conn.close()
+    target = os.path.join(directory, "bench.db")
+    shutil.copyfile(source, target)
+    return target
+
+
+def bench_search(db, count, seed):
+    """Customer-name, phone-prefix and item-word searches, as typed at the counter."""
+    rng = random.Random(seed)
+    words = FIRST_NAMES + [noun.lower() for noun in NOUNS] + [f"9{rng.randrange(10 ** 4):04d}" for _ in range(20)]
+    keywords = [rng.choice(words)[:rng.randint(3, 6)] for _ in range(count)]
+    hits = []
+    timings = []
+    for keyword in keywords:
+        started = time.perf_counter()
+        hits.append(len(db.search_bills(keyword)))
+        timings.append(time.perf_counter() - started)
+    return dict(latency_stats(timings), mean_hits=statistics.mean(hits))
+
+
+def bench_invoices(db, count, seed, directory):
+    """Per-invoice time of PDFExporter.export_bill, i.e. the shared
+    renderer saving one bill; the first invoice, which parses the fonts,
+    is not counted."""
+    from utils.pdf_exporter import invoice_renderer
+    rng = random.Random(seed)
+    total = db.count_bills()
+    bills = [db.get_bill(rng.randint(1, total)) for _ in range(count + 1)]
+    renderer = invoice_renderer()
+    renderer.save(bills[0], os.path.join(directory, "warmup.pdf"))
+    return latency_stats(time_calls(
+        renderer.save, [(bill, os.path.join(directory, f"invoice_{n}.pdf")) for n, bill in enumerate(bills[1:])]
+    ))
+
+
+def bench_writes(db, count, seed):
+    """add_customer and add_bill, one call per checkout as the GUI makes them."""
+    rng = random.Random(seed)
+    products = generate_products(seed)
+    customers = [(f"Bench Customer {n}", f"bench{n}@example.com", f"8{n:09d}") for n in range(count)]
+    customer_times = time_calls(db.add_customer, customers)
+    customer_ids = [db.add_customer(*customer) for customer in customers]
+    bills = []
+    for customer_id in customer_ids:
+        items = [LineItem(name, rng.randint(1, 10), price) for name, price in rng.sample(products, 3)]
+        bills.append((customer_id, items, sum(item.total for item in items)))
+    return {
+        "add_customer": latency_stats(customer_times),
+        "add_bill": latency_stats(time_calls(db.add_bill, bills)),
+    }
+
+
+def child_get_all_bills(path, _):
+    """Timed on its own, then again under tracemalloc for the peak memory
+    the Python objects take, which slows the call down."""
+    db = open_db(path)
+    started = time.perf_counter()
+    bills = db.get_all_bills()
+    elapsed = time.perf_counter() - started
+    peak_rss = peak_rss_mb()
+    del bills
+    tracemalloc.start()
+    count = len(db.get_all_bills())
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "bills": count,
+        "seconds": elapsed,
+        "python_peak_mb": peak / (1024 * 1024),
+        "peak_rss_mb": peak_rss,
+    }
+
+
+def child_export_pdf(path, directory):
+    """What the Export PDF button runs: the streamed summary of every bill."""
+    from utils.pdf_exporter import export_bill_summary
+    db = open_db(path)
+    file_path = os.path.join(directory, "summary.pdf")
+    before = peak_rss_mb()
+    started = time.perf_counter()
+    count, _ = export_bill_summary(db.iter_bill_range(), file_path)
+    elapsed = time.perf_counter() - started
+    after = peak_rss_mb()
+    return {
+        "bills": count,
+        "seconds": elapsed,
+        "file_mb": os.path.getsize(file_path) / (1024 * 1024),
+        "peak_rss_mb": after,
+        "rss_growth_mb": after - before if after is not None else None,
+    }
+
+
+CHILD_TASKS = {"get_all_bills": child_get_all_bills, "export_pdf": child_export_pdf}
+
+
+def run_child(task, path, directory):
+    """Run a memory measurement in a fresh process, so its peak RSS is its own."""
+    result = subprocess.run(
+        [sys.executable, "-m", "benchmarks.suite", "--child", task, path, directory],
+        capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout)
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(args):
+    count = scale_count(args.scale)
+    source, seeding = seeded_database(args.cache_dir, count, args.seed, args.fresh)
+    results = {}
+    if seeding:
+        results["seed"] = seeding
+    with tempfile.TemporaryDirectory() as directory:
+        path = copy_database(source, directory)
+        db = open_db(path)
+        try:
+            print("search_bills...")
+            results["search_bills"] = bench_search(db, args.searches, args.seed)
+            print("export_bill...")
+            results["export_bill"] = bench_invoices(db, args.invoices, args.seed, directory)
+            print("get_all_bills...")
+            results["get_all_bills"] = run_child("get_all_bills", path, directory)
+            print("export_pdf...")
+            results["export_pdf"] = run_child("export_pdf", path, directory)
+            print("add_customer, add_bill...")
+            results.update(bench_writes(db, args.ops, args.seed))
+        finally:
+            db.close()
+    return {
+        "meta": {
+            "scale": args.scale,
+            "bills": count,
+            "seed": args.seed,
+            "backend": "sqlite",
+            "sqlite": sqlite3.sqlite_version,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "revision": git_revision(),
+            "started": datetime.datetime.now().isoformat(timespec="seconds"),
+        },
+        "results": results,
+    }
+
+
+def print_results(report):
+    for name, figures in report["results"].items():
+        shown = ", ".join(f"{key} {value:.2f}" if isinstance(value, float) else f"{key} {value}"
+                          for key, value in figures.items())
+        print(f"{name:<14} {shown}")
+
+
+def compare(before_path, after_path):
+    with open(before_path, encoding="utf-8") as f:
+        before = json.load(f)["results"]
+    with open(after_path, encoding="utf-8") as f:
+        after = json.load(f)["results"]
+    print(f"{'benchmark':<14} {'figure':<14} {'before':>12} {'after':>12} {'change':>8}")
+    for name in after:
+        for key, new in after[name].items():
+            old = before.get(name, {}).get(key)
+            if not isinstance(new, (int, float)) or not isinstance(old, (int, float)):
+                continue
+            change = f"{(new - old) / old * 100:+7.1f}%" if old else ""
+            print(f"{name:<14} {key:<14} {old:12.2f} {new:12.2f} {change:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", default="10k", help="Bills to seed: 10k, 100k, 1m or a number.")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--ops", type=int, default=1000, help="add_customer and add_bill calls.")
+    parser.add_argument("--searches", type=int, default=200)
+    parser.add_argument("--invoices", type=int, default=100)
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR, help="Where seeded databases are kept.")
+    parser.add_argument("--fresh", action="store_true", help="Re-seed even if a cached database exists.")
+    parser.add_argument("--output", help="Results file (default: benchmarks/results/<scale>-<time>.json).")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"), help="Compare two results files.")
+    parser.add_argument("--child", nargs=3, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        task, path, directory = args.child
+        print(json.dumps(CHILD_TASKS[task](path, directory)))
+        return
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    report = run_suite(args)
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"{args.scale}-{datetime.datetime.now():%Y%m%d-%H%M%S}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print_results(report)
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
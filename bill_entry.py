@@ -0,0 +1,243 @@
+import csv
+import re
+
+from PySide6.QtCore import (
+    Qt, QAbstractTableModel, QModelIndex, QRegularExpression, QStringListModel, QTimer, Signal
+)
+from PySide6.QtGui import QRegularExpressionValidator
+from PySide6.QtWidgets import QCompleter
+
+from models.bill import LineItem
+from utils.money import to_paise, format_paise
+
+ENTRY_COLUMNS = ["Item", "Quantity", "Price"]
+# What the grid's editors accept; pasted and imported lines are held to the same rules.
+QUANTITY_RANGE = (1, 9999)
+PRICE_RANGE = (0, 999999.99)
+PRICE_DECIMALS = 2
+# The same ranges as patterns, so the editors and the parsers accept exactly
+# the same text: plain digits only, no signs, exponents, separators or NaN.
+QUANTITY_PATTERN = r"[1-9][0-9]{0,3}"
+PRICE_PATTERN = r"[0-9]{1,6}(\.[0-9]{1,2})?"
+
+
+class EntryRow:
+    """One row of the entry grid: the text as typed, and what it parses to."""
+    __slots__ = ("name", "quantity_text", "price_text", "quantity", "price")
+
+    def __init__(self, name="", quantity_text="", price_text=""):
+        self.name = name
+        self.quantity_text = quantity_text
+        self.price_text = price_text
+        self.parse()
+
+    def parse(self):
+        try:
+            self.quantity = int(self.quantity_text)
+        except ValueError:
+            self.quantity = None
+        try:
+            self.price = to_paise(self.price_text) if self.price_text else None
+        except ArithmeticError:
+            self.price = None
+
+    @property
+    def line_total(self):
+        if self.quantity is None or self.price is None:
+            return 0
+        return self.quantity * self.price
+
+    def text(self, column):
+        return (self.name, self.quantity_text, self.price_text)[column]
+
+    def is_blank(self):
+        return not (self.name or self.quantity_text or self.price_text)
+
+
+def valid_quantity(text):
+    return re.fullmatch(QUANTITY_PATTERN, text) is not None
+
+
+def valid_price(text):
+    return re.fullmatch(PRICE_PATTERN, text) is not None
+
+
+def quantity_validator(parent=None):
+    """A validator for quantity editors that accepts what valid_quantity does."""
+    return QRegularExpressionValidator(QRegularExpression(QUANTITY_PATTERN), parent)
+
+
+def price_validator(parent=None):
+    """A validator for price editors that accepts what valid_price does."""
+    return QRegularExpressionValidator(QRegularExpression(PRICE_PATTERN), parent)
+
+
+def parse_items_text(text):
+    """Parse pasted or imported lines of item, quantity, price into EntryRows.
+
+    Cells are tab-separated if the text has any tabs (a spreadsheet copy),
+    comma-separated otherwise; names may be quoted. Blank lines, trailing
+    empty cells and a header line are skipped. Raises ValueError naming the
+    first line that is not a valid item.
+    """
+    delimiter = "\t" if "\t" in text else ","
+    rows = []
+    for number, cells in enumerate(csv.reader(text.splitlines(), delimiter=delimiter), 1):
+        cells = [cell.strip() for cell in cells]
+        while cells and not cells[-1]:
+            cells.pop()
+        if not cells:
+            continue
+        if len(cells) != 3:
+            raise ValueError(f"Line {number}: expected item, quantity and price")
+        name, quantity, price = cells
+        if not rows and number == 1 and not valid_quantity(quantity) and not valid_price(price):
+            continue  # header
+        if not name:
+            raise ValueError(f"Line {number}: the item name is empty")
+        if not valid_quantity(quantity):
+            raise ValueError(f"Line {number}: quantity must be a whole number from "
+                             f"{QUANTITY_RANGE[0]} to {QUANTITY_RANGE[1]}")
+        if not valid_price(price):
+            raise ValueError(f"Line {number}: price must be from {PRICE_RANGE[0]} to "
+                             f"{PRICE_RANGE[1]} with at most {PRICE_DECIMALS} decimals")
+        rows.append(EntryRow(name, quantity, price))
+    return rows
+
+
+class BillItemsModel(QAbstractTableModel):
+    """The lines of the bill being entered.
+
+    Each row keeps its parsed quantity and price, so an edit re-parses one
+    cell and moves the running total by that row's change. totalChanged is
+    emitted from a zero-delay timer: any number of edits made in one go
+    (typing, pasting, filling a saved bill) produce a single update.
+    Naming a product from `catalog` fills in its price.
+    """
+    totalChanged = Signal(object)
+
+    def __init__(self, parent=None, catalog=None):
+        super().__init__(parent)
+        self.catalog = catalog
+        self.rows = []
+        self.total = 0
+        self.total_timer = QTimer(self)
+        self.total_timer.setSingleShot(True)
+        self.total_timer.setInterval(0)
+        self.total_timer.timeout.connect(lambda: self.totalChanged.emit(self.total))
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(ENTRY_COLUMNS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return None
+        if orientation == Qt.Horizontal:
+            return ENTRY_COLUMNS[section]
+        return section + 1
+
+    def flags(self, index):
+        return Qt.ItemIsEnabled | Qt.ItemIsSelectable | Qt.ItemIsEditable
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or role not in (Qt.DisplayRole, Qt.EditRole):
+            return None
+        return self.rows[index.row()].text(index.column())
+
+    def setData(self, index, value, role=Qt.EditRole):
+        if not index.isValid() or role != Qt.EditRole:
+            return False
+        row = self.rows[index.row()]
+        before = row.line_total
+        text = str(value).strip()
+        last = index
+        if index.column() == 0:
+            product = self.catalog.get(text) if self.catalog and text != row.name else None
+            row.name = text
+            if product is not None:
+                row.price_text = format_paise(product.price)
+                last = index.siblingAtColumn(2)
+        elif index.column() == 1:
+            row.quantity_text = text
+        else:
+            row.price_text = text
+        if last.column():
+            row.parse()
+            self.total_changed(row.line_total - before)
+        self.dataChanged.emit(index, last, [Qt.DisplayRole, Qt.EditRole])
+        return True
+
+    def insertRows(self, position, count, parent=QModelIndex()):
+        self.beginInsertRows(parent, position, position + count - 1)
+        self.rows[position:position] = [EntryRow() for _ in range(count)]
+        self.endInsertRows()
+        return True
+
+    def removeRows(self, position, count, parent=QModelIndex()):
+        self.beginRemoveRows(parent, position, position + count - 1)
+        removed = self.rows[position:position + count]
+        del self.rows[position:position + count]
+        self.endRemoveRows()
+        self.total_changed(-sum(row.line_total for row in removed))
+        return True
+
+    def append_rows(self, rows):
+        """Add EntryRows after the last non-blank row with one insert and
+        one total update, however many there are."""
+        end = len(self.rows)
+        while end and self.rows[end - 1].is_blank():
+            end -= 1
+        if end < len(self.rows):
+            self.removeRows(end, len(self.rows) - end)
+        if rows:
+            self.beginInsertRows(QModelIndex(), end, end + len(rows) - 1)
+            self.rows.extend(rows)
+            self.endInsertRows()
+            self.total_changed(sum(row.line_total for row in rows))
+
+    def set_items(self, items):
+        """Show `items` (LineItem objects) in place of whatever was being entered."""
+        self.beginResetModel()
+        self.rows = [EntryRow(item.name, str(item.quantity), format_paise(item.price)) for item in items]
+        self.endResetModel()
+        self.total_changed(sum(row.line_total for row in self.rows) - self.total)
+
+    def clear(self):
+        self.set_items([])
+
+    def total_changed(self, delta):
+        if delta:
+            self.total += delta
+            self.total_timer.start()
+
+    def line_items(self):
+        """Return the rows as LineItems, or raise ValueError naming the first
+        (1-based) row that is incomplete or invalid."""
+        items = []
+        for number, row in enumerate(self.rows, 1):
+            if not row.name or row.quantity is None or row.price is None:
+                raise ValueError(number)
+            items.append(LineItem(row.name, row.quantity, row.price))
+        return items
+
+
+class ItemCompleter(QCompleter):
+    """Completes item names from a ProductCatalog.
+
+    QCompleter filters its model by scanning every row, so rather than give
+    it the whole catalog it is handed just the catalog's matches for the
+    current prefix, and told not to filter them again.
+    """
+    def __init__(self, catalog, parent=None):
+        super().__init__(parent)
+        self.catalog = catalog
+        self.names = QStringListModel(self)
+        self.setModel(self.names)
+        self.setCompletionMode(QCompleter.UnfilteredPopupCompletion)
+        self.setCaseSensitivity(Qt.CaseInsensitive)
+
+    def update_prefix(self, text):
+        self.names.setStringList([product.name for product in self.catalog.complete(text)])
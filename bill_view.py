@@ -0,0 +1,192 @@
+from functools import partial
+
+from PySide6.QtCore import (
+    Qt, QAbstractTableModel, QModelIndex, QSortFilterProxyModel, QEvent, Signal
+)
+from PySide6.QtWidgets import QStyledItemDelegate, QStyleOptionButton, QStyle, QApplication
+
+from db import BILL_PAGE_SIZE
+from utils import metrics
+from utils.money import format_paise
+
+BILL_COLUMNS = ["Customer", "Amount", "Date", "Action"]
+ACTION_COLUMN = 3
+
+BillRole = Qt.UserRole
+SortRole = Qt.UserRole + 1
+
+
+class BillTableModel(QAbstractTableModel):
+    """Bill history, or the hits for a search keyword, pulled from the database
+    one page at a time as the view needs them.
+
+    Pages are read on the DB worker and added when they arrive, one at a
+    time; pages that arrive after a reload or a new search are dropped.
+    """
+    loadFailed = Signal(str)
+
+    def __init__(self, db, worker, parent=None):
+        super().__init__(parent)
+        self.db = db
+        self.worker = worker
+        self.keyword = ""
+        self.bills = []
+        self.exhausted = True
+        self.loading = False
+        self.generation = 0
+
+    @metrics.timed("gui.bill_view.reload")
+    def reload(self):
+        self.reset("", [], False)
+        self.fetchMore(QModelIndex())
+
+    @metrics.timed("gui.bill_view.show_results")
+    def show_results(self, keyword, bills):
+        """Show the first page of search hits fetched elsewhere; later pages
+        are fetched on scroll like the plain history."""
+        self.reset(keyword, list(bills), len(bills) < BILL_PAGE_SIZE)
+
+    def reset(self, keyword, bills, exhausted):
+        self.beginResetModel()
+        self.generation += 1
+        self.keyword = keyword
+        self.bills = bills
+        self.exhausted = exhausted
+        self.loading = False
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.bills)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(BILL_COLUMNS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return None
+        if orientation == Qt.Horizontal:
+            return BILL_COLUMNS[section]
+        return section + 1
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        bill = self.bills[index.row()]
+        column = index.column()
+        if role == Qt.DisplayRole:
+            if column == 0:
+                return bill.customer.name
+            if column == 1:
+                return f"Rs.{format_paise(bill.total)}"
+            if column == 2:
+                return bill.date
+            return "View"
+        if role == SortRole:
+            if column == 0:
+                return bill.customer.name.lower()
+            if column == 1:
+                return bill.total
+            return bill.created_at
+        if role == BillRole:
+            return bill
+        return None
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and not self.exhausted and not self.loading
+
+    def fetchMore(self, parent=QModelIndex()):
+        if not self.canFetchMore(parent):
+            return
+        self.loading = True
+        generation = self.generation
+        after = self.db.page_key(self.bills[-1]) if self.bills else None
+        if self.keyword:
+            fetch = partial(self.db.search_bills, self.keyword)
+        else:
+            fetch = self.db.get_bills_page
+        self.worker.submit(
+            fetch, after=after,
+            on_success=lambda page: self.add_page(generation, page),
+            on_error=lambda error: self.page_failed(generation, error)
+        )
+
+    @metrics.timed("gui.bill_view.add_page")
+    def add_page(self, generation, page):
+        if generation != self.generation:
+            return
+        self.loading = False
+        self.exhausted = len(page) < BILL_PAGE_SIZE
+        if not page:
+            return
+        start = len(self.bills)
+        self.beginInsertRows(QModelIndex(), start, start + len(page) - 1)
+        self.bills.extend(page)
+        self.endInsertRows()
+
+    def page_failed(self, generation, error):
+        if generation != self.generation:
+            return
+        self.loading = False
+        self.exhausted = True
+        self.loadFailed.emit(error)
+
+    def insert_bill(self, bill, row=0):
+        self.beginInsertRows(QModelIndex(), row, row)
+        self.bills.insert(row, bill)
+        self.endInsertRows()
+
+    def remove_bill(self, bill):
+        """Remove the row holding `bill` and return where it was, or None."""
+        row = self.find_row(bill)
+        if row is not None:
+            self.beginRemoveRows(QModelIndex(), row, row)
+            del self.bills[row]
+            self.endRemoveRows()
+        return row
+
+    def shows(self, bill):
+        """Whether `bill` itself, not another copy of it, is loaded."""
+        row = self.find_row(bill)
+        return row is not None and self.bills[row] is bill
+
+    def bill_changed(self, bill):
+        """Show `bill` in place of the loaded bill with the same id."""
+        row = self.find_row(bill)
+        if row is not None:
+            self.bills[row] = bill
+            self.dataChanged.emit(self.index(row, 0), self.index(row, len(BILL_COLUMNS) - 1))
+
+    def find_row(self, bill):
+        # Bills that are still being saved have no id yet.
+        for row, loaded in enumerate(self.bills):
+            if loaded is bill or (bill.id is not None and loaded.id == bill.id):
+                return row
+        return None
+
+
+class BillSortProxyModel(QSortFilterProxyModel):
+    """Sorts the bills already fetched into the source model."""
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setSortRole(SortRole)
+
+
+class ViewButtonDelegate(QStyledItemDelegate):
+    """Paints a "View" button in each row without creating a widget per row."""
+    clicked = Signal(QModelIndex)
+
+    def paint(self, painter, option, index):
+        button = QStyleOptionButton()
+        button.rect = option.rect.adjusted(4, 2, -4, -2)
+        button.text = index.data(Qt.DisplayRole)
+        button.state = QStyle.State_Enabled
+        if option.state & QStyle.State_MouseOver:
+            button.state |= QStyle.State_MouseOver
+        style = option.widget.style() if option.widget else QApplication.style()
+        style.drawControl(QStyle.CE_PushButton, button, painter, option.widget)
+
+    def editorEvent(self, event, model, option, index):
+        if event.type() == QEvent.MouseButtonRelease and event.button() == Qt.LeftButton:
+            self.clicked.emit(index)
+            return True
+        return super().editorEvent(event, model, option, index)
@@ -0,0 +1,133 @@
+from bisect import bisect_left, insort
+
+from PySide6.QtCore import QObject, QTimer, Signal
+
+PRODUCT_REFRESH_MS = 60 * 1000
+COMPLETION_LIMIT = 20
+
+
+def name_key(name):
+    return name.strip().casefold()
+
+
+class ProductIndex:
+    """Active products by name, for prefix completion.
+
+    Names are kept casefolded in one sorted list, so the products starting
+    with a prefix are a contiguous run found by binary search: a lookup
+    costs O(log n) plus the matches returned, whatever the catalog size.
+    Changes are applied one product at a time, so a refresh only touches
+    what changed.
+    """
+    def __init__(self):
+        self.keys = []
+        self.by_key = {}
+        self.by_id = {}
+
+    def __len__(self):
+        return len(self.keys)
+
+    def load(self, products):
+        """Replace the index with `products`, sorting once."""
+        self.by_key = {name_key(product.name): product for product in products if product.active}
+        self.by_id = {product.id: product for product in self.by_key.values()}
+        self.keys = sorted(self.by_key)
+
+    def update(self, products):
+        """Apply new, repriced, renamed and discontinued products."""
+        for product in products:
+            self.remove(product.id)
+            if product.active:
+                key = name_key(product.name)
+                clash = self.by_key.get(key)
+                if clash is not None:
+                    # Another product had this name before it was renamed.
+                    self.remove(clash.id)
+                insort(self.keys, key)
+                self.by_key[key] = product
+                self.by_id[product.id] = product
+
+    def remove(self, product_id):
+        product = self.by_id.pop(product_id, None)
+        if product is not None:
+            key = name_key(product.name)
+            del self.by_key[key]
+            del self.keys[bisect_left(self.keys, key)]
+
+    def get(self, name):
+        return self.by_key.get(name_key(name))
+
+    def complete(self, prefix, limit=COMPLETION_LIMIT):
+        """Up to `limit` products whose names start with `prefix`, ignoring case."""
+        prefix = name_key(prefix)
+        if not prefix:
+            return []
+        start = bisect_left(self.keys, prefix)
+        matches = []
+        for position in range(start, min(start + limit, len(self.keys))):
+            key = self.keys[position]
+            if not key.startswith(prefix):
+                break
+            matches.append(self.by_key[key])
+        return matches
+
+
+class ProductCatalog(QObject):
+    """Keeps a ProductIndex in step with the products table.
+
+    The full catalog is read once in the background; after that a timer
+    fetches only the products changed since the newest change seen.
+    """
+    changed = Signal()
+    failed = Signal(str)
+
+    def __init__(self, db, worker, parent=None):
+        super().__init__(parent)
+        self.db = db
+        self.worker = worker
+        self.index = ProductIndex()
+        self.since = None
+        self.loaded = False
+        self.loading = False
+
+        self.timer = QTimer(self)
+        self.timer.setInterval(PRODUCT_REFRESH_MS)
+        self.timer.timeout.connect(self.refresh)
+
+    def start(self):
+        self.refresh()
+        self.timer.start()
+
+    def refresh(self):
+        if self.loading:
+            return
+        self.loading = True
+        self.worker.submit(
+            self.db.get_products, self.since if self.loaded else None,
+            on_success=self.on_loaded,
+            on_error=self.on_failed
+        )
+
+    def on_loaded(self, products):
+        self.loading = False
+        if self.loaded:
+            self.index.update(products)
+        else:
+            self.index.load(products)
+            self.loaded = True
+        self.since = max((product.updated_at for product in products), default=self.since)
+        if products:
+            self.changed.emit()
+
+    def on_failed(self, error):
+        self.loading = False
+        self.failed.emit(error)
+
+    def get(self, name):
+        return self.index.get(name)
+
+    def complete(self, prefix, limit=COMPLETION_LIMIT):
+        return self.index.complete(prefix, limit)
+
+    def shutdown(self):
+        self.timer.stop()
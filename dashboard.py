@@ -0,0 +1,59 @@
+import datetime
+
+from utils.money import to_paise
+
+
+class DashboardTotals:
+    """Running bill count and revenue: all time, per day and per month.
+
+    Seeded once from the database's per-day totals, then kept current by
+    applying each add, edit and delete as a delta, so reading a figure never
+    depends on how many bills there are. Amounts are kept in paise so
+    repeated deltas cannot drift.
+    """
+    def __init__(self):
+        self.count = 0
+        self.revenue = 0
+        self.days = {}
+        self.months = {}
+
+    def seed(self, rows):
+        """Replace the totals with `rows` of {"day", "bills", "revenue"}."""
+        self.count = 0
+        self.revenue = 0
+        self.days = {}
+        self.months = {}
+        for row in rows:
+            self._apply(row["day"], row["bills"], to_paise(row["revenue"] or 0))
+
+    def add(self, bill):
+        self._apply(bill.created_at.date(), 1, bill.total)
+
+    def remove(self, bill):
+        self._apply(bill.created_at.date(), -1, -bill.total)
+
+    def replace(self, old, new):
+        self._apply(new.created_at.date(), 0, new.total - old.total)
+
+    def _apply(self, day, count, revenue):
+        self.count += count
+        self.revenue += revenue
+        for totals, key in ((self.days, day), (self.months, (day.year, day.month))):
+            day_count, day_revenue = totals.get(key, (0, 0))
+            totals[key] = (day_count + count, day_revenue + revenue)
+
+    def all_time(self):
+        return self.revenue / 100
+
+    def on_day(self, day):
+        return self.days.get(day, (0, 0))[1] / 100
+
+    def in_month(self, year, month):
+        return self.months.get((year, month), (0, 0))[1] / 100
+
+    def today(self):
+        return self.on_day(datetime.date.today())
+
+    def this_month(self):
+        today = datetime.date.today()
+        return self.in_month(today.year, today.month)
@@ -1,78 +1,947 @@
-import mysql.connector
+import datetime
+import json
+import os
+import re
+import threading
+from contextlib import contextmanager
 
+from migrations import MIGRATIONS, NAME_WORDS_MIGRATION
+from models.bill import Bill, LineItem
+from models.customer import Customer
+from models.product import Product, PRODUCT_COLUMNS
+from utils import metrics
+from utils.cache import LRUCache
+from utils.money import paise_to_decimal, to_paise
+# utils.line_items is imported where it is used, so numpy is not loaded at startup.
+
+BILL_PAGE_SIZE = 100
+MIGRATION_BATCH_SIZE = 1000
+IMPORT_BATCH_SIZE = 1000
+EXPORT_CHUNK_SIZE = 2000
+POOL_SIZE = 5
+CUSTOMER_CACHE_SIZE = 4096
+BILL_CACHE_SIZE = 256
+REPORT_TOP_N = 10
+# Rows per day in sales_daily; see update_rollups.
+ROLLUP_SHARDS = 8
+
+# stock_movements.reason values.
+STOCK_SALE = "sale"
+STOCK_BILL_EDIT = "bill_edit"
+STOCK_BILL_DELETE = "bill_delete"
+STOCK_ADJUSTMENT = "adjustment"
+
+# "mysql", or "sqlite" for a single counter with no database server.
+DB_BACKEND = os.environ.get("BILLING_DB_BACKEND", "mysql")
+
+DB_CONFIG = {
+    "host": "localhost",
+    "user": "root",
+    "password": "root",
+    "database": "billing_db",
+}
+
+SQLITE_PATH = os.environ.get("BILLING_DB_PATH", "billing.db")
+
+BILL_SELECT = """
+    SELECT b.id, b.customer_id, c.name, c.phone, c.email, b.items, b.total, b.created_at
+    FROM bills b
+    JOIN customers c ON b.customer_id = c.id
+"""
+
+
+def create_backend(name=None, pool_size=POOL_SIZE):
+    """The storage backend `name` (DB_BACKEND by default). Backends are
+    imported on demand, so each deployment only needs its own driver."""
+    name = name or DB_BACKEND
+    if name == "sqlite":
+        from storage.sqlite_backend import SQLiteBackend
+        return SQLiteBackend(SQLITE_PATH)
+    if name == "mysql":
+        from storage.mysql_backend import MySQLBackend
+        return MySQLBackend(DB_CONFIG, pool_size)
+    raise ValueError(f"Unknown database backend: {name!r}")
+
+
+class CountingCursor:
+    """Passes statements to `cursor`, counting them for the query metrics."""
+    def __init__(self, cursor):
+        self.cursor = cursor
+
+    def execute(self, sql, params=()):
+        metrics.count("db.queries")
+        self.cursor.execute(sql, params)
+
+    def executemany(self, sql, rows):
+        metrics.count("db.queries")
+        self.cursor.executemany(sql, rows)
+
+    def __getattr__(self, name):
+        return getattr(self.cursor, name)
+
+
+@metrics.instrument("db", skip=("transaction", "bill_cache_stats"))
 class DBHandler:
-    def __init__(self):
-        self.conn = mysql.connector.connect(
-            host="localhost",
-            user="root",
-            password="root",
-            database="billing_db"
-        )
-        self.cursor = self.conn.cursor(dictionary=True)
-        self.init_db()
+    """Thread-safe access to the billing database.
+
+    The queries live here; the backend (see storage/) supplies connections,
+    the schema and the few statements whose syntax differs between MySQL and
+    SQLite. One handler can serve the GUI thread and any number of worker
+    threads at the same time.
+    """
+    def __init__(self, init_schema=True, pool_size=POOL_SIZE, backend=None, lazy=False):
+        self.init_schema = init_schema
+        self.pool_size = pool_size
+        self._backend = backend
+        self.ready = False
+        self.opening = False
+        # Versions of the migrations the database has had, as last read.
+        self.applied = set()
+        self.open_lock = threading.RLock()
+        # (name, phone) -> customer id; customers are never renamed or deleted.
+        self.customer_ids = LRUCache(CUSTOMER_CACHE_SIZE)
+        # Bill id -> (version, decoded Bill), for get_bill(). bill_writes is
+        # bumped on every bill write so a read that raced the write does not
+        # cache the old bill; bill_lock makes that check and the caching one
+        # step. Writes made elsewhere are caught by the version.
+        self.bills = LRUCache(BILL_CACHE_SIZE)
+        self.bill_writes = 0
+        self.bill_lock = threading.Lock()
+        if not lazy:
+            self.open()
+
+    @property
+    def backend(self):
+        """The storage backend, opened on first use if open() has not run."""
+        if not self.ready:
+            self.open()
+        return self._backend
+
+    def open(self):
+        """Connect and bring the schema up to date. With lazy=True the GUI
+        calls this on a worker thread; anything that needs the database
+        before then waits here until it is ready."""
+        with self.open_lock:
+            # `opening` lets the migrations, on this thread, use the backend.
+            if self.ready or self.opening:
+                return
+            self.opening = True
+            try:
+                if self._backend is None:
+                    self._backend = create_backend(pool_size=self.pool_size)
+                if self.init_schema:
+                    self.init_db()
+                self.ready = True
+            finally:
+                self.opening = False
+
+    @contextmanager
+    def transaction(self, write=True):
+        """Yield a dictionary cursor whose statements commit together, or roll
+        back together if the block raises. Pass write=False when the block
+        only reads, so it need not queue behind SQLite's single writer."""
+        with self.backend.transaction(write) as cursor:
+            yield CountingCursor(cursor) if metrics.ENABLED else cursor
 
     def init_db(self):
-        self.cursor.execute("""
-            CREATE TABLE IF NOT EXISTS customers (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                name VARCHAR(100),
-                email VARCHAR(100),
-                phone VARCHAR(15)
+        """Bring the schema up to date, apart from manual migrations; an
+        up-to-date database costs one query."""
+        self.migrate(manual=False)
+
+    def applied_migrations(self):
+        """The versions of the migrations applied to the database."""
+        with self.transaction(write=False) as cursor:
+            if not self.backend.table_exists(cursor, "schema_version"):
+                return set()
+            cursor.execute("SELECT version FROM schema_version")
+            return {row["version"] for row in cursor.fetchall()}
+
+    def schema_version(self):
+        """The version of the last migration applied to the database."""
+        return max(self.applied_migrations(), default=0)
+
+    def pending_migrations(self, manual=True):
+        """The migrations still to apply, in order; with manual=False, only
+        those the app applies by itself (see migrations.py)."""
+        self.applied = self.applied_migrations()
+        pending = [migration for migration in MIGRATIONS if migration.version not in self.applied]
+        if not manual and self.backend.name == "mysql" and any(migration.manual for migration in pending):
+            with self.transaction(write=False) as cursor:
+                if self.applied or self.backend.table_exists(cursor, "bills"):
+                    pending = [
+                        migration for migration in pending
+                        if not migration.manual or not migration.needed(self, cursor)
+                    ]
+        return pending
+
+    def migrate(self, batch_size=MIGRATION_BATCH_SIZE, progress=None, started=None, manual=True):
+        """Apply the pending migrations (see migrations.py) in order and
+        return them; with manual=False, leave out the manual ones. `started`
+        is called with each migration before it runs, and `progress` with
+        the rows its backfill has done so far.
+
+        Only one process migrates at a time; the others wait for it and
+        then find less, or nothing, left to do.
+        """
+        if not self.pending_migrations(manual):
+            return []
+        with self.backend.migration_lock():
+            pending = self.pending_migrations(manual)
+            if pending:
+                self._apply_migrations(pending, batch_size, progress, started)
+        return pending
+
+    def _apply_migrations(self, pending, batch_size, progress, started):
+        with self.transaction() as cursor:
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS schema_version (
+                    version INT NOT NULL,
+                    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+        for migration in pending:
+            if started:
+                started(migration)
+            if migration.apply:
+                with self.transaction() as cursor:
+                    migration.apply(self, cursor)
+            if migration.backfill:
+                migration.backfill(self, batch_size, progress)
+            with self.transaction() as cursor:
+                cursor.execute("INSERT INTO schema_version (version) VALUES (%s)", (migration.version,))
+            self.applied.add(migration.version)
+
+    def add_customer(self, name, email, phone):
+        """Return the id of the customer with this name and phone, creating
+        them if needed. Known customers are answered from memory; new ones
+        cost a single upsert, which is also safe when two counters save the
+        same customer at once."""
+        key = (name, phone)
+        customer_id = self.customer_ids.get(key)
+        if customer_id is not None:
+            return customer_id
+        with self.transaction() as cursor:
+            customer_id = self.backend.upsert_id(
+                cursor,
+                "INSERT INTO customers (name, email, phone) VALUES (%s, %s, %s)",
+                (name, email, phone),
+                "name, phone"
             )
-        """)
-        self.cursor.execute("""
-            CREATE TABLE IF NOT EXISTS bills (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                customer_id INT,
-                items TEXT,
-                total FLOAT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (customer_id) REFERENCES customers(id) ON DELETE CASCADE
+        self.customer_ids.put(key, customer_id)
+        return customer_id
+
+    def add_bill(self, customer_id, items, total):
+        """Insert the bill header and its LineItems in one transaction; `total`
+        is in paise."""
+        with self.transaction() as cursor:
+            cursor.execute(
+                "INSERT INTO bills (customer_id, total) VALUES (%s, %s)",
+                (customer_id, paise_to_decimal(total))
             )
-        """)
-        self.conn.commit()
+            bill_id = cursor.lastrowid
+            self._insert_items(cursor, bill_id, items)
+            self.update_rollups(cursor, [bill_id])
+            self._sell_stock(cursor, [bill_id])
+        return bill_id
 
-    def add_customer(self, name, email, phone):
-        self.cursor.execute(
-            "SELECT id FROM customers WHERE name=%s AND phone=%s",
-            (name, phone)
+    def add_bills_bulk(self, bills, batch_size=IMPORT_BATCH_SIZE, progress=None):
+        """Insert many bills, committing once per batch of `batch_size`.
+
+        `bills` is any iterable of Bills. A total of None is computed from
+        the lines, a created_at of None means now, and ids are filled in as
+        bills and customers are written. Each batch resolves its customers with
+        one upsert and one lookup, writes all headers with one multi-row
+        INSERT and all lines with one executemany. Returns the number of
+        bills inserted.
+        """
+        inserted = 0
+        batch = []
+        for bill in bills:
+            batch.append(bill)
+            if len(batch) >= batch_size:
+                inserted += self._insert_bill_batch(batch)
+                batch = []
+                if progress:
+                    progress(inserted)
+        if batch:
+            inserted += self._insert_bill_batch(batch)
+            if progress:
+                progress(inserted)
+        return inserted
+
+    def _insert_bill_batch(self, bills):
+        from utils.line_items import LineItems
+        with self.transaction() as cursor:
+            customer_ids = self._resolve_customers(cursor, bills)
+            now = datetime.datetime.now()
+            lines = LineItems.from_line_items(bill.items for bill in bills)
+            headers = []
+            for bill, total in zip(bills, lines.bill_totals().tolist()):
+                if bill.total is None:
+                    bill.total = total
+                if bill.created_at is None:
+                    bill.created_at = now
+                bill.customer.id = customer_ids[(bill.customer.name, bill.customer.phone)]
+                headers.extend((bill.customer.id, paise_to_decimal(bill.total), bill.created_at))
+            cursor.execute(
+                "INSERT INTO bills (customer_id, total, created_at) VALUES "
+                + ", ".join(["(%s, %s, %s)"] * len(bills)),
+                headers
+            )
+            bill_ids = self.backend.inserted_ids(cursor, len(bills))
+            self._insert_lines(cursor, bill_ids, lines)
+            self.update_rollups(cursor, bill_ids)
+            self._sell_stock(cursor, bill_ids)
+        for bill, bill_id in zip(bills, bill_ids):
+            bill.id = bill_id
+        return len(bills)
+
+    def _resolve_customers(self, cursor, bills):
+        """Map each (name, phone) in `bills` to a customer id, creating the
+        missing customers with a single multi-row upsert."""
+        ids = {}
+        missing = {}
+        for bill in bills:
+            key = (bill.customer.name, bill.customer.phone)
+            if key in ids or key in missing:
+                continue
+            customer_id = self.customer_ids.get(key)
+            if customer_id is None:
+                missing[key] = bill.customer.email
+            else:
+                ids[key] = customer_id
+        if not missing:
+            return ids
+
+        cursor.execute(
+            "INSERT INTO customers (name, email, phone) VALUES "
+            + ", ".join(["(%s, %s, %s)"] * len(missing))
+            + " " + self.backend.upsert("name, phone", id="id"),
+            [value for (name, phone), email in missing.items() for value in (name, email, phone)]
         )
-        result = self.cursor.fetchone()
-        if result:
-            return result['id']
-        self.cursor.execute(
-            "INSERT INTO customers (name, email, phone) VALUES (%s, %s, %s)",
-            (name, email, phone)
+        cursor.execute(
+            "SELECT id, name, phone FROM customers WHERE (name, phone) IN ("
+            + ", ".join(["(%s, %s)"] * len(missing)) + ")",
+            [value for key in missing for value in key]
         )
-        self.conn.commit()
-        return self.cursor.lastrowid
+        found = {(row["name"], row["phone"]): row["id"] for row in cursor.fetchall()}
+        for key in missing:
+            customer_id = found.get(key)
+            if customer_id is None:
+                # The column collation matched a row spelled differently
+                # (case, accents, trailing spaces); let MySQL pick it.
+                cursor.execute("SELECT id FROM customers WHERE name=%s AND phone=%s", key)
+                customer_id = cursor.fetchone()["id"]
+            ids[key] = customer_id
+            self.customer_ids.put(key, customer_id)
+        return ids
 
-    def add_bill(self, customer_id, items_json, total):
-        self.cursor.execute(
-            "INSERT INTO bills (customer_id, items, total) VALUES (%s, %s, %s)",
-            (customer_id, items_json, total)
+    def update_bill(self, bill_id, items, total):
+        """Replace a bill's lines and its total (in paise). Stock moves by
+        the difference between what the ledger shows the bill took out and
+        what its new lines sell."""
+        with self.transaction() as cursor:
+            self.update_rollups(cursor, [bill_id], -1)
+            taken = self._stock_taken(cursor, [bill_id])
+            cursor.execute("DELETE FROM bill_items WHERE bill_id=%s", (bill_id,))
+            self._insert_items(cursor, bill_id, items)
+            cursor.execute(
+                "UPDATE bills SET items=NULL, total=%s, version=version+1 WHERE id=%s",
+                (paise_to_decimal(total), bill_id)
+            )
+            self.update_rollups(cursor, [bill_id])
+            sold = self._stock_sold(cursor, [bill_id])
+            self._move_stock(cursor, {
+                key: taken.get(key, 0) - sold.get(key, 0) for key in taken.keys() | sold.keys()
+            }, STOCK_BILL_EDIT)
+        self._forget_bill(bill_id)
+
+    def _insert_items(self, cursor, bill_id, items):
+        from utils.line_items import LineItems
+        self._insert_lines(cursor, [bill_id], LineItems.from_line_items([items]))
+
+    def _insert_lines(self, cursor, bill_ids, lines):
+        """Write the lines of bills `bill_ids` (in LineItems order) to bill_items."""
+        cursor.executemany(
+            """INSERT INTO bill_items (bill_id, line_no, item, quantity, price, line_total)
+               VALUES (%s, %s, %s, %s, %s, %s)""",
+            self.line_rows(bill_ids, lines)
+        )
+
+    @staticmethod
+    def line_rows(bill_ids, lines):
+        names = lines.names
+        quantity = lines.quantity.tolist()
+        price = lines.price.tolist()
+        line_total = lines.line_totals().tolist()
+        offsets = lines.offsets.tolist()
+        return [
+            (bill_id, i - offsets[n], names[i], quantity[i],
+             paise_to_decimal(price[i]), paise_to_decimal(line_total[i]))
+            for n, bill_id in enumerate(bill_ids)
+            for i in range(offsets[n], offsets[n + 1])
+        ]
+
+    def backfill(self, query, apply, batch_size=MIGRATION_BATCH_SIZE, progress=None):
+        """Run `apply(cursor, rows)` over the bills `query` selects, one
+        committed batch at a time, and return the number of rows done.
+
+        `query` must select `id` and end in `WHERE id > %s AND ...`, so that
+        batches walk the primary key: only `batch_size` rows are held in
+        memory and locked at once, and a backfill that is stopped resumes
+        with the rows it had not reached.
+        """
+        done = 0
+        last_id = 0
+        while True:
+            with self.transaction() as cursor:
+                cursor.execute(query + " ORDER BY id LIMIT %s", (last_id, batch_size))
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                apply(cursor, rows)
+            done += len(rows)
+            last_id = rows[-1]["id"]
+            if progress:
+                progress(done)
+        return done
+
+    def migrate_json_items(self, batch_size=MIGRATION_BATCH_SIZE, progress=None):
+        """Move line items from the legacy bills.items JSON column into
+        bill_items. Returns the number of bills migrated."""
+        from utils.line_items import LineItems
+        return self.backfill(
+            "SELECT id, items FROM bills WHERE id > %s AND items IS NOT NULL",
+            lambda cursor, rows: self._replace_lines(
+                cursor, rows, LineItems.from_bills(json.loads(row["items"]) for row in rows), "items"
+            ),
+            batch_size, progress
+        )
+
+    def migrate_item_columns(self, batch_size=MIGRATION_BATCH_SIZE, progress=None):
+        """Move the single line item that databases set up from the old
+        scheema.sql keep in bills.item, quantity and price into bill_items.
+        The emptied columns are left in place: dropping them would rebuild
+        the whole table. Returns the number of bills migrated."""
+        from utils.line_items import LineItems
+        with self.transaction(write=False) as cursor:
+            if not self.backend.column_exists(cursor, "bills", "item"):
+                return 0
+        return self.backfill(
+            """SELECT id, item, COALESCE(quantity, 1) AS quantity, COALESCE(price, 0) AS price
+               FROM bills WHERE id > %s AND item IS NOT NULL""",
+            lambda cursor, rows: self._replace_lines(
+                cursor, rows,
+                LineItems.from_bills([(row["item"], row["quantity"], row["price"])] for row in rows),
+                "item"
+            ),
+            batch_size, progress
         )
-        self.conn.commit()
-        return self.cursor.lastrowid
 
-    def update_bill(self, bill_id, items_json, total):
-        query = "UPDATE bills SET items=%s, total=%s WHERE id=%s"
-        self.cursor.execute(query, (items_json, total, bill_id))
-        self.conn.commit()
+    def _replace_lines(self, cursor, rows, lines, legacy_column):
+        """Write `lines` as the bill_items of bills `rows`, then clear the
+        legacy column they came from, keeping the item rollups in step."""
+        ids = [row["id"] for row in rows]
+        placeholders = ", ".join(["%s"] * len(ids))
+        self._roll_up_items(cursor, ids, -1)
+        cursor.execute(f"DELETE FROM bill_items WHERE bill_id IN ({placeholders})", ids)
+        self._insert_lines(cursor, ids, lines)
+        cursor.execute(f"UPDATE bills SET {legacy_column}=NULL WHERE id IN ({placeholders})", ids)
+        self._roll_up_items(cursor, ids)
 
     def delete_bill(self, bill_id):
-        self.cursor.execute("DELETE FROM bills WHERE id=%s", (bill_id,))
-        self.conn.commit()
+        with self.transaction() as cursor:
+            self.update_rollups(cursor, [bill_id], -1)
+            self._move_stock(cursor, self._stock_taken(cursor, [bill_id]), STOCK_BILL_DELETE)
+            cursor.execute("DELETE FROM bills WHERE id=%s", (bill_id,))
+        self._forget_bill(bill_id)
 
-    def get_all_bills(self):
-        self.cursor.execute("""
-            SELECT b.id, c.name, c.phone, c.email, b.items, b.total, b.created_at AS date
-            FROM bills b
-            JOIN customers c ON b.customer_id = c.id
-            ORDER BY b.created_at DESC
+    def get_bill(self, bill_id):
+        """The bill with this id as it is saved now, or None. Recently opened
+        bills are kept in memory, so reopening one for a reprint or
+        correction costs one primary key lookup of its version instead of
+        reading its lines; a bill edited since, here or on another counter,
+        is read again. Each call returns a new copy, which the caller may
+        change."""
+        cached = self.bills.get(bill_id)
+        if cached is not None:
+            with self.transaction(write=False) as cursor:
+                cursor.execute("SELECT version FROM bills WHERE id = %s", (bill_id,))
+                row = cursor.fetchone()
+            if row is not None and row["version"] == cached[0]:
+                return cached[1].copy()
+        writes = self.bill_writes
+        with self.transaction(write=False) as cursor:
+            cursor.execute("SELECT version FROM bills WHERE id = %s", (bill_id,))
+            row = cursor.fetchone()
+            cursor.execute(BILL_SELECT + " WHERE b.id = %s", (bill_id,))
+            bills = self._decode_bills(cursor.fetchall())
+            self._attach_items(cursor, bills)
+        if not bills:
+            self.bills.pop(bill_id)
+            return None
+        with self.bill_lock:
+            if writes == self.bill_writes:
+                self.bills.put(bill_id, (row["version"], bills[0]))
+        return bills[0].copy()
+
+    def bill_cache_stats(self):
+        return self.bills.stats()
+
+    def _forget_bill(self, bill_id):
+        with self.bill_lock:
+            self.bill_writes += 1
+            self.bills.pop(bill_id)
+
+    def _stock_sold(self, cursor, bill_ids):
+        """{(bill_id, product_id): quantity} of the catalog products on the
+        given bills; lines that name no product are not stocked."""
+        placeholders = ", ".join(["%s"] * len(bill_ids))
+        cursor.execute(f"""
+            SELECT i.bill_id, p.id AS product_id, SUM(i.quantity) AS quantity
+            FROM bill_items i
+            JOIN products p ON p.name = i.item
+            WHERE i.bill_id IN ({placeholders})
+            GROUP BY i.bill_id, p.id
+        """, bill_ids)
+        return {(row["bill_id"], row["product_id"]): int(row["quantity"]) for row in cursor.fetchall()}
+
+    def _stock_taken(self, cursor, bill_ids):
+        """{(bill_id, product_id): quantity} the stock_movements ledger shows
+        the given bills have taken out of stock so far. Edits and deletes
+        put back exactly this, so a line sold before its product was in the
+        catalog, or under a name the product has since dropped, is never
+        credited back for stock it did not take."""
+        placeholders = ", ".join(["%s"] * len(bill_ids))
+        cursor.execute(f"""
+            SELECT bill_id, product_id, SUM(qty_change) AS qty_change
+            FROM stock_movements
+            WHERE bill_id IN ({placeholders})
+            GROUP BY bill_id, product_id
+        """, bill_ids)
+        return {(row["bill_id"], row["product_id"]): -int(row["qty_change"]) for row in cursor.fetchall()}
+
+    def _sell_stock(self, cursor, bill_ids):
+        """Take the new bills' products out of stock, inside the caller's
+        transaction."""
+        sold = self._stock_sold(cursor, bill_ids)
+        self._move_stock(cursor, {key: -quantity for key, quantity in sold.items()}, STOCK_SALE)
+
+    def _move_stock(self, cursor, changes, reason):
+        """Record {(bill_id, product_id): qty_change} in the ledger and apply
+        it to stock, inside the caller's transaction.
+
+        Each product's level moves with one atomic upsert, which creates the
+        stock row if the product has none and locks only that row until
+        commit: counters selling different products never wait for each
+        other. Rows are written in product order, so counters selling the
+        same products queue instead of deadlocking.
+        """
+        changes = {key: change for key, change in changes.items() if change}
+        if not changes:
+            return
+        cursor.executemany(
+            "INSERT INTO stock_movements (bill_id, product_id, qty_change, reason) VALUES (%s, %s, %s, %s)",
+            [(bill_id, product_id, change, reason) for (bill_id, product_id), change in changes.items()]
+        )
+        by_product = {}
+        for (_, product_id), change in changes.items():
+            by_product[product_id] = by_product.get(product_id, 0) + change
+        cursor.executemany(
+            "INSERT INTO stock (product_id, qty) VALUES (%s, %s) "
+            + self.backend.upsert("product_id", qty="stock.qty + {new}"),
+            [(product_id, change) for product_id, change in sorted(by_product.items()) if change]
+        )
+
+    def _add_stock_rows(self, cursor):
+        """Give every product without one a stock row, starting at zero."""
+        cursor.execute("""
+            INSERT INTO stock (product_id)
+            SELECT p.id FROM products p
+            LEFT JOIN stock s ON s.product_id = p.id
+            WHERE s.product_id IS NULL
         """)
-        return self.cursor.fetchall()
+
+    def adjust_stock(self, changes, reason=STOCK_ADJUSTMENT):
+        """Apply (product name, quantity change) pairs, e.g. deliveries or
+        stocktake corrections, in one transaction. Raises ValueError naming
+        any product that is not in the catalog, without changing anything.
+        Returns the number of products changed."""
+        totals = {}
+        for name, change in changes:
+            totals[name] = totals.get(name, 0) + change
+        if not totals:
+            return 0
+        with self.transaction() as cursor:
+            placeholders = ", ".join(["%s"] * len(totals))
+            cursor.execute(f"SELECT id, name FROM products WHERE name IN ({placeholders})", list(totals))
+            # Matched like the column's collation would, ignoring case.
+            ids = {row["name"].casefold(): row["id"] for row in cursor.fetchall()}
+            unknown = [name for name in totals if name.casefold() not in ids]
+            if unknown:
+                raise ValueError(f"Not in the product catalog: {', '.join(unknown)}")
+            by_product = {}
+            for name, change in totals.items():
+                key = (None, ids[name.casefold()])
+                by_product[key] = by_product.get(key, 0) + change
+            self._move_stock(cursor, by_product, reason)
+        return len(by_product)
+
+    def get_stock(self):
+        """Stock on hand of every product, by name."""
+        with self.transaction(write=False) as cursor:
+            cursor.execute("""
+                SELECT p.name, s.qty
+                FROM stock s
+                JOIN products p ON p.id = s.product_id
+                ORDER BY p.name
+            """)
+            return cursor.fetchall()
+
+    def update_rollups(self, cursor, bill_ids, sign=1):
+        """Add (sign=1) or take away (sign=-1) the given bills' totals and
+        lines in the sales rollups, inside the caller's transaction.
+
+        Call it after writing a bill, and before changing or deleting one,
+        so the rollups always match the bills that exist. Line items that
+        still sit in the legacy bills.items column are only counted once
+        migrate_json_items moves them into bill_items.
+
+        Every bill saved today would otherwise update the same sales_daily
+        row, and every bill selling a popular item the same sales_item_daily
+        row, and wait for the one before it to commit. So each rollup key
+        has up to ROLLUP_SHARDS rows a day and a bill adds itself to the one
+        its id picks; editing or deleting it later finds the same rows.
+        """
+        add_daily = self.backend.upsert(
+            "day, shard", bills="sales_daily.bills + {new}", revenue="sales_daily.revenue + {new}"
+        )
+        add_customer_daily = self.backend.upsert(
+            "day, customer_id, shard",
+            bills="sales_customer_daily.bills + {new}", revenue="sales_customer_daily.revenue + {new}"
+        )
+        for shard, ids in self._rollup_shards(bill_ids):
+            placeholders = ", ".join(["%s"] * len(ids))
+            cursor.execute(f"""
+                INSERT INTO sales_daily (day, shard, bills, revenue)
+                SELECT DATE(created_at), %s, %s * COUNT(*), %s * SUM(ROUND(total, 2))
+                FROM bills
+                WHERE id IN ({placeholders})
+                GROUP BY DATE(created_at)
+                {add_daily}
+            """, (shard, sign, sign, *ids))
+            cursor.execute(f"""
+                INSERT INTO sales_customer_daily (day, customer_id, shard, bills, revenue)
+                SELECT DATE(created_at), customer_id, %s, %s * COUNT(*), %s * SUM(ROUND(total, 2))
+                FROM bills
+                WHERE id IN ({placeholders})
+                GROUP BY DATE(created_at), customer_id
+                {add_customer_daily}
+            """, (shard, sign, sign, *ids))
+        self._roll_up_items(cursor, bill_ids, sign)
+
+    @staticmethod
+    def _rollup_shards(bill_ids):
+        """The bills grouped by the rollup shard their id picks, in shard
+        order so that transactions take the rows' locks in the same order."""
+        shards = {}
+        for bill_id in bill_ids:
+            shards.setdefault(bill_id % ROLLUP_SHARDS, []).append(bill_id)
+        return sorted(shards.items())
+
+    def _roll_up_items(self, cursor, bill_ids, sign=1):
+        add_item_daily = self.backend.upsert(
+            "day, item, shard",
+            quantity="sales_item_daily.quantity + {new}", revenue="sales_item_daily.revenue + {new}"
+        )
+        for shard, ids in self._rollup_shards(bill_ids):
+            placeholders = ", ".join(["%s"] * len(ids))
+            cursor.execute(f"""
+                INSERT INTO sales_item_daily (day, item, shard, quantity, revenue)
+                SELECT DATE(b.created_at), i.item, %s, %s * SUM(i.quantity), %s * SUM(i.line_total)
+                FROM bill_items i
+                JOIN bills b ON b.id = i.bill_id
+                WHERE i.bill_id IN ({placeholders})
+                GROUP BY DATE(b.created_at), i.item
+                {add_item_daily}
+            """, (shard, sign, sign, *ids))
+
+    def rebuild_rollups(self):
+        """Recompute the sales rollups from scratch, dropping the empty rows
+        that edits and deletes leave behind. Safe to run at any time, e.g.
+        nightly; readers see the old rollups until it commits."""
+        with self.transaction() as cursor:
+            self._rebuild_rollups(cursor)
+
+    def _rebuild_rollups(self, cursor):
+        cursor.execute("DELETE FROM sales_daily")
+        cursor.execute("DELETE FROM sales_customer_daily")
+        cursor.execute("DELETE FROM sales_item_daily")
+        cursor.execute("""
+            INSERT INTO sales_daily (day, shard, bills, revenue)
+            SELECT DATE(created_at), 0, COUNT(*), SUM(ROUND(total, 2))
+            FROM bills
+            GROUP BY DATE(created_at)
+        """)
+        cursor.execute("""
+            INSERT INTO sales_customer_daily (day, customer_id, shard, bills, revenue)
+            SELECT DATE(created_at), customer_id, 0, COUNT(*), SUM(ROUND(total, 2))
+            FROM bills
+            GROUP BY DATE(created_at), customer_id
+        """)
+        cursor.execute("""
+            INSERT INTO sales_item_daily (day, item, shard, quantity, revenue)
+            SELECT DATE(b.created_at), i.item, 0, SUM(i.quantity), SUM(i.line_total)
+            FROM bill_items i
+            JOIN bills b ON b.id = i.bill_id
+            GROUP BY DATE(b.created_at), i.item
+        """)
+
+    def get_bills_page(self, after=None, limit=BILL_PAGE_SIZE):
+        """Return up to `limit` bills, newest first, that sort after the
+        (created_at, id) key of the last bill on the previous page."""
+        return self._fetch_bills_page(BILL_SELECT, (), after, limit)
+
+    def search_bills(self, keyword, after=None, limit=BILL_PAGE_SIZE):
+        """Return a page of bills whose customer name or phone starts with
+        `keyword`, or whose items contain words starting with it.
+
+        Each branch of the UNION is answered from its own index, so the cost
+        depends on the number of hits rather than on the size of the history.
+        Words inside customer names match too once their FULLTEXT index has
+        been built (see NAME_WORDS_MIGRATION).
+        """
+        keyword = keyword.strip()
+        words = re.findall(r"\w+", keyword)
+        if not words:
+            return []
+        prefix = keyword.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        fulltext = self.backend.word_pattern(words)
+        like, match = self.backend.like, self.backend.word_match
+        params = (prefix, prefix)
+        name_words = ""
+        if NAME_WORDS_MIGRATION in self.applied:
+            name_words = f"""
+                SELECT b.id FROM customers c JOIN bills b ON b.customer_id = c.id
+                WHERE {match("c.name")}
+                UNION"""
+            params += (fulltext,)
+        query = f"""
+            SELECT b.id, b.customer_id, c.name, c.phone, c.email, b.items, b.total, b.created_at
+            FROM (
+                SELECT b.id FROM customers c JOIN bills b ON b.customer_id = c.id
+                WHERE {like("c.name")}
+                UNION
+                SELECT b.id FROM customers c JOIN bills b ON b.customer_id = c.id
+                WHERE {like("c.phone")}
+                UNION{name_words}
+                SELECT bill_id FROM bill_items WHERE {match("item")}
+            ) hits
+            JOIN bills b ON b.id = hits.id
+            JOIN customers c ON b.customer_id = c.id
+        """
+        return self._fetch_bills_page(query, params + (fulltext,), after, limit)
+
+    def _fetch_bills_page(self, query, params, after, limit):
+        if after is not None:
+            query += " WHERE b.created_at < %s OR (b.created_at = %s AND b.id < %s)"
+            params += (after[0], after[0], after[1])
+        query += " ORDER BY b.created_at DESC, b.id DESC LIMIT %s"
+
+        with self.transaction(write=False) as cursor:
+            cursor.execute(query, params + (limit,))
+            rows = cursor.fetchmany(limit)
+            bills = self._decode_bills(rows)
+            self._attach_items(cursor, bills)
+        return bills
+
+    def _attach_items(self, cursor, bills):
+        """Load the lines of a page of bills with one query on bill_items."""
+        pending = {bill.id: bill for bill in bills if bill.items is None}
+        if not pending:
+            return
+        cursor.execute(
+            """SELECT bill_id, item, quantity, price FROM bill_items
+               WHERE bill_id IN (%s) ORDER BY bill_id, line_no""" % ", ".join(["%s"] * len(pending)),
+            tuple(pending)
+        )
+        for bill in pending.values():
+            bill.items = []
+        for row in cursor.fetchall():
+            pending[row["bill_id"]].items.append(LineItem(row["item"], row["quantity"], to_paise(row["price"])))
+
+    def iter_bills(self, page_size=BILL_PAGE_SIZE):
+        """Walk the whole bill history one keyset page at a time."""
+        after = None
+        while True:
+            page = self.get_bills_page(after, page_size)
+            yield from page
+            if len(page) < page_size:
+                return
+            after = self.page_key(page[-1])
+
+    def count_bills(self, start=None, end=None):
+        where, params = self._date_range(start, end)
+        with self.transaction(write=False) as cursor:
+            cursor.execute(f"SELECT COUNT(*) AS n FROM bills b {where}", params)
+            return cursor.fetchone()["n"]
+
+    def sales_by_day(self, start=None, end=None):
+        """Bill count and revenue for each day in [start, end) with sales."""
+        where, params = self._date_range(start, end, "day")
+        with self.transaction(write=False) as cursor:
+            cursor.execute(f"""
+                SELECT day, SUM(bills) AS bills, SUM(revenue) AS revenue
+                FROM sales_daily
+                {where}
+                GROUP BY day
+                ORDER BY day
+            """, params)
+            return cursor.fetchall()
+
+    def sales_by_month(self, start=None, end=None):
+        """Like sales_by_day, one row per month; "day" is the month's first day."""
+        months = {}
+        # At most one row per day, so folding them here is cheap.
+        for row in self.sales_by_day(start, end):
+            month = row["day"].replace(day=1)
+            totals = months.setdefault(month, {"day": month, "bills": 0, "revenue": 0})
+            totals["bills"] += row["bills"]
+            totals["revenue"] += row["revenue"]
+        return list(months.values())
+
+    def top_customers(self, start=None, end=None, limit=REPORT_TOP_N):
+        where, params = self._date_range(start, end, "s.day")
+        with self.transaction(write=False) as cursor:
+            cursor.execute(f"""
+                SELECT c.name, c.phone, SUM(s.bills) AS bills, SUM(s.revenue) AS revenue
+                FROM sales_customer_daily s
+                JOIN customers c ON c.id = s.customer_id
+                {where}
+                GROUP BY s.customer_id, c.name, c.phone
+                HAVING SUM(s.bills) > 0
+                ORDER BY SUM(s.revenue) DESC
+                LIMIT %s
+            """, params + (limit,))
+            return cursor.fetchall()
+
+    def top_items(self, start=None, end=None, limit=REPORT_TOP_N):
+        where, params = self._date_range(start, end, "day")
+        with self.transaction(write=False) as cursor:
+            cursor.execute(f"""
+                SELECT item, SUM(quantity) AS quantity, SUM(revenue) AS revenue
+                FROM sales_item_daily
+                {where}
+                GROUP BY item
+                HAVING SUM(quantity) > 0
+                ORDER BY SUM(revenue) DESC
+                LIMIT %s
+            """, params + (limit,))
+            return cursor.fetchall()
+
+    def get_products(self, since=None):
+        """Every active Product, or with `since`, every product changed at or
+        after that time, discontinued ones included, so a cached catalog can
+        be brought up to date. Timestamps have one-second resolution, hence
+        "at or after": a change in the same second as the last refresh is
+        fetched again rather than missed."""
+        with self.transaction(write=False) as cursor:
+            if since is None:
+                cursor.execute(f"SELECT {PRODUCT_COLUMNS} FROM products WHERE active")
+            else:
+                cursor.execute(f"SELECT {PRODUCT_COLUMNS} FROM products WHERE updated_at >= %s", (since,))
+            return [Product.from_row(row) for row in cursor.fetchall()]
+
+    def save_products(self, products, batch_size=IMPORT_BATCH_SIZE):
+        """Add or reprice (name, price in paise) pairs, reactivating any that
+        were discontinued. Commits once per batch; returns the number saved."""
+        saved = 0
+        batch = []
+        for name, price in products:
+            batch.append((name, paise_to_decimal(price)))
+            if len(batch) >= batch_size:
+                saved += self._save_product_batch(batch)
+                batch = []
+        if batch:
+            saved += self._save_product_batch(batch)
+        return saved
+
+    def _save_product_batch(self, rows):
+        with self.transaction() as cursor:
+            cursor.executemany(
+                "INSERT INTO products (name, price) VALUES (%s, %s) "
+                + self.backend.upsert("name", price="{new}", active="TRUE"),
+                rows
+            )
+            self._add_stock_rows(cursor)
+        return len(rows)
+
+    def discontinue_product(self, name):
+        with self.transaction() as cursor:
+            cursor.execute("UPDATE products SET active = FALSE WHERE name = %s", (name,))
+            return cursor.rowcount
+
+    def iter_bill_range(self, start=None, end=None, chunk_size=EXPORT_CHUNK_SIZE, with_items=False):
+        """Yield bills created in [start, end), oldest first, reading
+        `chunk_size` rows per query. Line items are only loaded when
+        `with_items` is set; otherwise `items` may be None."""
+        where, params = self._date_range(start, end)
+        keyset = " AND " if where else " WHERE "
+        after = None
+        while True:
+            query = BILL_SELECT + where
+            page_params = params
+            if after is not None:
+                query += keyset + "(b.created_at > %s OR (b.created_at = %s AND b.id > %s))"
+                page_params = params + (after[0], after[0], after[1])
+            query += " ORDER BY b.created_at, b.id LIMIT %s"
+            with self.transaction(write=False) as cursor:
+                cursor.execute(query, page_params + (chunk_size,))
+                bills = self._decode_bills(cursor.fetchmany(chunk_size))
+                if with_items:
+                    self._attach_items(cursor, bills)
+            yield from bills
+            if len(bills) < chunk_size:
+                return
+            after = self.page_key(bills[-1])
+
+    @staticmethod
+    def _date_range(start, end, column="b.created_at"):
+        clauses, params = [], ()
+        if start is not None:
+            clauses.append(f"{column} >= %s")
+            params += (start,)
+        if end is not None:
+            clauses.append(f"{column} < %s")
+            params += (end,)
+        return ("WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    def get_all_bills(self):
+        return list(self.iter_bills())
+
+    @staticmethod
+    def page_key(bill):
+        return bill.created_at, bill.id
+
+    @staticmethod
+    def _decode_bills(rows):
+        """Turn BILL_SELECT rows into Bills; bills of the same customer
+        share one Customer."""
+        customers = {}
+        bills = []
+        for row in rows:
+            customer = customers.get(row["customer_id"])
+            if customer is None:
+                customer = Customer(row["customer_id"], row["name"], row["phone"], row["email"])
+                customers[customer.id] = customer
+            # Bills saved before bill_items existed keep their lines as JSON
+            # until migrate_json_items has moved them.
+            items = row["items"]
+            if items is not None:
+                items = [LineItem(name, qty, to_paise(price)) for name, qty, price in json.loads(items)]
+            bills.append(Bill(row["id"], customer, items, to_paise(row["total"]), row["created_at"]))
+        return bills
 
     def close(self):
-        self.cursor.close()
-        self.conn.close()
+        if self._backend is not None:
+            self._backend.close()
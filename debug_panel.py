@@ -0,0 +1,79 @@
+from PySide6.QtCore import Qt, QTimer
+from PySide6.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QLabel, QTableWidget, QTableWidgetItem, QHeaderView, QPushButton
+)
+
+from utils import metrics
+
+METRICS_COLUMNS = ["Operation", "Count", "p50 ms", "p95 ms", "p99 ms", "Max ms"]
+PANEL_REFRESH_MS = 1000
+
+
+class MetricsPanel(QDialog):
+    """Live latency percentiles, query counts and cache hit rates."""
+    def __init__(self, db, parent=None):
+        super().__init__(parent)
+        self.db = db
+        self.setWindowTitle("Performance")
+        self.resize(760, 520)
+
+        self.table = QTableWidget(0, len(METRICS_COLUMNS))
+        self.table.setHorizontalHeaderLabels(METRICS_COLUMNS)
+        self.table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        self.table.verticalHeader().setVisible(False)
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.table.setSortingEnabled(True)
+        self.summary = QLabel()
+
+        dump_btn = QPushButton("Save Snapshot")
+        dump_btn.setEnabled(metrics.DUMP_PATH is not None)
+        dump_btn.setToolTip(f"Write the metrics to {metrics.DUMP_PATH}" if metrics.DUMP_PATH else "Set BILLING_METRICS_FILE to enable")
+        dump_btn.clicked.connect(lambda: metrics.dump(metrics.DUMP_PATH))
+        footer = QHBoxLayout()
+        footer.addWidget(self.summary)
+        footer.addStretch()
+        footer.addWidget(dump_btn)
+
+        layout = QVBoxLayout(self)
+        if not metrics.ENABLED:
+            layout.addWidget(QLabel("Timing is off. Start the app with BILLING_METRICS=1 to record it."))
+        layout.addWidget(self.table)
+        layout.addLayout(footer)
+
+        self.timer = QTimer(self)
+        self.timer.setInterval(PANEL_REFRESH_MS)
+        self.timer.timeout.connect(self.refresh)
+        self.refresh()
+
+    def showEvent(self, event):
+        self.timer.start()
+        super().showEvent(event)
+
+    def hideEvent(self, event):
+        self.timer.stop()
+        super().hideEvent(event)
+
+    def refresh(self):
+        data = metrics.snapshot()
+        self.table.setSortingEnabled(False)
+        self.table.setRowCount(len(data["timings"]))
+        for row, (name, stats) in enumerate(data["timings"].items()):
+            self.table.setItem(row, 0, QTableWidgetItem(name))
+            self.set_number(row, 1, stats["count"])
+            for column, key in enumerate(("p50", "p95", "p99", "max"), start=2):
+                self.set_number(row, column, round(stats[key] * 1000, 2))
+        self.table.setSortingEnabled(True)
+
+        bills = self.db.bill_cache_stats()
+        customers = self.db.customer_ids.stats()
+        self.summary.setText(
+            f"Queries: {data['counters'].get('db.queries', 0)}   "
+            f"Bill cache: {bills['hits']} hits / {bills['misses']} misses ({bills['size']}/{bills['maxsize']})   "
+            f"Customer cache: {customers['hits']} hits / {customers['misses']} misses"
+        )
+
+    def set_number(self, row, column, value):
+        item = QTableWidgetItem()
+        # Sorts numerically, unlike text.
+        item.setData(Qt.DisplayRole, value)
+        self.table.setItem(row, column, item)
@@ -1,55 +1,76 @@
 import sys
 import re
-import json
 import datetime
 
 from functools import partial
-from fpdf import FPDF
 
 from PySide6.QtWidgets import (
     QApplication, QMainWindow, QMessageBox, QFileDialog, QDialog, QVBoxLayout,
     QTableWidgetItem, QLineEdit, QTableWidget, QPushButton, QStyledItemDelegate,
-    QLabel, QSizePolicy, QHeaderView
+    QLabel, QSizePolicy, QHeaderView, QAbstractItemView, QFormLayout, QCheckBox,
+    QDateEdit, QDialogButtonBox, QProgressDialog
 )
-from PySide6.QtGui import QIntValidator, QDoubleValidator
-from PySide6.QtCore import Qt
+from PySide6.QtGui import QKeySequence, QShortcut
+from PySide6.QtCore import Qt, QDate, QTimer
 
 from db import DBHandler
+from dashboard import DashboardTotals
+from catalog import ProductCatalog
+from bill_entry import BillItemsModel, ItemCompleter, parse_items_text, price_validator, quantity_validator
+from bill_view import BillTableModel, BillSortProxyModel, ViewButtonDelegate, BillRole, ACTION_COLUMN
+from search import BillSearcher
+from workers import DBWorker, SummaryExportTask
+from utils.money import to_paise, format_paise
+from models.bill import Bill, LineItem
+from models.customer import Customer
 from ui_main import Ui_MainWindow
+from debug_panel import MetricsPanel
+from utils import metrics
 
 EMAIL_REGEX = r'^[\w\.-]+@[\w\.-]+\.\w{2,4}$'
+DASHBOARD_REFRESH_MS = 60 * 1000
+METRICS_DUMP_MS = 60 * 1000
 
 
 class NumericDelegate(QStyledItemDelegate):
-    """Allows only integers for quantity and floats for price in the table."""
+    """Allows only the quantities and prices parse_items_text accepts, and
+    completes item names from `catalog` if one is given."""
+    def __init__(self, parent=None, catalog=None):
+        super().__init__(parent)
+        self.catalog = catalog
+
     def createEditor(self, parent, option, index):
         editor = QLineEdit(parent)
-        if index.column() == 1:
-            editor.setValidator(QIntValidator(1, 9999, parent))
+        if index.column() == 0 and self.catalog is not None:
+            completer = ItemCompleter(self.catalog, editor)
+            editor.setCompleter(completer)
+            editor.textEdited.connect(completer.update_prefix)
+            # Picking a product commits it straight away, which fills in its price.
+            completer.activated.connect(lambda _: self.commitData.emit(editor))
+        elif index.column() == 1:
+            editor.setValidator(quantity_validator(parent))
         elif index.column() == 2:
-            validator = QDoubleValidator(0.0, 999999.99, 2, parent)
-            validator.setNotation(QDoubleValidator.StandardNotation)
-            editor.setValidator(validator)
+            editor.setValidator(price_validator(parent))
         return editor
 
 
 class EditItemDialog(QDialog):
-    """Dialog to allow users to edit bill items."""
-    def __init__(self, bill, db_handler):
+    """Dialog to allow users to edit bill items; the caller saves `updated_items`."""
+    def __init__(self, bill):
         super().__init__()
         self.setWindowTitle("Edit Bill Items")
         self.bill = bill
-        self.db_handler = db_handler
+        self.updated_items = None
 
         self.layout = QVBoxLayout(self)
-        self.table = QTableWidget(len(bill['items']), 3)
+        self.table = QTableWidget(len(bill.items), 3)
         self.table.setHorizontalHeaderLabels(['Item Name', 'Quantity', 'Price'])
         self.table.setItemDelegate(NumericDelegate(self.table))
 
-        for i, (item, qty, price) in enumerate(bill['items']):
-            self.table.setItem(i, 0, QTableWidgetItem(item))
-            self.table.setItem(i, 1, QTableWidgetItem(str(qty)))
-            self.table.setItem(i, 2, QTableWidgetItem(f"{price:.2f}"))
+        for i, item in enumerate(bill.items):
+            self.table.setItem(i, 0, QTableWidgetItem(item.name))
+            self.table.setItem(i, 1, QTableWidgetItem(str(item.quantity)))
+            self.table.setItem(i, 2, QTableWidgetItem(format_paise(item.price)))
 
         self.layout.addWidget(self.table)
 
@@ -63,23 +84,53 @@ class EditItemDialog(QDialog):
             try:
                 name = self.table.item(row, 0).text().strip()
                 qty = int(self.table.item(row, 1).text())
-                price = float(self.table.item(row, 2).text())
+                price = to_paise(self.table.item(row, 2).text())
                 if not name:
                     raise ValueError("Item name is empty")
-                updated_items.append((name, qty, price))
+                updated_items.append(LineItem(name, qty, price))
             except Exception as e:
                 QMessageBox.warning(self, "Invalid Data", f"Error at row {row + 1}: {e}")
                 return
 
-        try:
-            total = sum(q * p for _, q, p in updated_items)
-            self.db_handler.update_bill(self.bill['id'], json.dumps(updated_items), total)
-            self.bill['items'] = updated_items
-            self.bill['total'] = total
-            QMessageBox.information(self, "Updated", "Bill updated successfully.")
-            self.accept()
-        except Exception as e:
-            QMessageBox.critical(self, "Database Error", f"Failed to update: {e}")
+        self.updated_items = updated_items
+        self.accept()
+
+
+class ExportDialog(QDialog):
+    """Asks which dates an "Export All Bills" summary should cover."""
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Export Bills")
+        layout = QFormLayout(self)
+
+        today = QDate.currentDate()
+        self.all_dates = QCheckBox("All dates")
+        self.all_dates.setChecked(True)
+        self.from_date = QDateEdit(QDate(today.year(), today.month(), 1))
+        self.to_date = QDateEdit(today)
+        for edit in (self.from_date, self.to_date):
+            edit.setCalendarPopup(True)
+            edit.setDisplayFormat("yyyy-MM-dd")
+            edit.setEnabled(False)
+        self.all_dates.toggled.connect(lambda checked: self.from_date.setEnabled(not checked))
+        self.all_dates.toggled.connect(lambda checked: self.to_date.setEnabled(not checked))
+
+        buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+
+        layout.addRow(self.all_dates)
+        layout.addRow("From", self.from_date)
+        layout.addRow("To", self.to_date)
+        layout.addRow(buttons)
+
+    def date_range(self):
+        """Return [start, end) as datetimes, or (None, None) for all dates."""
+        if self.all_dates.isChecked():
+            return None, None
+        start = datetime.datetime.combine(self.from_date.date().toPython(), datetime.time.min)
+        end = datetime.datetime.combine(self.to_date.date().addDays(1).toPython(), datetime.time.min)
+        return start, end
 
 
 class BillingApp(QMainWindow):
@@ -89,23 +140,70 @@ class BillingApp(QMainWindow):
         self.ui = Ui_MainWindow()
         self.ui.setupUi(self)
 
-        self.db = DBHandler()
-        self.bills = []
+        # Connect in the background so the window shows at once.
+        self.db = DBHandler(lazy=True)
+        self.worker = DBWorker(self)
+        self.bill_model = BillTableModel(self.db, self.worker, self)
+        self.bill_proxy = BillSortProxyModel(self)
+        self.bill_proxy.setSourceModel(self.bill_model)
+        self.catalog = ProductCatalog(self.db, self.worker, self)
+        self.items_model = BillItemsModel(self, self.catalog)
+        self.searcher = BillSearcher(self.db, self.worker, self)
+        self.export_task = None
+        self.totals = DashboardTotals()
 
         self.connect_signals()
         self.setup_ui()
+        self.statusBar().showMessage("Connecting to the database...")
+        self.worker.submit(self.db.open, on_success=self.on_db_ready, on_error=self.on_db_failed)
+
+    def on_db_ready(self, _):
+        self.statusBar().clearMessage()
+        self.load_dashboard()
+        self.catalog.start()
+
+    def on_db_failed(self, error):
+        self.statusBar().clearMessage()
+        QMessageBox.critical(self, "DB Error", f"Could not connect to the database:\n{error}")
 
     def setup_ui(self):
+        self.ui.table.setModel(self.items_model)
         self.ui.table.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
-        self.ui.table.verticalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+        # Fixed row heights; sizing rows to their contents re-measures every row on each edit.
+        self.ui.table.verticalHeader().setDefaultSectionSize(34)
         self.ui.table.horizontalHeader().setStretchLastSection(True)
-        self.ui.table.setItemDelegate(NumericDelegate())
-        self.ui.table.setColumnCount(3)
-        self.ui.table.setHorizontalHeaderLabels(["Item", "Quantity", "Price"])
-        self.ui.table.setEditTriggers(QTableWidget.AllEditTriggers)
+        self.ui.table.setItemDelegate(NumericDelegate(self.ui.table, self.catalog))
+        self.ui.table.setEditTriggers(QAbstractItemView.AllEditTriggers)
+        # Ctrl+V on the grid itself (not inside a cell editor) pastes whole lines.
+        self.paste_shortcut = QShortcut(QKeySequence.Paste, self.ui.table)
+        self.paste_shortcut.setContext(Qt.WidgetShortcut)
+        self.paste_shortcut.activated.connect(self.paste_items)
+        self.metrics_panel = None
+        self.metrics_shortcut = QShortcut(QKeySequence("Ctrl+Shift+M"), self)
+        self.metrics_shortcut.activated.connect(self.show_metrics)
+        if metrics.ENABLED and metrics.DUMP_PATH:
+            self.metrics_timer = QTimer(self)
+            self.metrics_timer.setInterval(METRICS_DUMP_MS)
+            self.metrics_timer.timeout.connect(lambda: metrics.dump(metrics.DUMP_PATH))
+            self.metrics_timer.start()
+
+        self.ui.bills_view.setModel(self.bill_proxy)
+        self.ui.bills_view.setSortingEnabled(True)
+        self.ui.bills_view.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.ui.bills_view.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.ui.bills_view.setMouseTracking(True)
+        self.ui.bills_view.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.ui.bills_view.verticalHeader().setDefaultSectionSize(34)
+        self.view_delegate = ViewButtonDelegate(self.ui.bills_view)
+        self.view_delegate.clicked.connect(self.on_view_clicked)
+        self.ui.bills_view.setItemDelegateForColumn(ACTION_COLUMN, self.view_delegate)
 
-        self.ui.label_total_bills.setText("Total Bills: 0")
-        self.ui.label_revenue.setText("Revenue: Rs.0.00")
+        self.update_dashboard()
+        # Keep "Today" and "This Month" right across midnight.
+        self.dashboard_timer = QTimer(self)
+        self.dashboard_timer.setInterval(DASHBOARD_REFRESH_MS)
+        self.dashboard_timer.timeout.connect(self.update_dashboard)
+        self.dashboard_timer.start()
         self.ui.total_label.setText("Total: Rs.0.00")
 
         footer_label = QLabel()
@@ -132,50 +230,77 @@ class BillingApp(QMainWindow):
         self.ui.add_row_btn.clicked.connect(self.add_row)
         self.ui.remove_row_btn.clicked.connect(self.remove_row)
         self.ui.calculate_btn.clicked.connect(self.calculate_total)
+        self.ui.import_items_btn.clicked.connect(self.import_items_file)
         self.ui.save_btn.clicked.connect(self.save_bill)
         self.ui.view_btn.clicked.connect(self.load_bills)
         self.ui.export_btn.clicked.connect(self.export_pdf)
-        self.ui.search_input.textChanged.connect(self.search_bills)
+        self.ui.reports_btn.clicked.connect(self.show_reports)
+        self.ui.search_input.textChanged.connect(self.searcher.search)
+        self.searcher.resultsReady.connect(self.show_search_results)
+        self.searcher.cleared.connect(self.load_bills)
+        self.searcher.failed.connect(lambda e: QMessageBox.critical(self, "Search Failed", e))
         self.ui.new_btn.clicked.connect(self.clear_form)
-        self.ui.table.itemChanged.connect(self.calculate_total)
+        self.items_model.totalChanged.connect(self.show_total)
+        self.catalog.failed.connect(lambda e: self.statusBar().showMessage(f"Could not load products: {e}", 5000))
+        self.bill_model.loadFailed.connect(lambda e: QMessageBox.critical(self, "DB Error", e))
 
     def add_row(self):
-        self.ui.table.insertRow(self.ui.table.rowCount())
+        self.items_model.insertRow(self.items_model.rowCount())
 
     def remove_row(self):
-        row = self.ui.table.currentRow()
+        row = self.ui.table.currentIndex().row()
         if row != -1:
-            self.ui.table.blockSignals(True)
-            self.ui.table.removeRow(row)
-            self.ui.table.blockSignals(False)
-            self.calculate_total()
+            self.items_model.removeRow(row)
+
+    def paste_items(self):
+        self.import_items(QApplication.clipboard().text())
+
+    def import_items_file(self):
+        file_path, _ = QFileDialog.getOpenFileName(
+            self, "Import Items", "", "Item lists (*.csv *.tsv *.txt);;All files (*)"
+        )
+        if not file_path:
+            return
+        try:
+            with open(file_path, encoding="utf-8-sig") as f:
+                text = f.read()
+        except (OSError, UnicodeDecodeError) as e:
+            QMessageBox.critical(self, "Import Failed", str(e))
+            return
+        self.import_items(text)
+
+    @metrics.timed("gui.import_items")
+    def import_items(self, text):
+        """Add tab- or comma-separated item, quantity, price lines to the bill."""
+        try:
+            rows = parse_items_text(text)
+        except ValueError as e:
+            QMessageBox.warning(self, "Invalid Items", f"Nothing was added.\n{e}")
+            return
+        if rows:
+            self.items_model.append_rows(rows)
+            self.statusBar().showMessage(f"Added {len(rows)} items", 3000)
 
     def clear_form(self):
+        self.show_bill_list(False)
         self.ui.name_input.clear()
         self.ui.phone_input.clear()
         self.ui.email_input.clear()
 
-        self.ui.table.setColumnCount(3)
-        self.ui.table.setHorizontalHeaderLabels(["Item", "Quantity", "Price"])
-        self.ui.table.setItemDelegate(NumericDelegate(self.ui.table))  # Reset delegate
-        self.ui.table.setEditTriggers(QTableWidget.AllEditTriggers)
-        self.ui.table.setRowCount(0)
-
-        self.ui.total_label.setText("Total: Rs.0.00")
+        self.items_model.clear()
+        self.show_total(0)
 
 
+    @metrics.timed("gui.calculate_total")
     def calculate_total(self):
-        total = 0
-        for row in range(self.ui.table.rowCount()):
-            try:
-                qty = int(self.ui.table.item(row, 1).text())
-                price = float(self.ui.table.item(row, 2).text())
-                total += qty * price
-            except:
-                continue
-        self.ui.total_label.setText(f"Total: Rs.{total:.2f}")
-        return total
+        self.show_total(self.items_model.total)
+        return self.items_model.total
+
+    @metrics.timed("gui.show_total")
+    def show_total(self, total):
+        self.ui.total_label.setText(f"Total: Rs.{format_paise(total)}")
 
+    @metrics.timed("gui.save_bill")
     def save_bill(self):
         name = self.ui.name_input.text().strip()
         phone = self.ui.phone_input.text().strip()
@@ -189,127 +314,121 @@ class BillingApp(QMainWindow):
             QMessageBox.warning(self, "Invalid Email", "Please enter a valid email address.")
             return
 
-        items = []
-        for row in range(self.ui.table.rowCount()):
-            try:
-                item = self.ui.table.item(row, 0).text()
-                qty = int(self.ui.table.item(row, 1).text())
-                price = float(self.ui.table.item(row, 2).text())
-                items.append((item, qty, price))
-            except Exception:
-                QMessageBox.warning(self, "Invalid Row", f"Check inputs at row {row + 1}")
-                return
+        try:
+            items = self.items_model.line_items()
+        except ValueError as e:
+            QMessageBox.warning(self, "Invalid Row", f"Check inputs at row {e}")
+            return
 
         if not items:
             QMessageBox.warning(self, "Empty Bill", "Add at least one item.")
             return
 
-        total = sum(q * p for _, q, p in items)
-        self.ui.total_label.setText(f"Total: Rs.{total:.2f}")
+        new_bill = Bill.new(Customer(None, name, phone, email), items, datetime.datetime.now())
 
-        try:
-            customer_id = self.db.add_customer(name, email, phone)
-            bill_id = self.db.add_bill(customer_id, json.dumps(items), total)
-        except Exception as e:
-            QMessageBox.critical(self, "DB Error", str(e))
-            return
-
-        new_bill = {
-            "id": bill_id,
-            "name": name,
-            "phone": phone,
-            "email": email,
-            "items": items,
-            "total": total,
-            "date": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        }
-        self.bills.append(new_bill)
+        # Show the bill straight away and undo it if the save fails.
+        self.bill_model.insert_bill(new_bill)
+        self.totals.add(new_bill)
         self.update_dashboard()
         self.clear_form()
-        QMessageBox.information(self, "Saved", "Bill saved successfully!")
+        self.worker.submit(
+            self.persist_bill, new_bill,
+            on_success=lambda bill_id: self.on_bill_saved(new_bill, bill_id),
+            on_error=lambda error: self.on_bill_save_failed(new_bill, error),
+            ordered=True
+        )
+
+    def persist_bill(self, bill):
+        """Runs on the DB worker."""
+        customer = bill.customer
+        customer.id = self.db.add_customer(customer.name, customer.email, customer.phone)
+        return self.db.add_bill(customer.id, bill.items, bill.total)
+
+    def on_bill_saved(self, bill, bill_id):
+        bill.id = bill_id
+        self.statusBar().showMessage("Bill saved successfully!", 3000)
+
+    def on_bill_save_failed(self, bill, error):
+        self.bill_model.remove_bill(bill)
+        self.totals.remove(bill)
+        self.update_dashboard()
+        if not self.ui.name_input.text() and not self.items_model.rowCount():
+            self.fill_form(bill)
+        QMessageBox.critical(self, "DB Error", f"The bill was not saved:\n{error}")
+
+    def fill_form(self, bill):
+        self.show_bill_list(False)
+        self.ui.name_input.setText(bill.customer.name)
+        self.ui.phone_input.setText(bill.customer.phone)
+        self.ui.email_input.setText(bill.customer.email)
+        self.items_model.set_items(bill.items)
+
+    def load_dashboard(self):
+        self.worker.submit(
+            self.db.sales_by_day,
+            on_success=self.on_dashboard_loaded,
+            on_error=lambda e: QMessageBox.critical(self, "DB Error", f"Could not load totals:\n{e}")
+        )
 
+    @metrics.timed("gui.on_dashboard_loaded")
+    def on_dashboard_loaded(self, days):
+        self.totals.seed(days)
+        self.update_dashboard()
+
+    @metrics.timed("gui.update_dashboard")
     def update_dashboard(self):
-        self.ui.label_total_bills.setText(f"Total Bills: {len(self.bills)}")
-        revenue = sum(b['total'] for b in self.bills)
-        self.ui.label_revenue.setText(f"Revenue: Rs.{revenue:.2f}")
+        self.ui.label_total_bills.setText(f"Total Bills: {self.totals.count}")
+        self.ui.label_today.setText(f"Today: Rs.{self.totals.today():.2f}")
+        self.ui.label_month.setText(f"This Month: Rs.{self.totals.this_month():.2f}")
+        self.ui.label_revenue.setText(f"Revenue: Rs.{self.totals.all_time():.2f}")
 
+    @metrics.timed("gui.load_bills")
     def load_bills(self):
-        self.ui.table.setRowCount(0)
-        self.ui.table.setColumnCount(4)
-        self.ui.table.setHorizontalHeaderLabels(["Customer", "Amount", "Date", "Action"])
-
-        for bill in self.bills:
-            row = self.ui.table.rowCount()
-            self.ui.table.insertRow(row)
-            self.ui.table.setItem(row, 0, QTableWidgetItem(bill["name"]))
-            self.ui.table.setItem(row, 1, QTableWidgetItem(f"Rs.{bill['total']:.2f}"))
-            self.ui.table.setItem(row, 2, QTableWidgetItem(bill["date"]))
-            view_btn = QPushButton("View")
-            view_btn.clicked.connect(lambda _, b=bill: self.view_bill(b))
-            self.ui.table.setCellWidget(row, 3, view_btn)
+        """Show bill history; the model fetches further pages as the view scrolls."""
+        self.bill_model.reload()
+        self.show_bill_list(True)
+
+    def show_bill_list(self, visible):
+        self.ui.table.setVisible(not visible)
+        self.ui.bills_view.setVisible(visible)
+
+    def on_view_clicked(self, proxy_index):
+        self.view_bill(proxy_index.data(BillRole))
 
     def print_bill(self, bill):
-        file_path, _ = QFileDialog.getSaveFileName(self, "Print Bill", f"{bill['name']}_bill.pdf", "PDF files (*.pdf)")
+        file_path, _ = QFileDialog.getSaveFileName(self, "Print Bill", f"{bill.customer.name}_bill.pdf", "PDF files (*.pdf)")
         if not file_path:
             return
+        if bill.id is None:
+            self.save_invoice(bill, file_path)
+            return
+        # Print the bill as saved, once any write of it still queued has run.
+        self.worker.submit(
+            self.db.get_bill, bill.id,
+            on_success=lambda saved: self.save_invoice(saved or bill, file_path),
+            on_error=lambda e: QMessageBox.critical(self, "Print Failed", str(e)),
+            ordered=True
+        )
 
-        pdf = FPDF()
-
-        # Add a page and use a default font (e.g., Arial)
-        pdf.add_page()
-        pdf.set_font("Arial", "B", 16)
-    
-        pdf.cell(200, 10, "Customer Bill", ln=True, align="C")
-        pdf.set_font("Arial", "", 12)
-        pdf.ln(5)
-
-        pdf.cell(200, 10, f"Name: {bill['name']}", ln=True)
-        pdf.cell(200, 10, f"Phone: {bill['phone']}", ln=True)
-        pdf.cell(200, 10, f"Email: {bill['email']}", ln=True)
-        pdf.cell(200, 10, f"Date: {bill['date']}", ln=True)
-        pdf.ln(5)
-
-        pdf.set_font("Arial", "B", 12)
-        pdf.cell(80, 10, "Item", border=1)
-        pdf.cell(40, 10, "Quantity", border=1)
-        pdf.cell(40, 10, "Price", border=1, ln=True)
-        pdf.set_font("Arial", "", 12)
-
-        for item, qty, price in bill['items']:
-            pdf.cell(80, 10, item, border=1)
-            pdf.cell(40, 10, str(qty), border=1)
-            pdf.cell(40, 10, f"Rs.{price:.2f}", border=1, ln=True)
-
-        pdf.ln(5)
-        pdf.set_font("Arial", "B", 12)
-        pdf.cell(200, 10, f"Total: Rs.{bill['total']:.2f}", ln=True)
-
+    def save_invoice(self, bill, file_path):
         try:
-            pdf.output(file_path)
+            # fpdf and the fonts load on the first print, not at startup.
+            from utils.pdf_exporter import invoice_renderer
+            invoice_renderer().save(bill, file_path)
             QMessageBox.information(self, "Printed", f"Bill saved to:\n{file_path}")
         except Exception as e:
             QMessageBox.critical(self, "Print Failed", str(e))
 
-
-    def search_bills(self, text):
-        keyword = text.strip().lower()
-        filtered = [b for b in self.bills if keyword in b["name"].lower() or keyword in b["phone"] or any(keyword in i[0].lower() for i in b["items"])]
-
-        self.ui.table.setRowCount(0)
-        for bill in filtered:
-            row = self.ui.table.rowCount()
-            self.ui.table.insertRow(row)
-            self.ui.table.setItem(row, 0, QTableWidgetItem(bill["name"]))
-            self.ui.table.setItem(row, 1, QTableWidgetItem(f"Rs.{bill['total']:.2f}"))
-            self.ui.table.setItem(row, 2, QTableWidgetItem(bill["date"]))
-            view_btn = QPushButton("View")
-            view_btn.clicked.connect(lambda _, b=bill: self.view_bill(b))
-            self.ui.table.setCellWidget(row, 3, view_btn)
+    @metrics.timed("gui.show_search_results")
+    def show_search_results(self, keyword, bills):
+        self.bill_model.show_results(keyword, bills)
+        self.show_bill_list(True)
 
     def view_bill(self, bill):
-        detail = f"Name: {bill['name']}\nPhone: {bill['phone']}\nEmail: {bill['email']}\nDate: {bill['date']}\nTotal: Rs.{bill['total']:.2f}\n\nItems:\n"
-        for item, qty, price in bill['items']:
-            detail += f"{item} - Qty: {qty}, Price: Rs.{price:.2f}\n"
+        customer = bill.customer
+        detail = f"Name: {customer.name}\nPhone: {customer.phone}\nEmail: {customer.email}\nDate: {bill.date}\nTotal: Rs.{format_paise(bill.total)}\n\nItems:\n"
+        for item in bill.items:
+            detail += f"{item.name} - Qty: {item.quantity}, Price: Rs.{format_paise(item.price)}\n"
 
         msg_box = QMessageBox(self)
         msg_box.setWindowTitle("Bill Details")
@@ -323,76 +442,174 @@ class BillingApp(QMainWindow):
         msg_box.exec()
 
         clicked = msg_box.clickedButton()
-        if clicked == edit_btn:
-            dialog = EditItemDialog(bill, self.db)
-            if dialog.exec():
-                self.update_dashboard()
-                self.load_bills()
+        if clicked in (edit_btn, delete_btn) and bill.id is None:
+            QMessageBox.information(self, "Saving", "This bill is still being saved. Try again in a moment.")
+        elif clicked == edit_btn:
+            # Edit the bill as saved, once any write of it still queued has run.
+            self.worker.submit(
+                self.db.get_bill, bill.id,
+                on_success=lambda saved: self.edit_bill(bill, saved),
+                on_error=lambda e: QMessageBox.critical(self, "DB Error", f"Could not load the bill:\n{e}"),
+                ordered=True
+            )
         elif clicked == delete_btn:
             self.delete_bill(bill)
         elif clicked == print_btn:
             self.print_bill(bill)
 
+    def edit_bill(self, shown, saved):
+        self.show_saved_bill(shown, saved)
+        if saved is None:
+            QMessageBox.information(self, "Deleted", "This bill has been deleted.")
+            return
+        dialog = EditItemDialog(saved)
+        if dialog.exec():
+            self.update_bill(saved, dialog.updated_items)
+
+    def show_saved_bill(self, shown, saved):
+        """Show `saved`, the bill as the database has it (None once deleted),
+        in place of `shown`, unless another copy has replaced `shown` since."""
+        if not self.bill_model.shows(shown):
+            return
+        if saved is None:
+            self.bill_model.remove_bill(shown)
+            self.totals.remove(shown)
+        else:
+            self.bill_model.bill_changed(saved)
+            self.totals.replace(shown, saved)
+        self.update_dashboard()
+
+    def refresh_bill(self, shown):
+        """Reload `shown` once the writes queued before now have run."""
+        self.worker.submit(
+            self.db.get_bill, shown.id,
+            on_success=lambda saved: self.show_saved_bill(shown, saved),
+            ordered=True
+        )
+
+    def update_bill(self, bill, items):
+        # The edited copy replaces the shown bill; the original is kept for rollback.
+        updated = bill.with_items(items)
+        self.bill_model.bill_changed(updated)
+        self.totals.replace(bill, updated)
+        self.update_dashboard()
+
+        def rollback(error):
+            # If the bill has been edited or deleted again since, that
+            # write, queued behind this one, decides what is shown.
+            if self.bill_model.shows(updated):
+                self.bill_model.bill_changed(bill)
+                self.totals.replace(updated, bill)
+                self.update_dashboard()
+                # `bill` may itself be an edit that failed.
+                self.refresh_bill(bill)
+            QMessageBox.critical(self, "Database Error", f"Failed to update: {error}")
+
+        self.worker.submit(
+            self.db.update_bill, updated.id, updated.items, updated.total,
+            on_success=lambda _: self.statusBar().showMessage("Bill updated successfully.", 3000),
+            on_error=rollback,
+            ordered=True
+        )
+
     def delete_bill(self, bill):
-        try:
-            self.db.delete_bill(bill['id'])
-            self.bills.remove(bill)
+        row = self.bill_model.remove_bill(bill)
+        self.totals.remove(bill)
+        self.update_dashboard()
+
+        def rollback(error):
+            if row is not None:
+                self.bill_model.insert_bill(bill, row)
+            self.totals.add(bill)
             self.update_dashboard()
-            self.load_bills()
-            QMessageBox.information(self, "Deleted", "Bill deleted successfully.")
-        except Exception as e:
-            QMessageBox.critical(self, "Delete Failed", str(e))
+            # `bill` may show an edit that failed.
+            self.refresh_bill(bill)
+            QMessageBox.critical(self, "Delete Failed", error)
+
+        self.worker.submit(
+            self.db.delete_bill, bill.id,
+            on_success=lambda _: self.statusBar().showMessage("Bill deleted successfully.", 3000),
+            on_error=rollback,
+            ordered=True
+        )
+
+    def show_reports(self):
+        # matplotlib takes longer to import than the rest of the app put
+        # together, so it is loaded when reports are first opened.
+        from reports import ReportsDialog
+        ReportsDialog(self.db, self.worker, self).exec()
+
+    def show_metrics(self):
+        if self.metrics_panel is None:
+            self.metrics_panel = MetricsPanel(self.db, self)
+        self.metrics_panel.show()
+        self.metrics_panel.raise_()
+
+    def closeEvent(self, event):
+        self.searcher.shutdown()
+        self.catalog.shutdown()
+        if self.export_task is not None:
+            self.export_task.cancel()
+        self.worker.wait()
+        self.db.close()
+        if metrics.ENABLED and metrics.DUMP_PATH:
+            metrics.dump(metrics.DUMP_PATH)
+        super().closeEvent(event)
 
     def export_pdf(self):
-        if not self.bills:
-            QMessageBox.warning(self, "No Bills", "There are no bills to export.")
+        if self.export_task is not None:
+            QMessageBox.information(self, "Export Running", "An export is already in progress.")
+            return
+
+        dialog = ExportDialog(self)
+        if not dialog.exec():
             return
+        start, end = dialog.date_range()
 
-    # Ask the user for the file path to save the PDF
+        # Ask the user for the file path to save the PDF
         file_path, _ = QFileDialog.getSaveFileName(self, "Export All Bills", "all_bills.pdf", "PDF files (*.pdf)")
         if not file_path:
             return  # User canceled the dialog, exit early.
 
-        try:
-            pdf = FPDF()
-            pdf.set_auto_page_break(auto=True, margin=15)
-            pdf.add_page()
-
-            # Use a default font (e.g., Arial)
-            pdf.set_font("Arial", "", 12)
-        
-            pdf.cell(200, 10, "All Bills Summary", ln=True, align="C")
-            pdf.ln(10)
-
-            # Header for the bills list
-            pdf.set_font("Arial", "B", 12)
-            pdf.cell(50, 10, "Customer", border=1)
-            pdf.cell(50, 10, "Amount", border=1)
-            pdf.cell(50, 10, "Date", border=1)
-            pdf.cell(40, 10, "Action", border=1, ln=True)
-        
-            pdf.set_font("Arial", "", 12)
-
-            # Loop through the bills and write them into the PDF
-            for bill in self.bills:
-                pdf.cell(50, 10, bill["name"], border=1)
-                pdf.cell(50, 10, f"Rs.{bill['total']:.2f}", border=1)  # Use Rs. directly
-                pdf.cell(50, 10, bill["date"], border=1)
-                pdf.cell(40, 10, "View", border=1, ln=True)  # Action column with a placeholder text
-
-            pdf.ln(10)
-            pdf.set_font("Arial", "B", 12)
-            total_revenue = sum(bill["total"] for bill in self.bills)
-            pdf.cell(200, 10, f"Total Revenue: Rs.{total_revenue:.2f}", ln=True, align="C")
-
-            # Try saving the PDF to the specified file path
-            pdf.output(file_path)
-            QMessageBox.information(self, "Exported", f"All bills exported successfully to:\n{file_path}")
-    
-        except Exception as e:
-            QMessageBox.critical(self, "Export Failed", f"An error occurred while exporting the PDF:\n{str(e)}")
-
-
+        if start is None:
+            title = "All Bills Summary"
+        else:
+            title = f"Bills Summary {start:%Y-%m-%d} to {end - datetime.timedelta(days=1):%Y-%m-%d}"
+
+        # Bills are streamed from the database on a worker, so the export
+        # neither loads the whole history nor blocks the counter.
+        task = SummaryExportTask(self.db, file_path, title, start, end)
+        progress = QProgressDialog("Exporting bills...", "Cancel", 0, 0, self)
+        progress.setWindowTitle("Export PDF")
+        progress.setMinimumDuration(0)
+        progress.canceled.connect(task.cancel)
+
+        def on_progress(done, expected):
+            progress.setMaximum(max(expected, done, 1))
+            progress.setValue(done)
+
+        def on_done():
+            self.export_task = None
+            progress.canceled.disconnect(task.cancel)
+            progress.close()
+
+        def on_finished(count, revenue):
+            on_done()
+            QMessageBox.information(
+                self, "Exported",
+                f"{count} bills (Rs.{revenue:.2f}) exported successfully to:\n{file_path}"
+            )
+
+        def on_failed(error):
+            on_done()
+            QMessageBox.critical(self, "Export Failed", f"An error occurred while exporting the PDF:\n{error}")
+
+        task.signals.progress.connect(on_progress)
+        task.signals.finished.connect(on_finished)
+        task.signals.failed.connect(on_failed)
+        task.signals.cancelled.connect(on_done)
+        self.export_task = task
+        self.worker.start(task)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,204 @@
+import argparse
+import csv
+import datetime
+import json
+import sys
+import time
+from itertools import groupby
+
+from db import DBHandler, MIGRATION_BATCH_SIZE, IMPORT_BATCH_SIZE, STOCK_ADJUSTMENT
+from models.bill import Bill, LineItem
+from models.customer import Customer
+from utils import metrics
+from utils.batch_invoices import generate_invoices, INVOICE_CHUNK_SIZE
+from utils.money import to_paise
+
+
+def migrate_schema(args):
+    db = DBHandler(init_schema=False)
+    try:
+        if args.list:
+            print(f"Schema version {db.schema_version()}")
+            for migration in db.pending_migrations():
+                manual = " (manual: the app leaves it to this command)" if migration.manual else ""
+                print(f"Pending: {migration.version} {migration.description}{manual}")
+            return
+        applied = db.migrate(
+            batch_size=args.batch_size,
+            started=lambda migration: print(f"Applying {migration.version} {migration.description}"),
+            progress=lambda done: print(f"\r  {done} rows", end="", flush=True)
+        )
+    finally:
+        db.close()
+    print(f"\rApplied {len(applied)} migrations" if applied else "Schema is up to date")
+
+
+def migrate_items(args):
+    db = DBHandler()
+    try:
+        migrated = db.migrate_json_items(
+            batch_size=args.batch_size,
+            progress=lambda done: print(f"\rMigrated {done} bills", end="", flush=True)
+        )
+    finally:
+        db.close()
+    print(f"\rMigrated {migrated} bills")
+
+
+def rebuild_reports(args):
+    db = DBHandler()
+    started = time.perf_counter()
+    try:
+        db.rebuild_rollups()
+    finally:
+        db.close()
+    print(f"Rebuilt sales rollups in {time.perf_counter() - started:.1f}s")
+
+
+def parse_bill(name, phone, email, items, total=None, date=None):
+    return Bill(
+        None,
+        Customer(None, name, phone, email or ""),
+        [LineItem(item, int(qty), to_paise(price)) for item, qty, price in items],
+        to_paise(total) if total not in (None, "") else None,
+        datetime.datetime.fromisoformat(date) if date else None
+    )
+
+
+def read_bills(path):
+    """Stream Bills from a JSON Lines file (one bill object per line) or a
+    CSV file with one line item per row, grouped by its "bill" column."""
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.endswith(".csv"):
+            for _, rows in groupby(csv.DictReader(f), key=lambda row: row["bill"]):
+                rows = list(rows)
+                first = rows[0]
+                yield parse_bill(
+                    first["name"], first["phone"], first.get("email"),
+                    [(row["item"], row["quantity"], row["price"]) for row in rows],
+                    date=first.get("date")
+                )
+        else:
+            for line in f:
+                if line.strip():
+                    bill = json.loads(line)
+                    yield parse_bill(
+                        bill["name"], bill["phone"], bill.get("email"), bill["items"],
+                        bill.get("total"), bill.get("date")
+                    )
+
+
+def import_bills(args):
+    db = DBHandler()
+    started = time.perf_counter()
+    try:
+        imported = db.add_bills_bulk(
+            read_bills(args.file),
+            batch_size=args.batch_size,
+            progress=lambda done: print(f"\rImported {done} bills", end="", flush=True)
+        )
+    finally:
+        db.close()
+    elapsed = time.perf_counter() - started
+    print(f"\rImported {imported} bills in {elapsed:.1f}s ({imported / max(elapsed, 1e-9):.0f} bills/s)")
+
+
+def read_products(path):
+    """Stream (name, price in paise) pairs from a CSV file with "name" and
+    "price" columns."""
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            yield row["name"].strip(), to_paise(row["price"])
+
+
+def import_products(args):
+    db = DBHandler()
+    started = time.perf_counter()
+    try:
+        saved = db.save_products(read_products(args.file), batch_size=args.batch_size)
+    finally:
+        db.close()
+    print(f"Saved {saved} products in {time.perf_counter() - started:.1f}s")
+
+
+def adjust_stock(args):
+    """Apply a CSV of "name" and "quantity" columns: positive quantities for
+    deliveries, negative ones for write-offs and stocktake corrections."""
+    with open(args.file, newline="", encoding="utf-8") as f:
+        changes = [(row["name"].strip(), int(row["quantity"])) for row in csv.DictReader(f)]
+    db = DBHandler()
+    try:
+        changed = db.adjust_stock(changes, reason=args.reason)
+    except ValueError as e:
+        sys.exit(str(e))
+    finally:
+        db.close()
+    print(f"Adjusted stock of {changed} products")
+
+
+def export_invoices(args):
+    start = datetime.datetime.strptime(args.start, "%Y-%m-%d") if args.start else None
+    end = datetime.datetime.strptime(args.end, "%Y-%m-%d") + datetime.timedelta(days=1) if args.end else None
+    db = DBHandler()
+    started = time.perf_counter()
+    try:
+        written = generate_invoices(
+            db.iter_bill_range(start, end, with_items=True),
+            args.output,
+            workers=args.workers,
+            chunk_size=args.chunk_size,
+            progress=lambda done: print(f"\rRendered {done} invoices", end="", flush=True)
+        )
+    finally:
+        db.close()
+    elapsed = time.perf_counter() - started
+    print(f"\rRendered {written} invoices in {elapsed:.1f}s ({written / max(elapsed, 1e-9):.0f} invoices/s)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Billing app maintenance commands.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    schema = commands.add_parser("migrate", help="Apply pending schema migrations, manual ones included.")
+    schema.add_argument("--list", action="store_true", help="Show the schema version and pending migrations.")
+    schema.add_argument("--batch-size", type=int, default=MIGRATION_BATCH_SIZE, help="Rows per backfill batch.")
+    schema.set_defaults(func=migrate_schema)
+
+    migrate = commands.add_parser("migrate-items", help="Move JSON bill items into the bill_items table.")
+    migrate.add_argument("--batch-size", type=int, default=MIGRATION_BATCH_SIZE)
+    migrate.set_defaults(func=migrate_items)
+
+    reports = commands.add_parser("rebuild-reports", help="Recompute the sales report rollup tables.")
+    reports.set_defaults(func=rebuild_reports)
+
+    importer = commands.add_parser("import-bills", help="Bulk-load bills from a .jsonl or .csv file.")
+    importer.add_argument("file")
+    importer.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE)
+    importer.set_defaults(func=import_bills)
+
+    products = commands.add_parser("import-products", help="Add or reprice products from a .csv file.")
+    products.add_argument("file")
+    products.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE)
+    products.set_defaults(func=import_products)
+
+    stock = commands.add_parser("adjust-stock", help="Add or remove stock from a .csv file of name, quantity.")
+    stock.add_argument("file")
+    stock.add_argument("--reason", default=STOCK_ADJUSTMENT, help="Recorded in the stock ledger, e.g. delivery.")
+    stock.set_defaults(func=adjust_stock)
+
+    invoices = commands.add_parser("export-invoices", help="Render one PDF invoice per bill, in parallel.")
+    invoices.add_argument("output", help="Output directory, or a .zip file.")
+    invoices.add_argument("--from", dest="start", help="First day to include (YYYY-MM-DD).")
+    invoices.add_argument("--to", dest="end", help="Last day to include (YYYY-MM-DD).")
+    invoices.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores).")
+    invoices.add_argument("--chunk-size", type=int, default=INVOICE_CHUNK_SIZE)
+    invoices.set_defaults(func=export_invoices)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+    if metrics.ENABLED and metrics.DUMP_PATH:
+        metrics.dump(metrics.DUMP_PATH)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
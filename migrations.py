@@ -0,0 +1,128 @@
+"""Numbered schema migrations, applied in order by DBHandler.migrate().
+
+Each database records the migrations it has had in its schema_version
+table, so startup only has to read that. To change the schema, append a
+Migration with the next version; never edit one that has shipped.
+
+A migration's `apply` runs in a single transaction and should be quick: it
+creates or alters tables and indexes, and must be safe to run again. Work
+that touches every row goes in `backfill`, which commits in batches of
+`batch_size` so other counters keep saving bills while it runs, and which
+must pick up where it left off if it is interrupted. The version is only
+recorded once both have finished.
+
+A `manual` migration rewrites or locks a whole table on MySQL, so the app
+leaves it to `python manage.py migrate`, to be run at a quiet time. Its
+`needed` check tells whether the database still lacks the change; if not,
+the app records it itself, as it does on a new database, which has no rows
+to rewrite, and on SQLite, where manual migrations change nothing.
+"""
+
+# search_bills only matches words inside customer names once this has run.
+NAME_WORDS_MIGRATION = 7
+
+
+class Migration:
+    def __init__(self, version, description, apply=None, backfill=None, manual=False, needed=None):
+        self.version = version
+        self.description = description
+        self.apply = apply
+        self.backfill = backfill
+        self.manual = manual
+        self.needed = needed
+
+    def __repr__(self):
+        return f"Migration({self.version}, {self.description!r})"
+
+
+def create_base_schema(db, cursor):
+    """The tables as of the first versioned release. Databases made by
+    earlier versions, or from the old scheema.sql, are brought up to the
+    same shape by the backend's create_schema, apart from the table
+    rewrites left to manual migrations 6 and 7."""
+    db.backend.create_schema(cursor)
+    db._add_stock_rows(cursor)
+    cursor.execute("""
+        SELECT EXISTS(SELECT 1 FROM bills) AS billed,
+               EXISTS(SELECT 1 FROM sales_daily) AS rolled_up
+    """)
+    row = cursor.fetchone()
+    if row["billed"] and not row["rolled_up"]:
+        db._rebuild_rollups(cursor)
+
+
+def add_listing_indexes(db, cursor):
+    """Bill history and search page through bills by date, reports group
+    them by customer, and customers are looked up by phone."""
+    db.backend.ensure_index(cursor, "bills", "idx_bills_created_at", "(created_at)")
+    db.backend.ensure_index(cursor, "bills", "idx_bills_customer", "(customer_id)")
+    db.backend.ensure_index(cursor, "customers", "idx_customers_phone", "(phone)")
+
+
+def shard_sales_daily(db, cursor):
+    """Every bill saved on a day used to add itself to that day's one
+    sales_daily row, so counters queued on its lock; bills now spread over
+    up to ROLLUP_SHARDS rows per day (see DBHandler.update_rollups)."""
+    if not db.backend.column_exists(cursor, "sales_daily", "shard"):
+        db.backend.shard_rollup(cursor, "sales_daily", "day", "day, shard")
+
+
+def shard_customer_and_item_rollups(db, cursor):
+    """The customer and item rollups are sharded like sales_daily: two
+    counters selling the same item on the same day queued on its row."""
+    if not db.backend.column_exists(cursor, "sales_customer_daily", "shard"):
+        db.backend.shard_rollup(cursor, "sales_customer_daily", "customer_id", "day, customer_id, shard")
+    if not db.backend.column_exists(cursor, "sales_item_daily", "shard"):
+        db.backend.shard_rollup(cursor, "sales_item_daily", "item", "day, item, shard")
+
+
+def move_legacy_items(db, batch_size, progress):
+    """Move line items still held in the legacy bills columns into bill_items."""
+    moved = db.migrate_json_items(batch_size, progress)
+    return moved + db.migrate_item_columns(batch_size, progress and (lambda done: progress(moved + done)))
+
+
+def drop_legacy_items_index(db, cursor):
+    """Search reads bill_items since migration 3, and every bill write paid
+    to keep this index of the emptied bills.items column up to date."""
+    db.backend.drop_index(cursor, "bills", "ft_bills_items")
+
+
+def decimal_bill_totals(db, cursor):
+    db.backend.ensure_decimal_total(cursor)
+
+
+def version_bills(db, cursor):
+    """A counter checks a bill it has cached against this before reusing
+    it, so edits made on another counter are not served stale. Adding a
+    column with a default does not copy the table on MySQL 8 or SQLite."""
+    if not db.backend.column_exists(cursor, "bills", "version"):
+        cursor.execute("ALTER TABLE bills ADD COLUMN version INT NOT NULL DEFAULT 0")
+
+
+def has_float_totals(db, cursor):
+    return db.backend.column_type(cursor, "bills", "total") != "decimal"
+
+
+def index_customer_name_words(db, cursor):
+    db.backend.ensure_index(cursor, "customers", "ft_customers_name", "(name)", "FULLTEXT")
+
+
+def lacks_name_words_index(db, cursor):
+    return not db.backend.index_exists(cursor, "customers", "ft_customers_name")
+
+
+MIGRATIONS = [
+    Migration(1, "Base schema", apply=create_base_schema),
+    Migration(2, "Indexes for bill listing and customer lookup", apply=add_listing_indexes),
+    Migration(3, "Move legacy line items into bill_items", backfill=move_legacy_items),
+    Migration(4, "Shard the daily sales rollup", apply=shard_sales_daily),
+    Migration(5, "Drop the FULLTEXT index on the legacy bills.items column", apply=drop_legacy_items_index),
+    Migration(6, "Store bill totals as DECIMAL", apply=decimal_bill_totals, manual=True, needed=has_float_totals),
+    Migration(
+        NAME_WORDS_MIGRATION, "FULLTEXT index on customer names",
+        apply=index_customer_name_words, manual=True, needed=lacks_name_words_index
+    ),
+    Migration(8, "Count each bill's edits", apply=version_bills),
+    Migration(9, "Shard the customer and item rollups", apply=shard_customer_and_item_rollups),
+]
@@ -1,40 +1,72 @@
-import mysql.connector
+from models.customer import Customer
+from utils.money import format_paise
+
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+class LineItem:
+    """One line of a bill; `price` is the unit price in paise."""
+    __slots__ = ("name", "quantity", "price")
+
+    def __init__(self, name, quantity, price):
+        self.name = name
+        self.quantity = quantity
+        self.price = price
+
+    @property
+    def total(self):
+        return self.quantity * self.price
+
+    def __repr__(self):
+        return f"LineItem({self.name!r}, {self.quantity}, {format_paise(self.price)})"
+
+
+class Bill:
+    """A bill and its lines. `total` is in paise and `id` is None until the
+    bill has been saved. `items` is None when the lines have not been loaded.
+    """
+    __slots__ = ("id", "customer", "items", "total", "created_at")
+
+    def __init__(self, id, customer, items, total, created_at):
+        self.id = id
+        self.customer = customer
+        self.items = items
+        self.total = total
+        self.created_at = created_at
+
+    @classmethod
+    def new(cls, customer, items, created_at):
+        return cls(None, customer, items, sum(item.total for item in items), created_at)
+
+    def copy(self):
+        """Return a copy that shares no mutable object with this bill."""
+        customer = self.customer
+        items = self.items
+        if items is not None:
+            items = [LineItem(item.name, item.quantity, item.price) for item in items]
+        return Bill(
+            self.id, Customer(customer.id, customer.name, customer.phone, customer.email),
+            items, self.total, self.created_at
+        )
+
+    def with_items(self, items):
+        """Return a copy of this bill with different lines, totalled."""
+        return Bill(self.id, self.customer, items, sum(item.total for item in items), self.created_at)
+
+    @property
+    def date(self):
+        return self.created_at.strftime(DATE_FORMAT)
+
+    def __repr__(self):
+        return f"Bill({self.id}, {self.customer.name!r}, total={self.total}, created_at={self.created_at})"
 
 
 class BillModel:
-    def __init__(self, conn):
-        self.conn = conn
-        self.create_table()
-
-    def create_table(self):
-        cursor = self.conn.cursor()
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS bills (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                customer_id INT,
-                items TEXT,
-                total FLOAT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (customer_id) REFERENCES customers(id) ON DELETE CASCADE
-            )
-        """)
-        self.conn.commit()
+    def __init__(self, db):
+        self.db = db
 
     def add_bill(self, customer_id, items, total):
-        cursor = self.conn.cursor()
-        cursor.execute("""
-            INSERT INTO bills (customer_id, items, total)
-            VALUES (%s, %s, %s)
-        """, (customer_id, items, total))
-        self.conn.commit()
-        return cursor.lastrowid
+        return self.db.add_bill(customer_id, items, total)
 
     def get_all_bills(self):
-        cursor = self.conn.cursor(dictionary=True)
-        cursor.execute("""
-            SELECT bills.*, customers.name, customers.phone
-            FROM bills
-            JOIN customers ON bills.customer_id = customers.id
-            ORDER BY bills.created_at DESC
-        """)
-        return cursor.fetchall()
+        return self.db.get_all_bills()
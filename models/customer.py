@@ -1,33 +1,24 @@
-import mysql.connector
+class Customer:
+    __slots__ = ("id", "name", "phone", "email")
 
+    def __init__(self, id, name, phone, email):
+        self.id = id
+        self.name = name
+        self.phone = phone
+        self.email = email
+
+    def __repr__(self):
+        return f"Customer({self.id}, {self.name!r}, {self.phone!r})"
 
-class CustomerModel:
-    def __init__(self, conn):
-        self.conn = conn
-        self.create_table()
 
-    def create_table(self):
-        cursor = self.conn.cursor()
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS customers (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                name VARCHAR(255) NOT NULL,
-                email VARCHAR(255),
-                phone VARCHAR(15) NOT NULL
-            )
-        """)
-        self.conn.commit()
+class CustomerModel:
+    def __init__(self, db):
+        self.db = db
 
     def add_customer(self, name, email, phone):
-        cursor = self.conn.cursor()
-        cursor.execute("""
-            INSERT INTO customers (name, email, phone)
-            VALUES (%s, %s, %s)
-        """, (name, email, phone))
-        self.conn.commit()
-        return cursor.lastrowid
+        return self.db.add_customer(name, email, phone)
 
     def get_customer_by_phone(self, phone):
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT * FROM customers WHERE phone = %s", (phone,))
-        return cursor.fetchone()
+        with self.db.transaction(write=False) as cursor:
+            cursor.execute("SELECT * FROM customers WHERE phone = %s", (phone,))
+            return cursor.fetchone()
@@ -0,0 +1,24 @@
+from utils.money import format_paise, to_paise
+
+PRODUCT_COLUMNS = "id, name, price, active, updated_at"
+
+
+class Product:
+    """A catalog entry; `price` is the unit price in paise. Discontinued
+    products are kept with `active` False so caches can drop them."""
+    __slots__ = ("id", "name", "price", "active", "updated_at")
+
+    def __init__(self, id, name, price, active=True, updated_at=None):
+        self.id = id
+        self.name = name
+        self.price = price
+        self.active = active
+        self.updated_at = updated_at
+
+    @classmethod
+    def from_row(cls, row):
+        return cls(row["id"], row["name"], to_paise(row["price"]), bool(row["active"]), row["updated_at"])
+
+    def __repr__(self):
+        return f"Product({self.id}, {self.name!r}, {format_paise(self.price)})"
+
@@ -0,0 +1,122 @@
+import datetime
+
+from PySide6.QtWidgets import QDialog, QVBoxLayout, QHBoxLayout, QComboBox, QLabel
+from matplotlib.backends.backend_qtagg import FigureCanvasQTAgg
+from matplotlib.figure import Figure
+
+from db import REPORT_TOP_N
+
+REPORT_PERIODS = ["Last 30 days", "This month", "Last 12 months", "All time"]
+
+
+def period_range(period, today=None):
+    """Return (start, end, by_month) for one of REPORT_PERIODS; end is exclusive."""
+    today = today or datetime.date.today()
+    tomorrow = today + datetime.timedelta(days=1)
+    if period == "Last 30 days":
+        return today - datetime.timedelta(days=29), tomorrow, False
+    if period == "This month":
+        return today.replace(day=1), tomorrow, False
+    if period == "Last 12 months":
+        year, month = (today.year, today.month - 11) if today.month > 11 else (today.year - 1, today.month + 1)
+        return datetime.date(year, month, 1), tomorrow, True
+    return None, None, True
+
+
+def load_sales_report(db, start, end, by_month=False, limit=REPORT_TOP_N):
+    """Read a sales report for [start, end) from the rollup tables."""
+    trend = db.sales_by_month(start, end) if by_month else db.sales_by_day(start, end)
+    return {
+        "trend": trend,
+        "by_month": by_month,
+        "customers": db.top_customers(start, end, limit),
+        "items": db.top_items(start, end, limit),
+    }
+
+
+class ReportsDialog(QDialog):
+    """Revenue trend, top customers and top items for a chosen period."""
+    def __init__(self, db, worker, parent=None):
+        super().__init__(parent)
+        self.db = db
+        self.worker = worker
+        self.generation = 0
+        self.setWindowTitle("Sales Reports")
+        self.resize(1000, 750)
+
+        self.period = QComboBox()
+        self.period.addItems(REPORT_PERIODS)
+        self.period.currentTextChanged.connect(self.refresh)
+        self.status = QLabel()
+
+        controls = QHBoxLayout()
+        controls.addWidget(QLabel("Period:"))
+        controls.addWidget(self.period)
+        controls.addStretch()
+        controls.addWidget(self.status)
+
+        self.figure = Figure(figsize=(10, 7), layout="constrained")
+        self.canvas = FigureCanvasQTAgg(self.figure)
+
+        layout = QVBoxLayout(self)
+        layout.addLayout(controls)
+        layout.addWidget(self.canvas)
+
+        self.refresh()
+
+    def refresh(self):
+        self.generation += 1
+        generation = self.generation
+        start, end, by_month = period_range(self.period.currentText())
+        self.status.setText("Loading...")
+        self.worker.submit(
+            load_sales_report, self.db, start, end, by_month,
+            on_success=lambda report: self.on_loaded(generation, report),
+            on_error=lambda error: self.on_failed(generation, error)
+        )
+
+    def on_loaded(self, generation, report):
+        if generation == self.generation:
+            self.status.clear()
+            self.draw(report)
+
+    def on_failed(self, generation, error):
+        if generation == self.generation:
+            self.status.setText(f"Could not load the report: {error}")
+
+    def done(self, result):
+        # Drop reports that arrive after the dialog has closed.
+        self.generation += 1
+        super().done(result)
+
+    def draw(self, report):
+        self.figure.clear()
+        grid = self.figure.add_gridspec(2, 2)
+        trend = self.figure.add_subplot(grid[0, :])
+        customers = self.figure.add_subplot(grid[1, 0])
+        items = self.figure.add_subplot(grid[1, 1])
+
+        days = [row["day"] for row in report["trend"]]
+        revenue = [float(row["revenue"]) for row in report["trend"]]
+        trend.set_title("Revenue per month" if report["by_month"] else "Revenue per day")
+        if report["by_month"]:
+            trend.bar(days, revenue, width=20, color="#3F72AF")
+        else:
+            trend.plot(days, revenue, marker="o", markersize=3, color="#3F72AF")
+        trend.set_ylabel("Rs.")
+        trend.grid(True, alpha=0.3)
+
+        self._draw_ranking(customers, "Top customers", report["customers"], lambda row: row["name"])
+        self._draw_ranking(items, "Top items", report["items"], lambda row: row["item"])
+        self.canvas.draw_idle()
+
+    @staticmethod
+    def _draw_ranking(axes, title, rows, label):
+        # Largest at the top.
+        rows = list(reversed(rows))
+        axes.set_title(title)
+        axes.barh([label(row) for row in rows], [float(row["revenue"]) for row in rows], color="#3F72AF")
+        axes.set_xlabel("Rs.")
+        axes.tick_params(axis="y", labelsize=8)
+        if not rows:
+            axes.text(0.5, 0.5, "No sales", ha="center", va="center", transform=axes.transAxes)
@@ -0,0 +1,53 @@
+from PySide6.QtCore import QObject, QTimer, Signal
+
+SEARCH_DEBOUNCE_MS = 250
+
+
+class BillSearcher(QObject):
+    """Debounces search input and runs the query on the DB worker.
+
+    Results for anything but the latest keyword are dropped, so a slow
+    query can never overwrite the results of a newer one.
+    """
+    resultsReady = Signal(str, object)
+    cleared = Signal()
+    failed = Signal(str)
+
+    def __init__(self, db, worker, parent=None):
+        super().__init__(parent)
+        self.db = db
+        self.worker = worker
+        self.keyword = ""
+        self.generation = 0
+
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(SEARCH_DEBOUNCE_MS)
+        self.timer.timeout.connect(self.start_search)
+
+    def search(self, text):
+        self.keyword = text.strip()
+        self.generation += 1
+        self.timer.start()
+
+    def start_search(self):
+        if not self.keyword:
+            self.cleared.emit()
+            return
+        generation, keyword = self.generation, self.keyword
+        self.worker.submit(
+            self.db.search_bills, keyword,
+            on_success=lambda bills: self.on_finished(generation, keyword, bills),
+            on_error=lambda error: self.on_failed(generation, error)
+        )
+
+    def on_finished(self, generation, keyword, bills):
+        if generation == self.generation:
+            self.resultsReady.emit(keyword, bills)
+
+    def on_failed(self, generation, error):
+        if generation == self.generation:
+            self.failed.emit(error)
+
+    def shutdown(self):
+        self.timer.stop()
@@ -0,0 +1,363 @@
+import threading
+import time
+from contextlib import contextmanager
+
+import mysql.connector
+
+from utils import metrics
+
+# Connections idle for longer are pinged, and reconnected if the server
+# dropped them, before they are lent out again.
+PING_AFTER_IDLE = 30
+# Seconds to wait for another process's schema migration to finish.
+MIGRATION_LOCK_TIMEOUT = 600
+
+
+class MySQLBackend:
+    """MySQL through a pool of mysql.connector connections.
+
+    Every transaction borrows a connection for only as long as it needs it,
+    so one backend can serve the GUI thread and any number of worker threads
+    at the same time. At most pool_size connections are open; a borrower
+    waits for one to be returned rather than fail.
+    """
+    name = "mysql"
+
+    def __init__(self, config, pool_size):
+        self.config = config
+        self.available = threading.BoundedSemaphore(pool_size)
+        # Every open connection, and those of them no transaction is using.
+        self.connections = []
+        self.idle = []
+        # Each open connection -> time.monotonic() when it was last returned.
+        self.last_used = {}
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        with self.lock:
+            if self.idle:
+                return self.idle.pop()
+        conn = mysql.connector.connect(**self.config)
+        with self.lock:
+            self.connections.append(conn)
+            self.last_used[conn] = time.monotonic()
+        return conn
+
+    def release(self, conn, healthy):
+        with self.lock:
+            if conn in self.connections:
+                if healthy:
+                    self.last_used[conn] = time.monotonic()
+                else:
+                    # The server may have dropped it; ping on the next borrow.
+                    self.last_used[conn] = 0
+                self.idle.append(conn)
+                return
+        # close() ran while it was borrowed.
+        conn.close()
+
+    @contextmanager
+    def connection(self):
+        """Borrow a pooled connection. Only connections that have been idle
+        for PING_AFTER_IDLE seconds, or whose last use failed, are pinged
+        first, so a busy counter pays no extra round trip per transaction."""
+        with self.available:
+            conn = self.acquire()
+            healthy = False
+            try:
+                if time.monotonic() - self.last_used.get(conn, 0) > PING_AFTER_IDLE:
+                    conn.ping(reconnect=True, attempts=1, delay=0)
+                yield conn
+                healthy = True
+            finally:
+                self.release(conn, healthy)
+
+    @contextmanager
+    def transaction(self, write=True):
+        # InnoDB locks rows as they are written, so `write` changes nothing.
+        with self.connection() as conn:
+            cursor = conn.cursor(dictionary=True, buffered=True)
+            try:
+                yield cursor
+                with metrics.timer("db.commit"):
+                    conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                cursor.close()
+
+    @contextmanager
+    def migration_lock(self):
+        """Hold the database's migration lock, so that counters starting at
+        the same time as each other or as manage.py take turns rather than
+        apply the same migration twice. It is a server lock tied to one
+        connection, which is held for as long as the block runs."""
+        with self.connection() as conn:
+            cursor = conn.cursor(buffered=True)
+            try:
+                cursor.execute(
+                    "SELECT GET_LOCK(CONCAT('billing_migrate.', DATABASE()), %s)", (MIGRATION_LOCK_TIMEOUT,)
+                )
+                if cursor.fetchone()[0] != 1:
+                    raise TimeoutError("Another process is still migrating the database schema")
+                try:
+                    yield
+                finally:
+                    cursor.execute("SELECT RELEASE_LOCK(CONCAT('billing_migrate.', DATABASE()))")
+                    cursor.fetchone()
+            finally:
+                cursor.close()
+
+    def create_schema(self, cursor):
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS customers (
+                id INT AUTO_INCREMENT PRIMARY KEY,
+                name VARCHAR(100),
+                email VARCHAR(100),
+                phone VARCHAR(15),
+                UNIQUE KEY uq_customers_identity (name, phone),
+                INDEX idx_customers_name (name),
+                INDEX idx_customers_phone (phone),
+                FULLTEXT INDEX ft_customers_name (name)
+            )
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS bills (
+                id INT AUTO_INCREMENT PRIMARY KEY,
+                customer_id INT,
+                items TEXT,
+                total DECIMAL(12,2),
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                INDEX idx_bills_created_at (created_at),
+                FOREIGN KEY (customer_id) REFERENCES customers(id) ON DELETE CASCADE
+            )
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS bill_items (
+                id INT AUTO_INCREMENT PRIMARY KEY,
+                bill_id INT NOT NULL,
+                line_no INT NOT NULL,
+                item VARCHAR(255) NOT NULL,
+                quantity INT NOT NULL,
+                price DECIMAL(10,2) NOT NULL,
+                line_total DECIMAL(12,2) NOT NULL,
+                INDEX idx_bill_items_bill (bill_id, line_no),
+                INDEX idx_bill_items_item (item),
+                FULLTEXT INDEX ft_bill_items_item (item),
+                FOREIGN KEY (bill_id) REFERENCES bills(id) ON DELETE CASCADE
+            )
+        """)
+        # Sales rollups, kept current by every bill write (see update_rollups).
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS sales_daily (
+                day DATE NOT NULL,
+                shard SMALLINT NOT NULL DEFAULT 0,
+                bills INT NOT NULL,
+                revenue DECIMAL(14,2) NOT NULL,
+                PRIMARY KEY (day, shard)
+            )
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS sales_customer_daily (
+                day DATE NOT NULL,
+                customer_id INT NOT NULL,
+                shard SMALLINT NOT NULL DEFAULT 0,
+                bills INT NOT NULL,
+                revenue DECIMAL(14,2) NOT NULL,
+                PRIMARY KEY (day, customer_id, shard),
+                INDEX idx_sales_customer (customer_id)
+            )
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS sales_item_daily (
+                day DATE NOT NULL,
+                item VARCHAR(255) NOT NULL,
+                shard SMALLINT NOT NULL DEFAULT 0,
+                quantity INT NOT NULL,
+                revenue DECIMAL(14,2) NOT NULL,
+                PRIMARY KEY (day, item, shard)
+            )
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS products (
+                id INT AUTO_INCREMENT PRIMARY KEY,
+                name VARCHAR(255) NOT NULL,
+                price DECIMAL(10,2) NOT NULL,
+                active BOOLEAN NOT NULL DEFAULT TRUE,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+                UNIQUE KEY uq_products_name (name),
+                INDEX idx_products_updated_at (updated_at)
+            )
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS stock (
+                product_id INT PRIMARY KEY,
+                qty INT NOT NULL DEFAULT 0,
+                FOREIGN KEY (product_id) REFERENCES products(id) ON DELETE CASCADE
+            )
+        """)
+        # Append-only: every change to stock.qty, signed, with the bill behind it.
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS stock_movements (
+                id BIGINT AUTO_INCREMENT PRIMARY KEY,
+                product_id INT NOT NULL,
+                bill_id INT,
+                qty_change INT NOT NULL,
+                reason VARCHAR(20) NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                INDEX idx_stock_movements_product (product_id, id),
+                INDEX idx_stock_movements_bill (bill_id)
+            )
+        """)
+        self._ensure_customer_identity(cursor)
+        self._ensure_bill_columns(cursor)
+        self.ensure_index(cursor, "customers", "idx_customers_name", "(name)")
+
+    @staticmethod
+    def table_exists(cursor, table):
+        cursor.execute("""
+            SELECT 1 FROM information_schema.tables
+            WHERE table_schema = DATABASE() AND table_name = %s
+        """, (table,))
+        return cursor.fetchone() is not None
+
+    @staticmethod
+    def column_exists(cursor, table, column):
+        cursor.execute("""
+            SELECT 1 FROM information_schema.columns
+            WHERE table_schema = DATABASE() AND table_name = %s AND column_name = %s
+        """, (table, column))
+        return cursor.fetchone() is not None
+
+    @staticmethod
+    def column_type(cursor, table, column):
+        """The type of `column`, e.g. "decimal", or None if there is none."""
+        cursor.execute("""
+            SELECT data_type FROM information_schema.columns
+            WHERE table_schema = DATABASE() AND table_name = %s AND column_name = %s
+        """, (table, column))
+        row = cursor.fetchone()
+        return row and row["data_type"].lower()
+
+    @staticmethod
+    def index_exists(cursor, table, name):
+        cursor.execute("""
+            SELECT 1 FROM information_schema.statistics
+            WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s
+            LIMIT 1
+        """, (table, name))
+        return cursor.fetchone() is not None
+
+    def ensure_index(self, cursor, table, name, columns, kind=""):
+        """Create index `name` unless it exists. Indexes are built in place,
+        and other than FULLTEXT ones online, so bills can still be saved
+        while a large table is indexed; building a FULLTEXT index lets
+        counters read but makes saves wait."""
+        if self.index_exists(cursor, table, name):
+            return
+        lock = "SHARED" if kind == "FULLTEXT" else "NONE"
+        cursor.execute(f"CREATE {kind} INDEX {name} ON {table} {columns} ALGORITHM=INPLACE LOCK={lock}")
+
+    def drop_index(self, cursor, table, name):
+        """Drop index `name` if it exists. Only the table's metadata changes,
+        so this is quick and does not hold up bill saves."""
+        if self.index_exists(cursor, table, name):
+            cursor.execute(f"DROP INDEX {name} ON {table} ALGORITHM=INPLACE LOCK=NONE")
+
+    def _ensure_bill_columns(self, cursor):
+        """Databases set up from the old scheema.sql named created_at `date`
+        and had no items column; their line items are moved into bill_items
+        by migration 3."""
+        if self.column_exists(cursor, "bills", "date") and not self.column_exists(cursor, "bills", "created_at"):
+            cursor.execute("ALTER TABLE bills CHANGE date created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP")
+        if not self.column_exists(cursor, "bills", "items"):
+            cursor.execute("ALTER TABLE bills ADD COLUMN items TEXT")
+
+    def ensure_decimal_total(self, cursor):
+        """Older databases stored bills.total as FLOAT, which cannot hold most
+        amounts exactly; convert it, rounding each total to the paisa.
+        Changing a column's type copies the table, during which counters
+        can read bills but not save them."""
+        if self.column_type(cursor, "bills", "total") != "decimal":
+            cursor.execute("ALTER TABLE bills MODIFY total DECIMAL(12,2), ALGORITHM=COPY, LOCK=SHARED")
+
+    def _ensure_customer_identity(self, cursor):
+        """Add the unique (name, phone) key, first merging any duplicate
+        customers that older versions could create into the oldest row."""
+        if self.index_exists(cursor, "customers", "uq_customers_identity"):
+            return
+        duplicates = """
+            SELECT c.id, keep.keep_id
+            FROM customers c
+            JOIN (SELECT name, phone, MIN(id) AS keep_id FROM customers GROUP BY name, phone) keep
+              ON c.name = keep.name AND c.phone = keep.phone AND c.id <> keep.keep_id
+        """
+        cursor.execute(f"""
+            UPDATE bills b JOIN ({duplicates}) d ON b.customer_id = d.id
+            SET b.customer_id = d.keep_id
+        """)
+        cursor.execute(f"DELETE c FROM customers c JOIN ({duplicates}) d ON c.id = d.id")
+        cursor.execute("CREATE UNIQUE INDEX uq_customers_identity ON customers (name, phone)")
+
+    @staticmethod
+    def shard_rollup(cursor, table, after, key):
+        """Add a shard column to a rollup table, after column `after`, and
+        make `key` its primary key; existing rows become shard 0."""
+        cursor.execute(f"""
+            ALTER TABLE {table}
+                ADD COLUMN shard SMALLINT NOT NULL DEFAULT 0 AFTER {after},
+                DROP PRIMARY KEY,
+                ADD PRIMARY KEY ({key})
+        """)
+
+    @staticmethod
+    def upsert(keys, **columns):
+        """The clause that makes an INSERT update the row that already has
+        its unique `keys`. `columns` maps each column to update to its new
+        value, in which {new} stands for the value the INSERT would have
+        written."""
+        return "ON DUPLICATE KEY UPDATE " + ", ".join(
+            f"{column} = {value.format(new=f'VALUES({column})')}" for column, value in columns.items()
+        )
+
+    @staticmethod
+    def upsert_id(cursor, insert, params, keys):
+        """Run `insert` (INSERT ... VALUES for one row) and return the id of
+        the new row, or of the row that already has its unique `keys`."""
+        # LAST_INSERT_ID(id) makes lastrowid the existing row's id on a duplicate.
+        cursor.execute(insert + " ON DUPLICATE KEY UPDATE id = LAST_INSERT_ID(id)", params)
+        return cursor.lastrowid
+
+    @staticmethod
+    def inserted_ids(cursor, count):
+        """The ids of the `count` rows the last multi-row INSERT wrote."""
+        first_id = cursor.lastrowid
+        # A multi-row INSERT reserves consecutive ids and reports the first.
+        cursor.execute("SELECT @@auto_increment_increment AS step")
+        step = cursor.fetchone()["step"]
+        return [first_id + n * step for n in range(count)]
+
+    @staticmethod
+    def like(column):
+        return f"{column} LIKE %s"
+
+    @staticmethod
+    def word_match(column):
+        """A condition true when `column` contains words starting with each
+        of the words given to word_pattern; answered by a FULLTEXT index."""
+        return f"MATCH({column}) AGAINST (%s IN BOOLEAN MODE)"
+
+    @staticmethod
+    def word_pattern(words):
+        return " ".join(f"+{word}*" for word in words)
+
+    def close(self):
+        # Closes the idle connections; borrowed ones close as they are returned.
+        with self.lock:
+            idle = self.idle
+            self.connections = []
+            self.idle = []
+            self.last_used = {}
+        for conn in idle:
+            conn.close()
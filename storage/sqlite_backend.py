@@ -0,0 +1,373 @@
+import datetime
+import sqlite3
+import threading
+from contextlib import contextmanager
+from decimal import Decimal
+from functools import lru_cache
+
+from utils import metrics
+
+# Applied to every connection. WAL lets readers carry on while a bill is
+# being written, and with synchronous=NORMAL a commit only appends to the
+# log instead of waiting for the disk twice; a power cut can lose the last
+# few commits but never corrupts the file.
+SQLITE_PRAGMAS = [
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA foreign_keys = ON",
+    "PRAGMA busy_timeout = 5000",
+    "PRAGMA cache_size = -32768",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA mmap_size = 268435456",
+]
+# Compiled statements kept per connection, keyed by SQL text.
+SQLITE_STATEMENT_CACHE = 512
+# Connections kept open between transactions; more are opened while more
+# threads are in a transaction at once, and closed when they finish.
+SQLITE_IDLE_CONNECTIONS = 4
+
+# The same tables as the MySQL schema. Names compare without case, as
+# MySQL's default collation does, and money is stored as REAL: amounts are
+# rounded back to the paisa whenever they are read.
+SQLITE_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS customers (
+        id INTEGER PRIMARY KEY,
+        name TEXT COLLATE NOCASE,
+        email TEXT,
+        phone TEXT,
+        UNIQUE (name, phone)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_customers_phone ON customers (phone)",
+    """
+    CREATE TABLE IF NOT EXISTS bills (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        customer_id INTEGER REFERENCES customers(id) ON DELETE CASCADE,
+        items TEXT,
+        total DECIMAL(12,2),
+        created_at TIMESTAMP DEFAULT (datetime('now', 'localtime'))
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_bills_created_at ON bills (created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_bills_customer ON bills (customer_id)",
+    """
+    CREATE TABLE IF NOT EXISTS bill_items (
+        id INTEGER PRIMARY KEY,
+        bill_id INTEGER NOT NULL REFERENCES bills(id) ON DELETE CASCADE,
+        line_no INTEGER NOT NULL,
+        item TEXT NOT NULL COLLATE NOCASE,
+        quantity INTEGER NOT NULL,
+        price DECIMAL(10,2) NOT NULL,
+        line_total DECIMAL(12,2) NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_bill_items_bill ON bill_items (bill_id, line_no)",
+    "CREATE INDEX IF NOT EXISTS idx_bill_items_item ON bill_items (item)",
+    """
+    CREATE TABLE IF NOT EXISTS sales_daily (
+        day DATE NOT NULL,
+        shard INTEGER NOT NULL DEFAULT 0,
+        bills INTEGER NOT NULL,
+        revenue DECIMAL(14,2) NOT NULL,
+        PRIMARY KEY (day, shard)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS sales_customer_daily (
+        day DATE NOT NULL,
+        customer_id INTEGER NOT NULL,
+        shard INTEGER NOT NULL DEFAULT 0,
+        bills INTEGER NOT NULL,
+        revenue DECIMAL(14,2) NOT NULL,
+        PRIMARY KEY (day, customer_id, shard)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_sales_customer ON sales_customer_daily (customer_id)",
+    """
+    CREATE TABLE IF NOT EXISTS sales_item_daily (
+        day DATE NOT NULL,
+        item TEXT NOT NULL COLLATE NOCASE,
+        shard INTEGER NOT NULL DEFAULT 0,
+        quantity INTEGER NOT NULL,
+        revenue DECIMAL(14,2) NOT NULL,
+        PRIMARY KEY (day, item, shard)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS products (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL COLLATE NOCASE UNIQUE,
+        price DECIMAL(10,2) NOT NULL,
+        active BOOLEAN NOT NULL DEFAULT TRUE,
+        updated_at TIMESTAMP DEFAULT (datetime('now', 'localtime'))
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_products_updated_at ON products (updated_at)",
+    # MySQL's ON UPDATE CURRENT_TIMESTAMP: only real changes move updated_at.
+    """
+    CREATE TRIGGER IF NOT EXISTS products_updated_at
+    AFTER UPDATE OF name, price, active ON products
+    FOR EACH ROW
+    WHEN NEW.updated_at IS OLD.updated_at
+     AND (NEW.name IS NOT OLD.name OR NEW.price IS NOT OLD.price OR NEW.active IS NOT OLD.active)
+    BEGIN
+        UPDATE products SET updated_at = datetime('now', 'localtime') WHERE id = NEW.id;
+    END
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS stock (
+        product_id INTEGER PRIMARY KEY REFERENCES products(id) ON DELETE CASCADE,
+        qty INTEGER NOT NULL DEFAULT 0
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS stock_movements (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        product_id INTEGER NOT NULL,
+        bill_id INTEGER,
+        qty_change INTEGER NOT NULL,
+        reason TEXT NOT NULL,
+        created_at TIMESTAMP DEFAULT (datetime('now', 'localtime'))
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_stock_movements_product ON stock_movements (product_id, id)",
+    "CREATE INDEX IF NOT EXISTS idx_stock_movements_bill ON stock_movements (bill_id)",
+]
+
+# Dates and times are stored as ISO text, which sorts chronologically, and
+# read back as date/datetime through the columns' declared types.
+sqlite3.register_adapter(datetime.datetime, lambda value: value.isoformat(" "))
+sqlite3.register_adapter(datetime.date, lambda value: value.isoformat())
+sqlite3.register_adapter(Decimal, float)
+sqlite3.register_converter("TIMESTAMP", lambda value: datetime.datetime.fromisoformat(value.decode()))
+sqlite3.register_converter("DATE", lambda value: datetime.date.fromisoformat(value.decode()))
+
+
+@lru_cache(maxsize=1024)
+def qmark(sql):
+    """The app writes %s placeholders, as mysql.connector wants; sqlite3 wants ?."""
+    return sql.replace("%s", "?")
+
+
+def dict_row(cursor, row):
+    return dict(zip([column[0] for column in cursor.description], row))
+
+
+def escape_like(text):
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+class SQLiteCursor:
+    """A sqlite3 cursor that accepts %s placeholders and returns dict rows,
+    like the dictionary cursors of the MySQL backend."""
+    def __init__(self, cursor):
+        self.cursor = cursor
+        self.cursor.row_factory = dict_row
+
+    def execute(self, sql, params=()):
+        self.cursor.execute(qmark(sql), params)
+
+    def executemany(self, sql, rows):
+        self.cursor.executemany(qmark(sql), rows)
+
+    def fetchone(self):
+        return self.cursor.fetchone()
+
+    def fetchmany(self, size):
+        return self.cursor.fetchmany(size)
+
+    def fetchall(self):
+        return self.cursor.fetchall()
+
+    @property
+    def lastrowid(self):
+        return self.cursor.lastrowid
+
+    @property
+    def rowcount(self):
+        return self.cursor.rowcount
+
+    def close(self):
+        self.cursor.close()
+
+
+class SQLiteBackend:
+    """A local SQLite file in WAL mode, for a single counter or offline use.
+
+    Transactions borrow a connection from a small pool of idle ones, so a
+    save costs no connect and reuses statements already compiled on that
+    connection, however often the GUI's worker threads come and go.
+    SQLite allows one writer at a time; other writers wait up to
+    busy_timeout.
+    """
+    name = "sqlite"
+
+    def __init__(self, path):
+        self.path = path
+        # Every open connection, and those of them no transaction is using.
+        self.connections = []
+        self.idle = []
+        self.lock = threading.Lock()
+
+    def connect(self):
+        conn = sqlite3.connect(
+            self.path,
+            detect_types=sqlite3.PARSE_DECLTYPES,
+            # Transactions are begun and ended explicitly in transaction().
+            isolation_level=None,
+            check_same_thread=False,
+            cached_statements=SQLITE_STATEMENT_CACHE,
+        )
+        for pragma in SQLITE_PRAGMAS:
+            conn.execute(pragma)
+        with self.lock:
+            self.connections.append(conn)
+        return conn
+
+    def acquire(self):
+        with self.lock:
+            if self.idle:
+                return self.idle.pop()
+        return self.connect()
+
+    def release(self, conn):
+        with self.lock:
+            if conn not in self.connections:
+                # close() ran while it was borrowed.
+                return
+            if len(self.idle) < SQLITE_IDLE_CONNECTIONS:
+                self.idle.append(conn)
+                return
+            self.connections.remove(conn)
+        conn.close()
+
+    @contextmanager
+    def transaction(self, write=True):
+        """See DBHandler.transaction. A write transaction takes the write
+        lock when it begins, waiting up to busy_timeout for it: taking it
+        at the first write instead fails at once if another connection
+        wrote since this one read, as SQLite cannot wait for that."""
+        conn = self.acquire()
+        try:
+            cursor = SQLiteCursor(conn.cursor())
+            conn.execute("BEGIN IMMEDIATE" if write else "BEGIN")
+            try:
+                yield cursor
+                with metrics.timer("db.commit"):
+                    conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            finally:
+                cursor.close()
+        finally:
+            self.release(conn)
+
+    @contextmanager
+    def migration_lock(self):
+        """See MySQLBackend.migration_lock. Each migration step is safe to
+        repeat and an SQLite file serves one counter, so nothing is held."""
+        yield
+
+    def create_schema(self, cursor):
+        for statement in SQLITE_SCHEMA:
+            cursor.execute(statement)
+
+    @staticmethod
+    def table_exists(cursor, table):
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", (table,))
+        return cursor.fetchone() is not None
+
+    @staticmethod
+    def column_exists(cursor, table, column):
+        cursor.execute("SELECT 1 FROM pragma_table_info(%s) WHERE name = %s", (table, column))
+        return cursor.fetchone() is not None
+
+    @staticmethod
+    def column_type(cursor, table, column):
+        """See MySQLBackend.column_type."""
+        cursor.execute("SELECT type FROM pragma_table_info(%s) WHERE name = %s", (table, column))
+        row = cursor.fetchone()
+        return row and row["type"].split("(")[0].lower()
+
+    @staticmethod
+    def index_exists(cursor, table, name):
+        cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'index' AND tbl_name = %s AND name = %s", (table, name)
+        )
+        return cursor.fetchone() is not None
+
+    @staticmethod
+    def ensure_index(cursor, table, name, columns, kind=""):
+        # SQLite has no FULLTEXT indexes; word_match scans instead.
+        if kind != "FULLTEXT":
+            cursor.execute(f"CREATE {kind} INDEX IF NOT EXISTS {name} ON {table} {columns}")
+
+    @staticmethod
+    def drop_index(cursor, table, name):
+        cursor.execute(f"DROP INDEX IF EXISTS {name}")
+
+    @staticmethod
+    def ensure_decimal_total(cursor):
+        # bills.total has always been DECIMAL here.
+        pass
+
+    @staticmethod
+    def shard_rollup(cursor, table, after, key):
+        """See MySQLBackend.shard_rollup. SQLite cannot change a primary key,
+        so the table is rebuilt from its definition in SQLITE_SCHEMA and its
+        rows copied; schema changes are transactional here."""
+        cursor.execute("SELECT name FROM pragma_table_info(%s)", (table,))
+        columns = ", ".join(row["name"] for row in cursor.fetchall())
+        statements = [statement for statement in SQLITE_SCHEMA if f" {table} (" in statement]
+        cursor.execute(f"ALTER TABLE {table} RENAME TO {table}_unsharded")
+        # The old table's indexes go with it, so they are made again after.
+        for statement in statements:
+            if "CREATE TABLE" in statement:
+                cursor.execute(statement)
+        cursor.execute(f"INSERT INTO {table} ({columns}) SELECT {columns} FROM {table}_unsharded")
+        cursor.execute(f"DROP TABLE {table}_unsharded")
+        for statement in statements:
+            if "CREATE INDEX" in statement:
+                cursor.execute(statement)
+
+    @staticmethod
+    def upsert(keys, **columns):
+        """See MySQLBackend.upsert."""
+        return f"ON CONFLICT ({keys}) DO UPDATE SET " + ", ".join(
+            f"{column} = {value.format(new=f'excluded.{column}')}" for column, value in columns.items()
+        )
+
+    @staticmethod
+    def upsert_id(cursor, insert, params, keys):
+        cursor.execute(insert + f" ON CONFLICT ({keys}) DO UPDATE SET id = id RETURNING id", params)
+        return cursor.fetchone()["id"]
+
+    @staticmethod
+    def inserted_ids(cursor, count):
+        # SQLite reports the last row of a multi-row INSERT; one writer at a
+        # time means the rows before it took the ids just below.
+        last_id = cursor.lastrowid
+        return list(range(last_id - count + 1, last_id + 1))
+
+    @staticmethod
+    def like(column):
+        return f"{column} LIKE %s ESCAPE '\\'"
+
+    @staticmethod
+    def word_match(column):
+        """See MySQLBackend.word_match. Without a FULLTEXT index this scans
+        `column`, which is fine at a single counter's volumes."""
+        return SQLiteBackend.like(column)
+
+    @staticmethod
+    def word_pattern(words):
+        return "%" + "%".join(escape_like(word) for word in words) + "%"
+
+    def close(self):
+        with self.lock:
+            for conn in self.connections:
+                conn.close()
+            self.connections = []
+            self.idle = []
@@ -0,0 +1,21 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db import DBHandler  # noqa: E402
+from storage.sqlite_backend import SQLiteBackend  # noqa: E402
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "billing.db")
+
+
+@pytest.fixture
+def db(db_path):
+    handler = DBHandler(backend=SQLiteBackend(db_path))
+    yield handler
+    handler.close()
@@ -0,0 +1,41 @@
+"""Validation of typed, pasted and imported bill lines."""
+import pytest
+from PySide6.QtGui import QValidator
+
+from bill_entry import parse_items_text, price_validator, quantity_validator, valid_price, valid_quantity
+
+QUANTITIES = ["1", "12", "9999", "0", "10000", "-1", "+5", "1.0", "1e2", "1_000", "1,000", " 5", "٣", "", "NaN"]
+PRICES = [
+    "0", "19.99", "19.9", "999999.99", "1000000", "19.999", "-1", "+1", "1e2", "1E2", "1_000", "1,000.00",
+    ".5", "5.", "NaN", "nan", "Infinity", "inf", "", "١٢",
+]
+
+
+def acceptable(validator, text):
+    return validator.validate(text, 0)[0] == QValidator.Acceptable
+
+
+@pytest.mark.parametrize("text", QUANTITIES)
+def test_quantity_matches_editor(text):
+    assert valid_quantity(text) == acceptable(quantity_validator(), text)
+
+
+@pytest.mark.parametrize("text", PRICES)
+def test_price_matches_editor(text):
+    assert valid_price(text) == acceptable(price_validator(), text)
+
+
+def test_accepted_values():
+    assert [text for text in QUANTITIES if valid_quantity(text)] == ["1", "12", "9999"]
+    assert [text for text in PRICES if valid_price(text)] == ["0", "19.99", "19.9", "999999.99"]
+
+
+@pytest.mark.parametrize("line", ["Pen,1e2,10", "Pen,1_000,10", "Pen,1,1e2", "Pen,1,1_000", "Pen,1,NaN"])
+def test_pasted_lines_held_to_editor_rules(line):
+    with pytest.raises(ValueError, match="Line 1"):
+        parse_items_text(line)
+
+
+def test_parse_items_text():
+    rows = parse_items_text("Item\tQuantity\tPrice\nPen\t2\t10.50\n\n\"Ink, blue\"\t1\t25\t\n")
+    assert [(row.name, row.quantity, row.price) for row in rows] == [("Pen", 2, 1050), ("Ink, blue", 1, 2500)]
@@ -0,0 +1,50 @@
+"""The NumPy line item kernels, against the same sums done in Decimal."""
+import random
+from decimal import Decimal, ROUND_HALF_UP
+
+from models.bill import LineItem
+from utils.line_items import LineItems, add_tax, apply_discount, percent_of
+
+
+def decimal_percent_of(amount, rate_bp):
+    return int((Decimal(amount) * rate_bp / 10000).quantize(Decimal(1), ROUND_HALF_UP))
+
+
+def test_percent_of_rounds_like_decimal():
+    rng = random.Random(7)
+    amounts = [rng.randint(-10 ** 9, 10 ** 9) for _ in range(5000)] + [50, -50, 150, -150, 0]
+    rates = [rng.choice([0, 1, 250, 500, 1250, 1800, 2800, 10000]) for _ in amounts]
+    assert percent_of(amounts, rates).tolist() == [
+        decimal_percent_of(amount, rate) for amount, rate in zip(amounts, rates)
+    ]
+
+
+def test_discount_and_tax():
+    amounts = [1999, 10000, 105, -2550]
+    assert apply_discount(amounts, 1000).tolist() == [
+        amount - decimal_percent_of(amount, 1000) for amount in amounts
+    ]
+    assert add_tax(amounts, 1800).tolist() == [amount + decimal_percent_of(amount, 1800) for amount in amounts]
+
+
+def test_bill_totals():
+    rng = random.Random(3)
+    bills = [
+        [LineItem(f"Item {n}", rng.randint(1, 20), rng.randint(1, 10 ** 6)) for n in range(rng.randint(0, 5))]
+        for _ in range(500)
+    ]
+    lines = LineItems.from_line_items(bills)
+    expected = [sum(item.total for item in items) for items in bills]
+    assert lines.bill_count == len(bills)
+    assert lines.bill_totals().tolist() == expected
+    assert lines.total() == sum(expected)
+    assert lines.bill_index().tolist() == [n for n, items in enumerate(bills) for _ in items]
+    # Tax per bill, on the exact bill totals.
+    assert add_tax(lines.bill_totals(), 500).tolist() == [
+        total + decimal_percent_of(total, 500) for total in expected
+    ]
+
+
+def test_from_bills_reads_rupee_prices_exactly():
+    lines = LineItems.from_bills([[("Pen", 3, 0.1), ("Ink", 1, "19.99")], [("Pad", 2, Decimal("1.15"))]])
+    assert lines.bill_totals().tolist() == [30 + 1999, 230]
@@ -0,0 +1,50 @@
+"""Schema migrations on a SQLite file."""
+import datetime
+
+from migrations import MIGRATIONS, NAME_WORDS_MIGRATION
+from models.bill import Bill, LineItem
+from models.customer import Customer
+
+
+def add_bill(db, name):
+    bill = Bill.new(Customer(None, name, "9000000000", ""), [LineItem("Pen", 1, 1000)], datetime.datetime(2024, 3, 1))
+    db.add_bills_bulk([bill])
+
+
+def forget_manual_migrations(db):
+    with db.transaction() as cursor:
+        cursor.execute("DELETE FROM schema_version WHERE version IN (6, 7)")
+
+
+def test_new_database_gets_every_migration(db):
+    assert db.applied_migrations() == {migration.version for migration in MIGRATIONS}
+    assert db.pending_migrations() == []
+    assert db.schema_version() == MIGRATIONS[-1].version
+
+
+def test_up_to_date_database_takes_no_lock(db, monkeypatch):
+    def migration_lock():
+        raise AssertionError("locked with nothing to migrate")
+    monkeypatch.setattr(db.backend, "migration_lock", migration_lock)
+    assert db.migrate() == []
+
+
+def test_app_leaves_manual_migrations_on_mysql(db, monkeypatch):
+    add_bill(db, "Ravi Rao")
+    forget_manual_migrations(db)
+    monkeypatch.setattr(db.backend, "name", "mysql")
+
+    # bills.total is DECIMAL already, so 6 has nothing to do and is recorded.
+    assert [migration.version for migration in db.migrate(manual=False)] == [6]
+    assert [migration.version for migration in db.pending_migrations()] == [NAME_WORDS_MIGRATION]
+    # Matching words inside names needs migration 7's index on MySQL.
+    assert db.search_bills("Rao") == []
+    assert [bill.customer.name for bill in db.search_bills("Ravi")] == ["Ravi Rao"]
+
+    assert [migration.version for migration in db.migrate()] == [NAME_WORDS_MIGRATION]
+    assert [bill.customer.name for bill in db.search_bills("Rao")] == ["Ravi Rao"]
+
+
+def test_app_applies_manual_migrations_on_sqlite(db):
+    forget_manual_migrations(db)
+    assert [migration.version for migration in db.migrate(manual=False)] == [6, NAME_WORDS_MIGRATION]
@@ -0,0 +1,55 @@
+"""The streamed bill summary PDF."""
+import datetime
+import re
+
+import pytest
+
+from models.bill import Bill, LineItem
+from models.customer import Customer
+from utils.pdf_exporter import ExportCancelled, export_bill_summary, invoice_renderer, write_summary
+
+NAMES = ["Ravi Rao", "Željko Ćosić", "रवि शर्मा", "Zoë Iyer"]
+
+
+def bills(count):
+    return [
+        Bill(n + 1, Customer(n + 1, NAMES[n % len(NAMES)], "9000000000", ""),
+             [LineItem("Pen", 1, 1000)], 1000, datetime.datetime(2024, 3, 1))
+        for n in range(count)
+    ]
+
+
+def without_date(pdf):
+    return re.sub(rb"/CreationDate \(D:\d+\)", b"", pdf)
+
+
+def test_streamed_file_matches_fpdf(tmp_path):
+    path = str(tmp_path / "summary.pdf")
+    assert export_bill_summary(bills(100), path) == (100, 1000.0)
+
+    pdf = invoice_renderer().new_document()
+    write_summary(pdf, bills(100), "All Bills Summary", None, None)
+    with open(path, "rb") as f:
+        assert without_date(f.read()) == without_date(pdf.output(dest="S").encode("latin-1"))
+
+
+def test_cross_reference_offsets(tmp_path):
+    path = str(tmp_path / "summary.pdf")
+    export_bill_summary(bills(200), path)
+    with open(path, "rb") as f:
+        data = f.read()
+    xref = int(data.rsplit(b"startxref\n", 1)[1].split()[0])
+    entries = data[xref:].split(b"\n")[3:]
+    objects = int(data[xref:].split(b"\n")[1].split()[1])
+    for number in range(1, objects):
+        offset = int(entries[number - 1].split()[0])
+        assert data[offset:].startswith(f"{number} 0 obj".encode())
+
+
+def test_cancel_keeps_the_old_file(tmp_path):
+    path = tmp_path / "summary.pdf"
+    path.write_bytes(b"old")
+    with pytest.raises(ExportCancelled):
+        export_bill_summary(bills(10), str(path), cancelled=lambda: True)
+    assert path.read_bytes() == b"old"
+    assert not (tmp_path / "summary.pdf.part").exists()
@@ -0,0 +1,339 @@
+"""The DB layer against a SQLite file: stock, rollups and pagination."""
+import datetime
+import sqlite3
+import threading
+from decimal import Decimal
+
+import pytest
+
+from db import DBHandler, ROLLUP_SHARDS
+from models.bill import Bill, LineItem
+from models.customer import Customer
+from storage.sqlite_backend import SQLITE_IDLE_CONNECTIONS, SQLiteBackend
+
+DAY = datetime.datetime(2024, 3, 1, 10, 0)
+
+
+def stock(db):
+    return {row["name"]: row["qty"] for row in db.get_stock()}
+
+
+def new_bill(name, items, created_at, phone="9000000000"):
+    return Bill.new(Customer(None, name, phone, ""), items, created_at)
+
+
+def sales(db):
+    return {row["day"]: (row["bills"], Decimal(str(row["revenue"]))) for row in db.sales_by_day()}
+
+
+class TestStock:
+    @pytest.fixture(autouse=True)
+    def catalog(self, db):
+        db.save_products([("Pen", 1000), ("Ink", 2500)])
+
+    def test_new_products_start_at_zero(self, db):
+        assert stock(db) == {"Ink": 0, "Pen": 0}
+
+    def test_adjust_stock(self, db):
+        assert db.adjust_stock([("pen", 5), ("Pen", 2), ("Ink", -1)]) == 2
+        assert stock(db) == {"Ink": -1, "Pen": 7}
+
+    def test_adjust_unknown_product_changes_nothing(self, db):
+        with pytest.raises(ValueError, match="Eraser"):
+            db.adjust_stock([("Pen", 5), ("Eraser", 1)])
+        assert stock(db) == {"Ink": 0, "Pen": 0}
+
+    def test_product_without_stock_row(self, db):
+        with db.transaction() as cursor:
+            cursor.execute("DELETE FROM stock")
+        db.adjust_stock([("Pen", 4)])
+        assert stock(db) == {"Pen": 4}
+
+    def test_sales_edits_and_deletes_move_stock(self, db):
+        db.adjust_stock([("Pen", 10), ("Ink", 10)])
+        customer_id = db.add_customer("Asha", "", "9000000001")
+        bill_id = db.add_bill(customer_id, [LineItem("Pen", 3, 1000), LineItem("Notebook", 1, 500)], 3500)
+        assert stock(db) == {"Ink": 10, "Pen": 7}
+
+        db.update_bill(bill_id, [LineItem("Pen", 1, 1000), LineItem("Ink", 2, 2500)], 6000)
+        assert stock(db) == {"Ink": 8, "Pen": 9}
+
+        db.delete_bill(bill_id)
+        assert stock(db) == {"Ink": 10, "Pen": 10}
+        with db.transaction() as cursor:
+            cursor.execute("SELECT SUM(qty_change) AS net FROM stock_movements WHERE bill_id = %s", (bill_id,))
+            assert cursor.fetchone()["net"] == 0
+
+    def net_movement(self, db, bill_id):
+        with db.transaction(write=False) as cursor:
+            cursor.execute("SELECT SUM(qty_change) AS net FROM stock_movements WHERE bill_id = %s", (bill_id,))
+            return cursor.fetchone()["net"] or 0
+
+    def test_delete_after_product_added(self, db):
+        bill_id = db.add_bill(db.add_customer("Asha", "", "9000000001"), [LineItem("Eraser", 3, 500)], 1500)
+        db.save_products([("Eraser", 500)])
+        db.adjust_stock([("Eraser", 10)])
+        db.delete_bill(bill_id)
+        assert stock(db)["Eraser"] == 10
+        assert self.net_movement(db, bill_id) == 0
+
+    def test_edit_after_product_added(self, db):
+        bill_id = db.add_bill(db.add_customer("Asha", "", "9000000001"), [LineItem("Eraser", 3, 500)], 1500)
+        db.save_products([("Eraser", 500)])
+        db.adjust_stock([("Eraser", 10)])
+        # The edited lines sell from today's catalog; nothing was taken before.
+        db.update_bill(bill_id, [LineItem("Eraser", 2, 500)], 1000)
+        assert stock(db)["Eraser"] == 8
+        db.delete_bill(bill_id)
+        assert stock(db)["Eraser"] == 10
+        assert self.net_movement(db, bill_id) == 0
+
+    def test_delete_and_edit_after_rename(self, db):
+        db.adjust_stock([("Pen", 10), ("Ink", 10)])
+        customer_id = db.add_customer("Asha", "", "9000000001")
+        first = db.add_bill(customer_id, [LineItem("Pen", 3, 1000)], 3000)
+        second = db.add_bill(customer_id, [LineItem("Pen", 2, 1000), LineItem("Ink", 1, 2500)], 4500)
+        with db.transaction() as cursor:
+            cursor.execute("UPDATE products SET name = 'Blue Pen' WHERE name = 'Pen'")
+        assert stock(db) == {"Blue Pen": 5, "Ink": 9}
+
+        db.delete_bill(first)
+        assert stock(db) == {"Blue Pen": 8, "Ink": 9}
+        # "Pen" no longer names a product, so its stock goes back; Ink is unchanged.
+        db.update_bill(second, [LineItem("Pen", 2, 1000), LineItem("Ink", 1, 2500)], 4500)
+        assert stock(db) == {"Blue Pen": 10, "Ink": 9}
+        assert self.net_movement(db, first) == 0
+
+    def test_bulk_import_sells_stock(self, db):
+        db.add_bills_bulk([new_bill("Asha", [LineItem("Pen", 2, 1000)], DAY)] * 3)
+        assert stock(db)["Pen"] == -6
+
+    def test_concurrent_adjustments(self, db):
+        threads, rounds = 4, 25
+        errors = []
+
+        def adjust():
+            try:
+                for _ in range(rounds):
+                    db.adjust_stock([("Pen", 1)])
+            except Exception as e:
+                errors.append(e)
+
+        workers = [threading.Thread(target=adjust) for _ in range(threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        assert errors == []
+        assert stock(db)["Pen"] == threads * rounds
+
+
+class TestRollups:
+    def test_bills_edits_and_deletes(self, db):
+        first = new_bill("Asha", [LineItem("Pen", 2, 1000)], DAY)
+        second = new_bill("Ravi", [LineItem("Ink", 1, 2550)], DAY + datetime.timedelta(days=1), "9000000002")
+        db.add_bills_bulk([first, second])
+        db.add_bills_bulk([new_bill("Asha", [LineItem("Pen", 1, 1000)], DAY)])
+        assert sales(db) == {
+            DAY.date(): (2, Decimal("30.00")),
+            DAY.date() + datetime.timedelta(days=1): (1, Decimal("25.50")),
+        }
+
+        db.update_bill(first.id, [LineItem("Pen", 5, 1000)], 5000)
+        db.delete_bill(second.id)
+        assert sales(db)[DAY.date()] == (2, Decimal("60.00"))
+        assert sales(db)[DAY.date() + datetime.timedelta(days=1)] == (0, Decimal("0.00"))
+        assert [(row["item"], row["quantity"]) for row in db.top_items()] == [("Pen", 6)]
+        assert [(row["name"], row["bills"]) for row in db.top_customers()] == [("Asha", 2)]
+
+    def test_rebuild_matches_incremental(self, db):
+        customer_id = db.add_customer("Asha", "", "9000000001")
+        bill_id = db.add_bill(customer_id, [LineItem("Pen", 2, 1000)], 2000)
+        db.add_bill(customer_id, [LineItem("Ink", 1, 2500)], 2500)
+        db.update_bill(bill_id, [LineItem("Pen", 3, 1000)], 3000)
+        incremental = (db.sales_by_day(), db.top_items(), db.top_customers())
+        db.rebuild_rollups()
+        assert (db.sales_by_day(), db.top_items(), db.top_customers()) == incremental
+
+    def test_sales_by_month(self, db):
+        db.add_bills_bulk([
+            new_bill("Asha", [LineItem("Pen", 1, 1000)], datetime.datetime(2024, 1, 5)),
+            new_bill("Asha", [LineItem("Pen", 1, 1000)], datetime.datetime(2024, 1, 20)),
+            new_bill("Asha", [LineItem("Pen", 1, 1000)], datetime.datetime(2024, 2, 1)),
+        ])
+        months = [(row["day"], row["bills"]) for row in db.sales_by_month()]
+        assert months == [(datetime.date(2024, 1, 1), 2), (datetime.date(2024, 2, 1), 1)]
+
+    def test_bills_spread_over_shards(self, db):
+        bills = [new_bill("Asha", [LineItem("Pen", 1, 1000)], DAY) for _ in range(2 * ROLLUP_SHARDS)]
+        db.add_bills_bulk(bills)
+        db.delete_bill(bills[0].id)
+        with db.transaction(write=False) as cursor:
+            for table in ("sales_daily", "sales_customer_daily", "sales_item_daily"):
+                cursor.execute(f"SELECT COUNT(*) AS n FROM {table}")
+                assert cursor.fetchone()["n"] == ROLLUP_SHARDS
+        assert sales(db) == {DAY.date(): (2 * ROLLUP_SHARDS - 1, Decimal(2 * ROLLUP_SHARDS - 1) * 10)}
+        assert [(row["item"], row["quantity"]) for row in db.top_items()] == [("Pen", 2 * ROLLUP_SHARDS - 1)]
+        assert [(row["name"], row["bills"]) for row in db.top_customers()] == [("Asha", 2 * ROLLUP_SHARDS - 1)]
+
+    def test_migration_shards_existing_rollups(self, db, db_path):
+        db.add_bills_bulk([new_bill("Asha", [LineItem("Pen", 1, 1000)], DAY)])
+        db.close()
+        conn = sqlite3.connect(db_path)
+        conn.executescript("""
+            DROP TABLE sales_daily;
+            CREATE TABLE sales_daily (day DATE PRIMARY KEY, bills INTEGER NOT NULL, revenue DECIMAL(14,2) NOT NULL);
+            INSERT INTO sales_daily VALUES ('2024-03-01', 1, 10);
+            DELETE FROM schema_version WHERE version >= 4;
+        """)
+        conn.close()
+
+        migrated = DBHandler(backend=SQLiteBackend(db_path))
+        try:
+            migrated.add_bills_bulk([new_bill("Asha", [LineItem("Pen", 1, 1000)], DAY)])
+            assert sales(migrated) == {DAY.date(): (2, Decimal("20"))}
+        finally:
+            migrated.close()
+
+    def test_migration_shards_customer_and_item_rollups(self, db, db_path):
+        db.add_bills_bulk([new_bill("Asha", [LineItem("Pen", 1, 1000)], DAY)])
+        db.close()
+        conn = sqlite3.connect(db_path)
+        conn.executescript("""
+            DROP TABLE sales_customer_daily;
+            DROP TABLE sales_item_daily;
+            CREATE TABLE sales_customer_daily (
+                day DATE NOT NULL, customer_id INTEGER NOT NULL, bills INTEGER NOT NULL,
+                revenue DECIMAL(14,2) NOT NULL, PRIMARY KEY (day, customer_id)
+            );
+            CREATE INDEX idx_sales_customer ON sales_customer_daily (customer_id);
+            CREATE TABLE sales_item_daily (
+                day DATE NOT NULL, item TEXT NOT NULL COLLATE NOCASE, quantity INTEGER NOT NULL,
+                revenue DECIMAL(14,2) NOT NULL, PRIMARY KEY (day, item)
+            );
+            INSERT INTO sales_customer_daily SELECT '2024-03-01', id, 1, 10 FROM customers;
+            INSERT INTO sales_item_daily VALUES ('2024-03-01', 'Pen', 1, 10);
+            DELETE FROM schema_version WHERE version = 9;
+        """)
+        conn.close()
+
+        migrated = DBHandler(backend=SQLiteBackend(db_path))
+        try:
+            migrated.add_bills_bulk([new_bill("Asha", [LineItem("Pen", 2, 1000)], DAY)])
+            assert [(row["item"], row["quantity"]) for row in migrated.top_items()] == [("Pen", 3)]
+            assert [(row["name"], row["bills"]) for row in migrated.top_customers()] == [("Asha", 2)]
+            with migrated.transaction(write=False) as cursor:
+                assert migrated.backend.index_exists(cursor, "sales_customer_daily", "idx_sales_customer")
+        finally:
+            migrated.close()
+
+
+class TestPagination:
+    @pytest.fixture(autouse=True)
+    def history(self, db):
+        # Pairs of bills share a timestamp, so pages must break ties by id.
+        bills = [
+            new_bill(f"Customer {n}", [LineItem("Pen", n + 1, 1000)], DAY + datetime.timedelta(minutes=n // 2))
+            for n in range(25)
+        ]
+        db.add_bills_bulk(bills)
+
+    def walk(self, fetch, limit):
+        seen, after = [], None
+        while True:
+            page = fetch(after=after, limit=limit)
+            seen.extend(page)
+            if len(page) < limit:
+                return seen
+            after = DBHandler.page_key(page[-1])
+
+    def test_pages_cover_history_once_newest_first(self, db):
+        bills = self.walk(db.get_bills_page, 4)
+        assert len(bills) == 25
+        assert len({bill.id for bill in bills}) == 25
+        keys = [DBHandler.page_key(bill) for bill in bills]
+        assert keys == sorted(keys, reverse=True)
+        assert all(bill.items and bill.total == bill.items[0].total for bill in bills)
+
+    def test_search_pages(self, db):
+        hits = self.walk(lambda **page: db.search_bills("custom", **page), 3)
+        assert len({bill.id for bill in hits}) == len(hits) == 25
+
+    def test_iter_bill_range(self, db):
+        start, end = DAY + datetime.timedelta(minutes=2), DAY + datetime.timedelta(minutes=5)
+        bills = list(db.iter_bill_range(start, end, chunk_size=2, with_items=True))
+        assert len(bills) == 6 == db.count_bills(start, end)
+        assert [bill.created_at for bill in bills] == sorted(bill.created_at for bill in bills)
+
+    def test_get_all_bills(self, db):
+        assert len(db.get_all_bills()) == 25
+
+
+def test_threads_do_not_pile_up_connections(db):
+    # Like a thread pool retiring idle workers and starting new ones.
+    for _ in range(3):
+        workers = [threading.Thread(target=db.count_bills) for _ in range(3 * SQLITE_IDLE_CONNECTIONS)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+    assert len(db.backend.connections) <= SQLITE_IDLE_CONNECTIONS
+
+
+def test_handlers_share_a_file(db, db_path):
+    other = DBHandler(backend=SQLiteBackend(db_path))
+    try:
+        customer_id = other.add_customer("Asha", "", "9000000001")
+        other.add_bill(customer_id, [LineItem("Pen", 1, 1000)], 1000)
+        assert db.count_bills() == 1
+    finally:
+        other.close()
+
+
+class TestBillCache:
+    @pytest.fixture
+    def bill_id(self, db):
+        customer_id = db.add_customer("Asha", "", "9000000001")
+        return db.add_bill(customer_id, [LineItem("Pen", 2, 1000)], 2000)
+
+    def test_hits_return_copies(self, db, bill_id):
+        first = db.get_bill(bill_id)
+        first.items[0].quantity = 99
+        first.customer.name = "Changed"
+        second = db.get_bill(bill_id)
+        assert (second.items[0].quantity, second.customer.name) == (2, "Asha")
+        assert db.bill_cache_stats()["hits"] == 1
+
+    def test_writes_drop_cached_bill(self, db, bill_id):
+        db.get_bill(bill_id)
+        db.update_bill(bill_id, [LineItem("Pen", 3, 1000)], 3000)
+        assert db.get_bill(bill_id).total == 3000
+        db.delete_bill(bill_id)
+        assert db.get_bill(bill_id) is None
+
+    def test_edits_on_another_counter_are_not_served_stale(self, db, db_path, bill_id):
+        db.get_bill(bill_id)
+        other = DBHandler(backend=SQLiteBackend(db_path))
+        try:
+            other.update_bill(bill_id, [LineItem("Pen", 4, 1000)], 4000)
+            assert db.get_bill(bill_id).total == 4000
+            assert db.get_bill(bill_id).items[0].quantity == 4
+            other.delete_bill(bill_id)
+            assert db.get_bill(bill_id) is None
+        finally:
+            other.close()
+
+    def test_read_racing_a_write_is_not_cached(self, db, bill_id):
+        attach_items = db._attach_items
+
+        def attach_then_write(cursor, bills):
+            attach_items(cursor, bills)
+            # Another counter's edit commits after this read's snapshot.
+            writer = threading.Thread(target=db.update_bill, args=(bill_id, [LineItem("Pen", 5, 1000)], 5000))
+            writer.start()
+            writer.join()
+
+        db._attach_items = attach_then_write
+        assert db.get_bill(bill_id).total == 2000
+        del db._attach_items
+        assert db.get_bill(bill_id).total == 5000
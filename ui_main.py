@@ -1,7 +1,7 @@
 from PySide6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
-    QLabel, QLineEdit, QPushButton, QTableWidget, QTableWidgetItem,
-    QHeaderView
+    QLabel, QLineEdit, QPushButton,
+    QHeaderView, QTableView
 )
 from PySide6.QtGui import QFont
 from PySide6.QtCore import Qt
@@ -68,12 +68,11 @@ class Ui_MainWindow:
         self.total_label.setStyleSheet("margin: 10px 0;")
         main_layout.addWidget(self.total_label)
 
-        # Items Table Section
-        self.table = QTableWidget(0, 3)
-        self.table.setHorizontalHeaderLabels(["Item", "Qty", "Price"])
+        # Items Table Section (the model is set by the window using it)
+        self.table = QTableView()
         self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
         self.table.setStyleSheet("""
-            QTableWidget {
+            QTableView {
                 background-color: #ffffff;
                 border: 1px solid #DBE2EF;
                 border-radius: 10px;
@@ -87,17 +86,39 @@ class Ui_MainWindow:
         """)
         main_layout.addWidget(self.table, stretch=2)
 
+        # Bill History Section (shown in place of the items table)
+        self.bills_view = QTableView()
+        self.bills_view.setStyleSheet("""
+            QTableView {
+                background-color: #ffffff;
+                border: 1px solid #DBE2EF;
+                border-radius: 10px;
+            }
+            QHeaderView::section {
+                background-color: #DBE2EF;
+                font-weight: bold;
+                padding: 6px;
+                border: none;
+            }
+        """)
+        self.bills_view.setVisible(False)
+        main_layout.addWidget(self.bills_view, stretch=2)
+
         # Row Buttons
         row_btn_layout = QHBoxLayout()
         self.add_row_btn = QPushButton("➕ Add Row")
         self.remove_row_btn = QPushButton("➖ Remove Row")
         self.calculate_btn = QPushButton("Calculate Total")
+        self.import_items_btn = QPushButton("📥 Import Items")
         self.style_button(self.add_row_btn)
         self.style_button(self.remove_row_btn)
         self.style_button(self.calculate_btn)
+        self.style_button(self.import_items_btn)
+        self.import_items_btn.setToolTip("Add items from a CSV file. Ctrl+V on the table pastes copied rows.")
         row_btn_layout.addWidget(self.add_row_btn)
         row_btn_layout.addWidget(self.remove_row_btn)
         row_btn_layout.addWidget(self.calculate_btn)
+        row_btn_layout.addWidget(self.import_items_btn)
         row_btn_layout.addStretch()
         main_layout.addLayout(row_btn_layout)
 
@@ -108,10 +129,11 @@ class Ui_MainWindow:
         self.save_btn = QPushButton("💾 Save Bill")
         self.view_btn = QPushButton("📋 View Bills")
         self.export_btn = QPushButton("📤 Export PDF")
+        self.reports_btn = QPushButton("📈 Reports")
         self.search_input = QLineEdit()
         self.search_input.setPlaceholderText("🔍 Search by name/phone")
 
-        for btn in [self.new_btn, self.save_btn, self.view_btn, self.export_btn]:
+        for btn in [self.new_btn, self.save_btn, self.view_btn, self.export_btn, self.reports_btn]:
             self.style_button(btn)
 
         self.search_input.setStyleSheet("""
@@ -127,7 +149,8 @@ class Ui_MainWindow:
             }
         """)
 
-        for widget in [self.new_btn, self.save_btn, self.view_btn, self.export_btn, self.search_input]:
+        for widget in [self.new_btn, self.save_btn, self.view_btn, self.export_btn, self.reports_btn,
+                       self.search_input]:
             action_layout.addWidget(widget)
 
         main_layout.addLayout(action_layout)
@@ -136,8 +159,10 @@ class Ui_MainWindow:
         dashboard_layout = QHBoxLayout()
         dashboard_layout.setSpacing(30)
         self.label_total_bills = QLabel("Total Bills: 0")
+        self.label_today = QLabel("Today: ₹0.00")
+        self.label_month = QLabel("This Month: ₹0.00")
         self.label_revenue = QLabel("Revenue: ₹0.00")
-        for label in [self.label_total_bills, self.label_revenue]:
+        for label in [self.label_total_bills, self.label_today, self.label_month, self.label_revenue]:
             label.setFont(QFont("Segoe UI", 11, QFont.Bold))
             label.setStyleSheet("padding: 10px;")
             dashboard_layout.addWidget(label)
@@ -179,10 +204,9 @@ class MainWindow(QMainWindow):
         self.ui.bill_id.clear()
 
         # Reset table properly
-        self.ui.table.clear()
-        self.ui.table.setRowCount(0)
-        self.ui.table.setColumnCount(3)
-        self.ui.table.setHorizontalHeaderLabels(["Item", "Qty", "Price"])
+        model = self.ui.table.model()
+        if model is not None:
+            model.removeRows(0, model.rowCount())
 
         # Reset total label
         self.ui.total_label.setText("Total: ₹0.00")
@@ -0,0 +1,87 @@
+import os
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import datetime
+
+from models.bill import Bill, LineItem
+from models.customer import Customer
+from utils.pdf_exporter import invoice_renderer
+
+INVOICE_CHUNK_SIZE = 50
+SAMPLE_BILL = Bill(0, Customer(0, "", "", ""), [LineItem("", 1, 0)], 0, datetime.datetime(2000, 1, 1))
+
+
+def invoice_filename(bill):
+    return f"invoice_{bill.id:08d}.pdf"
+
+
+def _render_chunk(bills):
+    """Runs in a worker process: render each bill to (file name, PDF bytes)."""
+    renderer = invoice_renderer()
+    return [(invoice_filename(bill), renderer.render(bill)) for bill in bills]
+
+
+def _chunks(bills, size):
+    chunk = []
+    for bill in bills:
+        chunk.append(bill)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def generate_invoices(bills, output, workers=None, chunk_size=INVOICE_CHUNK_SIZE, progress=None):
+    """Render one invoice PDF per bill into a directory, or into a zip file
+    when `output` ends in ".zip".
+
+    Rendering is spread over a process pool, one chunk of bills per task.
+    Results are written in submission order and only a few chunks are in
+    flight per process, so output is deterministic and memory stays bounded
+    however many bills `bills` yields. Returns the number of invoices written.
+    """
+    workers = workers or os.cpu_count() or 1
+    # FPDF writes its font metric caches (.pkl files next to the fonts) the
+    # first time a document is rendered; do that here once so the workers
+    # only ever read them. Forked workers also inherit the parsed fonts.
+    invoice_renderer().render(SAMPLE_BILL)
+
+    if output.endswith(".zip"):
+        archive = zipfile.ZipFile(output, "w", zipfile.ZIP_DEFLATED)
+        write = archive.writestr
+    else:
+        archive = None
+        os.makedirs(output, exist_ok=True)
+
+        def write(name, data):
+            with open(os.path.join(output, name), "wb") as f:
+                f.write(data)
+
+    written = 0
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            in_flight = deque()
+            for chunk in _chunks(bills, chunk_size):
+                in_flight.append(pool.submit(_render_chunk, chunk))
+                if len(in_flight) < workers * 2:
+                    continue
+                written += _write_results(in_flight.popleft().result(), write)
+                if progress:
+                    progress(written)
+            while in_flight:
+                written += _write_results(in_flight.popleft().result(), write)
+                if progress:
+                    progress(written)
+    finally:
+        if archive is not None:
+            archive.close()
+    return written
+
+
+def _write_results(results, write):
+    for name, data in results:
+        write(name, data)
+    return len(results)
@@ -0,0 +1,45 @@
+import threading
+from collections import OrderedDict
+
+
+class LRUCache:
+    """A small thread-safe mapping that forgets its least recently used keys.
+    `hits` and `misses` count the lookups get() could and could not answer."""
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.data = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        with self.lock:
+            try:
+                self.data.move_to_end(key)
+            except KeyError:
+                self.misses += 1
+                return default
+            self.hits += 1
+            return self.data[key]
+
+    def put(self, key, value):
+        with self.lock:
+            self.data[key] = value
+            self.data.move_to_end(key)
+            if len(self.data) > self.maxsize:
+                self.data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        with self.lock:
+            return self.data.pop(key, default)
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
+
+    def stats(self):
+        with self.lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self.data), "maxsize": self.maxsize}
+
+    def __len__(self):
+        return len(self.data)
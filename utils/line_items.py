@@ -0,0 +1,92 @@
+import numpy as np
+
+
+def percent_of(amounts, rate_bp):
+    """`rate_bp` basis points of integer paise `amounts`, rounded half away
+    from zero like Decimal's ROUND_HALF_UP, so refunds mirror sales.
+
+    `rate_bp` may be one rate or one per amount (e.g. per bill).
+    """
+    scaled = np.asarray(amounts, dtype=np.int64) * np.asarray(rate_bp, dtype=np.int64)
+    return np.sign(scaled) * ((np.abs(scaled) + 5000) // 10000)
+
+
+def apply_discount(amounts, rate_bp):
+    return np.asarray(amounts, dtype=np.int64) - percent_of(amounts, rate_bp)
+
+
+def add_tax(amounts, rate_bp):
+    return np.asarray(amounts, dtype=np.int64) + percent_of(amounts, rate_bp)
+
+
+class LineItems:
+    """The (item, qty, price) lines of many bills, stored column-wise.
+
+    Quantities and prices (in paise) are int64 arrays with one entry per
+    line, and bill n owns lines offsets[n]:offsets[n + 1]. Totals are exact
+    integer arithmetic over whole columns, so they neither loop in Python
+    nor pick up float rounding errors.
+    """
+    def __init__(self, names, quantity, price, offsets):
+        self.names = names
+        self.quantity = quantity
+        self.price = price
+        self.offsets = offsets
+
+    @classmethod
+    def from_bills(cls, item_lists):
+        """Build from one list of (item, qty, price in rupees) tuples per
+        bill, as stored in the legacy bills.items JSON."""
+        names, quantity, price, offsets = [], [], [], [0]
+        for items in item_lists:
+            for name, qty, unit_price in items:
+                names.append(name)
+                quantity.append(qty)
+                price.append(unit_price)
+            offsets.append(len(names))
+        return cls(
+            names,
+            np.asarray(quantity, dtype=np.int64),
+            # Prices have at most two decimals, so rounding recovers the exact paise.
+            np.rint(np.asarray(price, dtype=np.float64) * 100).astype(np.int64),
+            np.asarray(offsets, dtype=np.int64)
+        )
+
+    @classmethod
+    def from_line_items(cls, item_lists):
+        """Build from one list of LineItem objects per bill."""
+        names, quantity, price, offsets = [], [], [], [0]
+        for items in item_lists:
+            for item in items:
+                names.append(item.name)
+                quantity.append(item.quantity)
+                price.append(item.price)
+            offsets.append(len(names))
+        return cls(
+            names,
+            np.asarray(quantity, dtype=np.int64),
+            np.asarray(price, dtype=np.int64),
+            np.asarray(offsets, dtype=np.int64)
+        )
+
+    def __len__(self):
+        return len(self.quantity)
+
+    @property
+    def bill_count(self):
+        return len(self.offsets) - 1
+
+    def line_totals(self):
+        return self.quantity * self.price
+
+    def bill_totals(self):
+        """Total of each bill in paise; bills without lines total 0."""
+        running = np.concatenate(([0], np.cumsum(self.line_totals())))
+        return running[self.offsets[1:]] - running[self.offsets[:-1]]
+
+    def bill_index(self):
+        """The bill number of every line."""
+        return np.repeat(np.arange(self.bill_count), np.diff(self.offsets))
+
+    def total(self):
+        return int(self.line_totals().sum())
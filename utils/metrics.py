@@ -0,0 +1,166 @@
+"""Latency histograms and counters for the hot paths.
+
+Off unless BILLING_METRICS=1 is set when the app starts. When off, timed()
+and instrument() return the functions and classes they are given
+unchanged, and timer() returns a shared do-nothing context manager, so
+instrumented code runs as if it were not instrumented.
+"""
+import functools
+import inspect
+import json
+import math
+import os
+import threading
+import time
+from collections import deque
+from contextlib import nullcontext
+
+ENABLED = os.environ.get("BILLING_METRICS") == "1"
+# Where the app periodically writes its metrics; see dump().
+DUMP_PATH = os.environ.get("BILLING_METRICS_FILE")
+# Percentiles are taken over each operation's most recent samples.
+SAMPLE_WINDOW = 2048
+PERCENTILES = (0.5, 0.95, 0.99)
+PROMETHEUS_PREFIX = "billing"
+
+NULL_TIMER = nullcontext()
+
+_lock = threading.Lock()
+histograms = {}
+counters = {}
+
+
+class Histogram:
+    """Latencies of one operation: exact count, sum and max, and
+    percentiles over the last SAMPLE_WINDOW observations."""
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.samples = deque(maxlen=SAMPLE_WINDOW)
+        self.lock = threading.Lock()
+
+    def observe(self, seconds):
+        with self.lock:
+            self.count += 1
+            self.total += seconds
+            if seconds > self.max:
+                self.max = seconds
+            self.samples.append(seconds)
+
+    def snapshot(self):
+        with self.lock:
+            samples = sorted(self.samples)
+            snapshot = {"count": self.count, "sum": self.total, "max": self.max}
+        for q in PERCENTILES:
+            # Nearest rank.
+            snapshot[f"p{round(q * 100)}"] = samples[max(math.ceil(q * len(samples)) - 1, 0)] if samples else 0.0
+        return snapshot
+
+
+class Timer:
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.started)
+
+
+def histogram(name):
+    with _lock:
+        hist = histograms.get(name)
+        if hist is None:
+            hist = histograms[name] = Histogram()
+        return hist
+
+
+def count(name, n=1):
+    if ENABLED:
+        with _lock:
+            counters[name] = counters.get(name, 0) + n
+
+
+def timer(name):
+    """A context manager that times its block as operation `name`."""
+    return Timer(histogram(name)) if ENABLED else NULL_TIMER
+
+
+def timed(name):
+    """Decorator: time every call of the function as operation `name`."""
+    def decorate(fn):
+        if not ENABLED:
+            return fn
+        hist = histogram(name)
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                hist.observe(time.perf_counter() - started)
+        return wrapper
+    return decorate
+
+
+def instrument(prefix, skip=()):
+    """Class decorator: time each public method as `prefix.method`.
+    Generators and the methods in `skip` are left alone, since timing the
+    call would only time their creation."""
+    def decorate(cls):
+        if not ENABLED:
+            return cls
+        for name, attr in list(vars(cls).items()):
+            if name.startswith("_") or name in skip:
+                continue
+            if inspect.isfunction(attr) and not inspect.isgeneratorfunction(attr):
+                setattr(cls, name, timed(f"{prefix}.{name}")(attr))
+        return cls
+    return decorate
+
+
+def snapshot():
+    """{"timings": {name: histogram snapshot}, "counters": {name: n}} for
+    the operations run so far, with times in seconds."""
+    with _lock:
+        hists = dict(histograms)
+        counts = dict(counters)
+    return {
+        "timestamp": time.time(),
+        "timings": {name: hist.snapshot() for name, hist in sorted(hists.items()) if hist.count},
+        "counters": dict(sorted(counts.items())),
+    }
+
+
+def prometheus_text(data=None):
+    """`data` (snapshot() by default) in the Prometheus text format: one
+    summary for all timings, labelled by operation, and one counter each."""
+    data = data or snapshot()
+    metric = f"{PROMETHEUS_PREFIX}_operation_seconds"
+    lines = [f"# TYPE {metric} summary"]
+    for name, stats in data["timings"].items():
+        for q in PERCENTILES:
+            lines.append(f'{metric}{{op="{name}",quantile="{q}"}} {stats[f"p{round(q * 100)}"]:.6f}')
+        lines.append(f'{metric}_sum{{op="{name}"}} {stats["sum"]:.6f}')
+        lines.append(f'{metric}_count{{op="{name}"}} {stats["count"]}')
+    for name, value in data["counters"].items():
+        counter = f"{PROMETHEUS_PREFIX}_{name.replace('.', '_')}_total"
+        lines.append(f"# TYPE {counter} counter")
+        lines.append(f"{counter} {value}")
+    return "\n".join(lines) + "\n"
+
+
+def dump(path):
+    """Write the current metrics to `path`: Prometheus text for a .prom file
+    (for node_exporter's textfile collector), JSON otherwise. The file is
+    replaced in one step, so readers never see it half written."""
+    data = snapshot()
+    text = prometheus_text(data) if path.endswith(".prom") else json.dumps(data, indent=2)
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(temp_path, path)
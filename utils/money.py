@@ -0,0 +1,18 @@
+from decimal import Decimal, ROUND_HALF_UP
+
+
+def to_paise(amount):
+    """Rupees (float, Decimal or str) to integer paise."""
+    return int((Decimal(str(amount)) * 100).quantize(Decimal(1), ROUND_HALF_UP))
+
+
+def paise_to_decimal(paise):
+    """Integer paise to an exact Decimal for DECIMAL columns."""
+    return Decimal(int(paise)).scaleb(-2)
+
+
+def format_paise(paise):
+    """Integer paise as rupees with two decimals, e.g. 1240 -> "12.40"."""
+    sign = "-" if paise < 0 else ""
+    rupees, paise = divmod(abs(int(paise)), 100)
+    return f"{sign}{rupees}.{paise:02d}"
@@ -1,43 +1,290 @@
+import os
+import zlib
+
+import fpdf.fpdf
 from fpdf import FPDF
-from PyQt5.QtWidgets import QFileDialog, QMessageBox
+from fpdf.ttfonts import TTFontFile
+
+from utils import metrics
+from utils.cache import LRUCache
+from utils.money import format_paise
+
+FONT_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "assets", "fonts")
+SUMMARY_PROGRESS_EVERY = 500
+SUBSET_CACHE_SIZE = 64
+# Every invoice font starts with the first 127 code points in its subset, so
+# invoices with plain ASCII text all embed the same subset (see below).
+BASE_SUBSET = range(127)
+
+
+class ExportCancelled(Exception):
+    pass
+
+
+subset_cache = LRUCache(SUBSET_CACHE_SIZE)
+
+
+class CachedTTFontFile(TTFontFile):
+    """Reuses the embedded font subset for documents using the same characters.
+
+    FPDF re-parses the whole TTF and rebuilds the subset every time a
+    document using a Unicode font is written, which costs far more than
+    laying out an invoice.
+    """
+    def makeSubset(self, file, subset):
+        key = (file, frozenset(subset))
+        cached = subset_cache.get(key)
+        if cached is None:
+            stream = super().makeSubset(file, subset)
+            cached = (stream, self.codeToGlyph, self.maxUni)
+            subset_cache.put(key, cached)
+        stream, self.codeToGlyph, self.maxUni = cached
+        return stream
+
+
+fpdf.fpdf.TTFontFile = CachedTTFontFile
+
+
+class SubsetList(list):
+    """A font's subset: the code points a document uses. FPDF appends every
+    character it writes, so a long document would list each character
+    thousands of times; this keeps only the first of each."""
+    def __init__(self, code_points=()):
+        super().__init__()
+        self.seen = set()
+        for code_point in code_points:
+            self.append(code_point)
+
+    def append(self, code_point):
+        if code_point not in self.seen:
+            self.seen.add(code_point)
+            super().append(code_point)
+
+    def __contains__(self, code_point):
+        return code_point in self.seen
+
+
+class FileBuffer:
+    """Stands in for FPDF's output string: text added with += is written to
+    `file` at once, and len() is the number of bytes written so far, which
+    is what FPDF needs for its cross-reference table."""
+    def __init__(self, file):
+        self.file = file
+        self.size = 0
+
+    def __iadd__(self, text):
+        data = text.encode("latin-1")
+        self.file.write(data)
+        self.size += len(data)
+        return self
+
+    def __len__(self):
+        return self.size
+
+
+class StreamingPDF(FPDF):
+    """An FPDF that writes each page to `file` as soon as the page is
+    finished, so a document of any length only holds one page in memory.
+    Fonts and the page tree, which depend on every page, follow at the end.
+
+    Pages are written in FPDF's own layout (page n is objects 1 + 2n and
+    2 + 2n), so only what the bill summary uses is supported: no {nb}
+    alias, links, images or orientation changes.
+    """
+    def __init__(self, file):
+        super().__init__()
+        self.buffer = FileBuffer(file)
+        self.buffer += f"%PDF-{self.pdf_version}\n"
+
+    def _putheader(self):
+        # Written when the document was created.
+        pass
+
+    def _endpage(self):
+        super()._endpage()
+        content = self.pages[self.page].encode("latin-1")
+        self.pages[self.page] = ""
+        self._newobj()
+        self._out("<</Type /Page")
+        self._out("/Parent 1 0 R")
+        self._out("/Resources 2 0 R")
+        if self.pdf_version > "1.3":
+            self._out("/Group <</Type /Group /S /Transparency /CS /DeviceRGB>>")
+        self._out(f"/Contents {self.n + 1} 0 R>>")
+        self._out("endobj")
+        if self.compress:
+            content = zlib.compress(content)
+        self._newobj()
+        self._out(f"<<{'/Filter /FlateDecode ' if self.compress else ''}/Length {len(content)}>>")
+        self._putstream(content)
+        self._out("endobj")
+
+    def _putpages(self):
+        # Only the page tree is left; the pages were written as they ended.
+        self.offsets[1] = len(self.buffer)
+        self._out("1 0 obj")
+        self._out("<</Type /Pages")
+        self._out("/Kids [" + "".join(f"{3 + 2 * n} 0 R " for n in range(self.page)) + "]")
+        self._out(f"/Count {self.page}")
+        width, height = (self.fw_pt, self.fh_pt) if self.def_orientation == "P" else (self.fh_pt, self.fw_pt)
+        self._out(f"/MediaBox [0 0 {width:.2f} {height:.2f}]")
+        self._out(">>")
+        self._out("endobj")
+
+
+@metrics.instrument("pdf")
+class InvoiceRenderer:
+    """Renders invoices with the fonts parsed once instead of once per document.
+
+    Keep one per process; it can lay out any number of bills into one
+    document or into one document each.
+    """
+    def __init__(self):
+        template = FPDF()
+        # Add Unicode fonts so customer and item names in any script render.
+        template.add_font("DejaVu", "", os.path.join(FONT_DIR, "DejaVuSans.ttf"), uni=True)
+        template.add_font("DejaVu", "B", os.path.join(FONT_DIR, "DejaVuSans-Bold.ttf"), uni=True)
+        self.fonts = template.fonts
+        self.font_files = template.font_files
+
+    def new_document(self, pdf=None):
+        """Register the invoice fonts with `pdf` (a new FPDF by default) and
+        return it."""
+        if pdf is None:
+            pdf = FPDF()
+        for key, font in self.fonts.items():
+            # Font metrics are shared; only the subset is per document.
+            pdf.fonts[key] = dict(font, subset=SubsetList(BASE_SUBSET))
+        pdf.font_files.update(self.font_files)
+        return pdf
+
+    def render(self, bill):
+        """Return one bill's invoice as PDF bytes."""
+        return self.render_many([bill])
+
+    def render_many(self, bills):
+        """Return one PDF with a page per bill."""
+        pdf = self.new_document()
+        for bill in bills:
+            render_invoice(pdf, bill)
+        # FPDF 1.7 returns the document as a latin-1 string.
+        return pdf.output(dest="S").encode("latin-1")
+
+    def save(self, bill, file_path):
+        pdf = self.new_document()
+        render_invoice(pdf, bill)
+        pdf.output(file_path)
+
+
+_renderer = None
+
+
+def invoice_renderer():
+    """Return this process's shared InvoiceRenderer, creating it on first use."""
+    global _renderer
+    if _renderer is None:
+        _renderer = InvoiceRenderer()
+    return _renderer
+
+
+def render_invoice(pdf, bill):
+    """Lay out one bill as an invoice on a new page of `pdf`."""
+    pdf.add_page()
+    pdf.set_font("DejaVu", "B", 16)
+    pdf.cell(200, 10, txt="Customer Bill", ln=True, align="C")
+
+    pdf.set_font("DejaVu", "", 12)
+    pdf.cell(200, 10, txt=f"Name: {bill.customer.name}", ln=True)
+    pdf.cell(200, 10, txt=f"Phone: {bill.customer.phone}", ln=True)
+    pdf.cell(200, 10, txt=f"Email: {bill.customer.email}", ln=True)
+    pdf.cell(200, 10, txt=f"Date: {bill.date}", ln=True)
+
+    pdf.ln(5)
+    pdf.set_font("DejaVu", "B", 12)
+    pdf.cell(60, 10, "Item", border=1)
+    pdf.cell(40, 10, "Quantity", border=1)
+    pdf.cell(40, 10, "Price", border=1)
+    pdf.cell(40, 10, "Total", border=1)
+    pdf.ln()
+
+    pdf.set_font("DejaVu", "", 12)
+    for item in bill.items:
+        pdf.cell(60, 10, item.name, border=1)
+        pdf.cell(40, 10, str(item.quantity), border=1)
+        pdf.cell(40, 10, format_paise(item.price), border=1)
+        pdf.cell(40, 10, format_paise(item.total), border=1)
+        pdf.ln()
+
+    pdf.ln(5)
+    pdf.set_font("DejaVu", "B", 14)
+    pdf.cell(200, 10, txt=f"Total Amount: Rs. {format_paise(bill.total)}", ln=True)
+
 
 class PDFExporter:
     @staticmethod
+    @metrics.timed("pdf.export_bill")
     def export_bill(bill, file_path):
-        pdf = FPDF()
-        pdf.add_page()
-
-        # Add Unicode font (Ensure .ttf is present at this path)
-        pdf.add_font("DejaVu", "", "assets/fonts/DejaVuSans.ttf", uni=True)
-        pdf.set_font("DejaVu", "B", 16)
-        pdf.cell(200, 10, txt="Customer Bill", ln=True, align="C")
-
-        pdf.set_font("DejaVu", "", 12)
-        pdf.cell(200, 10, txt=f"Name: {bill['name']}", ln=True)
-        pdf.cell(200, 10, txt=f"Phone: {bill['phone']}", ln=True)
-        pdf.cell(200, 10, txt=f"Email: {bill['email']}", ln=True)
-        pdf.cell(200, 10, txt=f"Date: {bill['date']}", ln=True)
-
-        pdf.ln(5)
-        pdf.set_font("DejaVu", "B", 12)
-        pdf.cell(60, 10, "Item", border=1)
-        pdf.cell(40, 10, "Quantity", border=1)
-        pdf.cell(40, 10, "Price", border=1)
-        pdf.cell(40, 10, "Total", border=1)
-        pdf.ln()
+        invoice_renderer().save(bill, f"assets/{file_path}")
+
+
+@metrics.timed("pdf.export_bill_summary")
+def export_bill_summary(bills, file_path, title="All Bills Summary", progress=None, cancelled=None):
+    """Write a one-row-per-bill summary of `bills` to `file_path`.
+
+    `bills` may be a generator; each bill is rendered and dropped as soon as
+    it is read, and each page is written out as soon as it is full, so
+    memory stays flat however many bills there are. The document is built
+    in `file_path`.part and only replaces `file_path` once complete.
+    `progress` is called with the running count and `cancelled` is polled
+    between rows. Returns (bill count, total revenue).
+    """
+    part_path = f"{file_path}.part"
+    try:
+        with open(part_path, "wb") as f:
+            pdf = invoice_renderer().new_document(StreamingPDF(f))
+            count, revenue = write_summary(pdf, bills, title, progress, cancelled)
+            pdf.close()
+        os.replace(part_path, file_path)
+    except BaseException:
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        raise
+    if progress:
+        progress(count)
+    return count, revenue / 100
+
+
+def write_summary(pdf, bills, title, progress, cancelled):
+    pdf.set_auto_page_break(auto=True, margin=15)
+    pdf.add_page()
+
+    # The invoice fonts, so names in any script render.
+    pdf.set_font("DejaVu", "", 12)
+    pdf.cell(200, 10, title, ln=True, align="C")
+    pdf.ln(10)
+
+    pdf.set_font("DejaVu", "B", 12)
+    pdf.cell(50, 10, "Customer", border=1)
+    pdf.cell(50, 10, "Amount", border=1)
+    pdf.cell(50, 10, "Date", border=1)
+    pdf.cell(40, 10, "Action", border=1, ln=True)
+
+    pdf.set_font("DejaVu", "", 12)
+    count = 0
+    revenue = 0
+    for bill in bills:
+        if cancelled and cancelled():
+            raise ExportCancelled()
+        pdf.cell(50, 10, bill.customer.name, border=1)
+        pdf.cell(50, 10, f"Rs.{format_paise(bill.total)}", border=1)
+        pdf.cell(50, 10, bill.date, border=1)
+        pdf.cell(40, 10, "View", border=1, ln=True)
+        count += 1
+        revenue += bill.total
+        if progress and count % SUMMARY_PROGRESS_EVERY == 0:
+            progress(count)
 
-        pdf.set_font("DejaVu", "", 12)
-        for item, qty, price in bill['items']:
-            total = qty * price
-            pdf.cell(60, 10, item, border=1)
-            pdf.cell(40, 10, str(qty), border=1)
-            pdf.cell(40, 10, f"{price:.2f}", border=1)
-            pdf.cell(40, 10, f"{total:.2f}", border=1)
-            pdf.ln()
-
-        pdf.ln(5)
-        pdf.set_font("DejaVu", "B", 14)
-        pdf.cell(200, 10, txt=f"Total Amount: Rs. {bill['total']:.2f}", ln=True)
-
-        # Output the PDF to file
-        pdf.output(f"assets/{file_path}")
\ No newline at end of file
+    pdf.ln(10)
+    pdf.set_font("DejaVu", "B", 12)
+    pdf.cell(200, 10, f"Total Revenue: Rs.{format_paise(revenue)}", ln=True, align="C")
+    return count, revenue
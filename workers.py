@@ -0,0 +1,117 @@
+import threading
+
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, Signal
+
+from db import POOL_SIZE
+
+
+class JobSignals(QObject):
+    succeeded = Signal(object)
+    failed = Signal(str)
+
+
+class DBJob(QRunnable):
+    def __init__(self, fn, args, kwargs):
+        super().__init__()
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.signals = JobSignals()
+
+    def run(self):
+        try:
+            result = self.fn(*self.args, **self.kwargs)
+        except Exception as e:
+            self.signals.failed.emit(str(e))
+            return
+        self.signals.succeeded.emit(result)
+
+
+class ExportSignals(QObject):
+    progress = Signal(int, int)
+    finished = Signal(int, float)
+    failed = Signal(str)
+    cancelled = Signal()
+
+
+class SummaryExportTask(QRunnable):
+    """Streams bills created in [start, end) from the database into a summary PDF."""
+    def __init__(self, db, file_path, title, start=None, end=None):
+        super().__init__()
+        self.db = db
+        self.file_path = file_path
+        self.title = title
+        self.start = start
+        self.end = end
+        self.cancel_requested = threading.Event()
+        self.signals = ExportSignals()
+
+    def cancel(self):
+        self.cancel_requested.set()
+
+    def run(self):
+        # Imported here so fpdf is not loaded at startup.
+        from utils.pdf_exporter import export_bill_summary, ExportCancelled
+        try:
+            expected = self.db.count_bills(self.start, self.end)
+            self.signals.progress.emit(0, expected)
+            count, revenue = export_bill_summary(
+                self.db.iter_bill_range(self.start, self.end),
+                self.file_path,
+                title=self.title,
+                progress=lambda done: self.signals.progress.emit(done, expected),
+                cancelled=self.cancel_requested.is_set
+            )
+        except ExportCancelled:
+            self.signals.cancelled.emit()
+            return
+        except Exception as e:
+            self.signals.failed.emit(str(e))
+            return
+        self.signals.finished.emit(count, revenue)
+
+
+class DBWorker(QObject):
+    """Runs database calls on thread pools so the GUI never waits on MySQL.
+
+    Reads run side by side. Jobs submitted with ordered=True, which every
+    write should be, run one at a time in the order they were submitted,
+    so an edit and a delete of the same bill reach the database in the
+    order the user made them. Callbacks are delivered on the GUI thread
+    through queued signals. Together the pools use no more threads than
+    the connection pool has connections, so jobs never queue twice.
+    """
+    def __init__(self, parent=None, max_threads=POOL_SIZE):
+        super().__init__(parent)
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(max(max_threads - 1, 1))
+        self.ordered = QThreadPool(self)
+        self.ordered.setMaxThreadCount(1)
+        # Keeps each job's signals alive until its callback has run.
+        self.pending = set()
+
+    def submit(self, fn, *args, on_success=None, on_error=None, ordered=False, **kwargs):
+        job = DBJob(fn, args, kwargs)
+        signals = job.signals
+        self.pending.add(signals)
+
+        def succeeded(result):
+            self.pending.discard(signals)
+            if on_success:
+                on_success(result)
+
+        def failed(error):
+            self.pending.discard(signals)
+            if on_error:
+                on_error(error)
+
+        signals.succeeded.connect(succeeded)
+        signals.failed.connect(failed)
+        (self.ordered if ordered else self.pool).start(job)
+
+    def start(self, task):
+        self.pool.start(task)
+
+    def wait(self):
+        self.ordered.waitForDone()
+        self.pool.waitForDone()